@@ -1,16 +1,48 @@
+import abc
 import os
 import subprocess
-from termcolor import colored
 import sys
 import shutil
+import glob
+import json
+import time
+import argparse
+import hashlib
+import random
+import threading
+import contextlib
+import re
+from urllib.parse import urlparse
+try:
+    from termcolor import colored
+except ImportError:
+    # termcolor 为可选依赖，未安装时输出无颜色文本
+    def colored(text, color=None, *args, **kwargs):
+        return text
+
+# DNS 提供商注册表: 名称 -> 插件类 (见 register_dns_provider)，交互模式、acme.sh 插件和 DNS API 共用
+DNS_PROVIDERS = {}
+
+# 固定安装的 acme.sh 版本，可通过环境变量覆盖
+ACME_VERSION = os.environ.get('ACME_VERSION', '3.1.0')
+ACME_SHA256 = os.environ.get('ACME_SHA256')
+ACME_SYMLINK = '/usr/local/bin/acme.sh'
+ACME_INSTALL_TMP = '/home/tmp_acme'
+
 def print_message(message, color='green'):
     """打印彩色信息"""
     print(colored(message, color))
 
-def get_user_input(prompt, default=None, required=False):
-    """获取用户输入并显示为青色"""
+def get_user_input(prompt, default=None, required=False, secret=False):
+    """获取用户输入并显示为青色，secret=True 的输入 (密钥、密码) 录制时不落盘"""
     while True:
+        start = time.monotonic()
         user_input = input(colored(prompt, 'cyan')).strip()
+        # 录制实际生效的值 (含默认值)
+        answer = user_input or (default if default is not None else '')
+        if answer and secret:
+            answer = '<redacted>'
+        record_event({'type': 'input', 'prompt': prompt, 'answer': answer, 'seconds': round(time.monotonic() - start, 3)})
         if user_input:
             return user_input
         if default is not None:
@@ -26,21 +58,340 @@ def create_directory(path):
     else:
         print_message(f"目录已存在: {path}", 'yellow')
 
-def run_command(command, check=True, silent=False):
-    """运行系统命令"""
+# 运行报告：记录每个阶段与每条命令的耗时，可通过环境变量或 --run-report/--prom-file 输出
+RUN_REPORT = {'script': os.path.basename(__file__), 'phases': [], 'commands': []}
+REPORT_PATH = os.environ.get('DEBIAN_SCRIPT_REPORT')
+PROM_PATH = os.environ.get('DEBIAN_SCRIPT_PROM')
+_run_started = time.time()
+_report_lock = threading.Lock()
+# 每个线程有自己的阶段栈，主线程的栈同时作为工作线程的默认阶段
+_phase_state = threading.local()
+_main_phase_stack = []
+
+# 录制：设置 DEBIAN_SCRIPT_RECORD 后，每次输入、命令和下载 (含耗时) 追加到该 JSON Lines 文件，供 replay.py 回放
+RECORD_PATH = os.environ.get('DEBIAN_SCRIPT_RECORD')
+_record_state = threading.local()
+_record_started = False
+
+def record_event(event):
+    """录制模式下追加一条事件，每个进程的第一条事件前写入脚本名与参数"""
+    global _record_started
+    if not RECORD_PATH or getattr(_record_state, 'paused', False):
+        return
+    with _report_lock:
+        with open(RECORD_PATH, 'a') as f:
+            if not _record_started:
+                _record_started = True
+                f.write(json.dumps({'type': 'start', 'script': RUN_REPORT['script'], 'argv': sys.argv[1:]}) + '\n')
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+def _phase_stack():
+    """当前线程的阶段栈"""
+    stack = getattr(_phase_state, 'stack', None)
+    if stack is None:
+        stack = _main_phase_stack if threading.current_thread() is threading.main_thread() else []
+        _phase_state.stack = stack
+    return stack
+
+def current_phase():
+    """当前线程最内层的阶段；线程池中的工作线程没有自己的阶段时归入主线程当前的阶段"""
+    for stack in (_phase_stack(), _main_phase_stack):
+        try:
+            return stack[-1]
+        except IndexError:
+            continue
+    return None
+
+@contextlib.contextmanager
+def phase(name):
+    """记录一个阶段的耗时与结果"""
+    start = time.monotonic()
+    status = 'ok'
+    parent = current_phase()
+    stack = _phase_stack()
+    stack.append(name)
+    try:
+        yield
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        stack.pop()
+        with _report_lock:
+            RUN_REPORT['phases'].append({
+                'name': name, 'parent': parent,
+                'seconds': round(time.monotonic() - start, 3), 'status': status,
+            })
+
+def record_command(command, seconds, returncode, output_bytes):
+    """记录一条命令的耗时、退出码与输出字节数"""
+    with _report_lock:
+        RUN_REPORT['commands'].append({
+            'command': ' '.join(str(part) for part in command),
+            'phase': current_phase(),
+            'seconds': round(seconds, 3), 'returncode': returncode, 'output_bytes': output_bytes,
+        })
+
+def _prom_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def write_run_report(success):
+    """写入 JSON 运行报告和 Prometheus textfile collector 文件"""
+    RUN_REPORT.update(started=_run_started, seconds=round(time.time() - _run_started, 3), success=success)
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'w') as f:
+            json.dump(RUN_REPORT, f, ensure_ascii=False, indent=2)
+    if not PROM_PATH:
+        return
+    script = _prom_label(RUN_REPORT['script'])
+    lines = [
+        '# HELP debian_script_run_duration_seconds Duration of the whole run.',
+        '# TYPE debian_script_run_duration_seconds gauge',
+        f'debian_script_run_duration_seconds{{script="{script}"}} {RUN_REPORT["seconds"]}',
+        '# HELP debian_script_run_success Whether the last run succeeded.',
+        '# TYPE debian_script_run_success gauge',
+        f'debian_script_run_success{{script="{script}"}} {int(success)}',
+        '# HELP debian_script_run_timestamp_seconds When the last run finished.',
+        '# TYPE debian_script_run_timestamp_seconds gauge',
+        f'debian_script_run_timestamp_seconds{{script="{script}"}} {int(time.time())}',
+    ]
+    # 同名阶段 (如多个挂载、多个线程) 合并为一条时间序列，避免重复的标签组合
+    phases = {}
+    for item in RUN_REPORT['phases']:
+        key = (item['name'], item['status'])
+        count, seconds = phases.get(key, (0, 0))
+        phases[key] = (count + 1, seconds + item['seconds'])
+    lines += ['# HELP debian_script_phase_duration_seconds Total duration of each phase.',
+              '# TYPE debian_script_phase_duration_seconds gauge']
+    lines += [f'debian_script_phase_duration_seconds{{script="{script}",phase="{_prom_label(n)}",'
+              f'status="{st}"}} {round(s, 3)}' for (n, st), (_, s) in sorted(phases.items())]
+    lines += ['# HELP debian_script_phase_runs Number of times each phase ran.',
+              '# TYPE debian_script_phase_runs gauge']
+    lines += [f'debian_script_phase_runs{{script="{script}",phase="{_prom_label(n)}",'
+              f'status="{st}"}} {c}' for (n, st), (c, _) in sorted(phases.items())]
+    # 按阶段和程序名聚合，避免标签基数过大
+    totals = {}
+    for item in RUN_REPORT['commands']:
+        parts = item['command'].split()
+        program = parts[1] if parts[0] == 'sudo' and len(parts) > 1 else parts[0]
+        key = (item['phase'] or '', os.path.basename(program))
+        count, seconds = totals.get(key, (0, 0))
+        totals[key] = (count + 1, seconds + item['seconds'])
+    lines += ['# HELP debian_script_command_duration_seconds Total time spent in subprocesses.',
+              '# TYPE debian_script_command_duration_seconds gauge']
+    lines += [f'debian_script_command_duration_seconds{{script="{script}",phase="{_prom_label(p)}",'
+              f'program="{_prom_label(c)}"}} {round(s, 3)}' for (p, c), (_, s) in sorted(totals.items())]
+    lines += ['# HELP debian_script_commands Number of subprocesses run.',
+              '# TYPE debian_script_commands gauge']
+    lines += [f'debian_script_commands{{script="{script}",phase="{_prom_label(p)}",'
+              f'program="{_prom_label(c)}"}} {n}' for (p, c), (n, _) in sorted(totals.items())]
+    tmp_path = f"{PROM_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, PROM_PATH)
+
+def run_with_report(func, *args):
+    """执行入口函数，结束时按需写入运行报告"""
+    success = False
+    try:
+        func(*args)
+        success = True
+    except SystemExit as e:
+        success = e.code in (0, None)
+        raise
+    finally:
+        if REPORT_PATH or PROM_PATH:
+            write_run_report(success)
+
+def run_command(command, check=True, silent=False, cwd=None, capture=False, env=None):
+    """运行系统命令，capture=True 时合并收集 stdout/stderr 到 result.stdout；开启运行报告时统计输出字节数"""
+    measure = capture or bool(REPORT_PATH or PROM_PATH)
+    start = time.monotonic()
+    try:
+        if measure and not capture and not silent:
+            # 一边原样输出，一边统计字节数
+            process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output_bytes = 0
+            for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.flush()
+                output_bytes += len(chunk)
+            result = subprocess.CompletedProcess(command, process.wait())
+        else:
+            if measure:
+                stdout, stderr = subprocess.PIPE, subprocess.STDOUT
+            else:
+                stdout = subprocess.DEVNULL if silent else None
+                stderr = subprocess.DEVNULL if silent else None
+            result = subprocess.run(command, cwd=cwd, env=env, stdout=stdout, stderr=stderr, text=capture)
+            output_bytes = len(result.stdout.encode() if capture else result.stdout or b'')
+    except OSError as e:
+        record_command(command, time.monotonic() - start, None, 0)
+        record_event({'type': 'command', 'command': [str(part) for part in command], 'cwd': cwd,
+                      'returncode': None, 'error': str(e), 'seconds': round(time.monotonic() - start, 3)})
+        raise
+    record_command(command, time.monotonic() - start, result.returncode, output_bytes)
+    record_event({'type': 'command', 'command': [str(part) for part in command], 'cwd': cwd,
+                  'returncode': result.returncode, 'stdout': result.stdout if capture else None,
+                  'seconds': round(time.monotonic() - start, 3)})
     try:
-        result = subprocess.run(command, check=check, 
-                                stdout=subprocess.DEVNULL if silent else None, 
-                                stderr=subprocess.DEVNULL if silent else None)
+        if check:
+            result.check_returncode()
         return result
     except subprocess.CalledProcessError as e:
         print_message(f"命令执行失败: {e}", 'red')
         raise
 
+# 下载产物的本地缓存，可通过环境变量指定目录、内网镜像地址和容量上限
+ARTIFACT_CACHE = os.environ.get('DEBIAN_SCRIPT_CACHE', '/var/cache/debian-script')
+ARTIFACT_MIRROR = os.environ.get('DEBIAN_SCRIPT_MIRROR')
+ARTIFACT_CACHE_MAX_MB = int(os.environ.get('DEBIAN_SCRIPT_CACHE_MAX_MB', '1024'))
+# 产物固定校验值: 文件名 -> sha256，须从官方发布页核对后填写；
+# DEBIAN_SCRIPT_PINS 可指定 sha256sum 格式的补充清单。默认拒绝没有固定校验值的产物，
+# 避免缓存信任首次下载的内容；DEBIAN_SCRIPT_REQUIRE_PIN=0 时只打印警告
+ARTIFACT_SHA256 = {}
+ARTIFACT_PINS = os.environ.get('DEBIAN_SCRIPT_PINS')
+ARTIFACT_REQUIRE_PIN = os.environ.get('DEBIAN_SCRIPT_REQUIRE_PIN', '1') != '0'
+
+def sha256_file(path):
+    """计算文件的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cached_artifact_valid(path, sha256=None):
+    """校验缓存文件：指定了 sha256 时按其校验，否则按下载时记录的校验值校验"""
+    if not os.path.exists(path):
+        return False
+    if not sha256:
+        sidecar = f"{path}.sha256"
+        if not os.path.exists(sidecar):
+            return False
+        with open(sidecar, 'r') as f:
+            sha256 = f.read().strip()
+    return sha256_file(path) == sha256
+
+def pinned_sha256(name):
+    """返回产物的固定 sha256，DEBIAN_SCRIPT_PINS 清单优先于内置表"""
+    if ARTIFACT_PINS and os.path.exists(ARTIFACT_PINS):
+        with open(ARTIFACT_PINS, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2 and os.path.basename(fields[1].lstrip('*')) == name:
+                    return fields[0].lower()
+    return ARTIFACT_SHA256.get(name)
+
+def evict_artifacts(keep=None):
+    """按最近使用时间淘汰缓存，直到总大小不超过上限"""
+    entries = []
+    for name in os.listdir(ARTIFACT_CACHE):
+        path = os.path.join(ARTIFACT_CACHE, name)
+        if name.endswith(('.sha256', '.part')) or not os.path.isfile(path):
+            continue
+        entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= ARTIFACT_CACHE_MAX_MB * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        if os.path.exists(f"{path}.sha256"):
+            os.remove(f"{path}.sha256")
+        total -= size
+        print_message(f"已从缓存淘汰: {path}", 'yellow')
+
+def fetch_artifact(url, name=None, sha256=None):
+    """优先从本地缓存、其次从镜像、最后从原地址获取下载产物，返回缓存中的文件路径"""
+    start = time.monotonic()
+    # 下载过程中的 wget 等命令不单独录制，回放时整体替换为本次下载
+    _record_state.paused = True
+    try:
+        path = _fetch_artifact(url, name, sha256)
+    finally:
+        _record_state.paused = False
+    if RECORD_PATH:
+        with open(f"{path}.sha256") as f:
+            digest = f.read().strip()
+        record_event({'type': 'artifact', 'url': url, 'name': os.path.basename(path), 'sha256': digest,
+                      'seconds': round(time.monotonic() - start, 3)})
+    return path
+
+def _fetch_artifact(url, name=None, sha256=None):
+    name = name or urlparse(url).path.split('/')[-1]
+    sha256 = sha256 or pinned_sha256(name)
+    if not sha256:
+        if ARTIFACT_REQUIRE_PIN:
+            raise RuntimeError(f"{name} 没有固定的 sha256，拒绝下载；请从官方发布页核对后通过 DEBIAN_SCRIPT_PINS "
+                               f"指定，或设置 DEBIAN_SCRIPT_REQUIRE_PIN=0 跳过校验")
+        print_message(f"警告: {name} 没有固定的 sha256，仅按首次下载结果校验缓存", 'yellow')
+    os.makedirs(ARTIFACT_CACHE, exist_ok=True)
+    cached = os.path.join(ARTIFACT_CACHE, name)
+    if _cached_artifact_valid(cached, sha256):
+        os.utime(cached)
+        print_message(f"使用缓存: {cached}", 'green')
+        return cached
+
+    sources = [url]
+    if ARTIFACT_MIRROR:
+        sources.insert(0, f"{ARTIFACT_MIRROR.rstrip('/')}/{name}")
+    part = f"{cached}.part"
+    for source in sources:
+        print_message(f"正在下载: {source}", 'cyan')
+        try:
+            if source.startswith('file://') or os.path.isabs(source):
+                shutil.copyfile(urlparse(source).path if source.startswith('file://') else source, part)
+            else:
+                run_command(['wget', '-q', source, '-O', part])
+        except (OSError, subprocess.CalledProcessError) as e:
+            print_message(f"下载失败: {e}", 'yellow')
+            if os.path.exists(part):
+                os.remove(part)
+            continue
+        digest = sha256_file(part)
+        if sha256 and digest != sha256:
+            print_message(f"校验失败: {source} 的 sha256 为 {digest}，期望 {sha256}", 'red')
+            os.remove(part)
+            continue
+        os.replace(part, cached)
+        with open(f"{cached}.sha256", 'w') as f:
+            f.write(digest + '\n')
+        evict_artifacts(keep=cached)
+        return cached
+    raise RuntimeError(f"无法获取 {name}")
+
 def check_command(cmd):
     """检查系统中是否存在指定命令。"""
-    result = subprocess.run(['which', cmd], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    return result.returncode == 0
+    # 经过 run_command 才会被录制，回放时按录制结果判断命令是否存在
+    return run_command(['which', cmd], check=False, silent=True).returncode == 0
+
+APT_LISTS = '/var/lib/apt/lists'
+APT_LISTS_MAX_AGE = int(os.environ.get('DEBIAN_SCRIPT_APT_MAX_AGE', 86400))
+
+def missing_packages(packages):
+    """返回未安装的软件包 (通过 dpkg-query 判断)"""
+    missing = []
+    for pkg in packages:
+        result = run_command(['dpkg-query', '-W', '-f=${Status}', pkg], check=False, capture=True)
+        if result.returncode != 0 or 'install ok installed' not in result.stdout:
+            missing.append(pkg)
+    return missing
+
+def ensure_packages(packages):
+    """只安装缺失的软件包，软件包列表超过 APT_LISTS_MAX_AGE 秒未更新时才执行 apt-get update"""
+    missing = missing_packages(packages)
+    if not missing:
+        return []
+    try:
+        fresh = time.time() - os.stat(APT_LISTS).st_mtime < APT_LISTS_MAX_AGE
+    except OSError:
+        fresh = False
+    if not fresh:
+        run_command(['sudo', 'apt-get', 'update'])
+    run_command(['sudo', 'apt-get', 'install', '-y'] + missing)
+    return missing
 
 def check_environment():
     """检查是否安装了必要的命令。"""
@@ -49,20 +400,33 @@ def check_environment():
     if missing:
         print_message(f"缺少以下命令：{', '.join(missing)}", 'red')
         # 安装依赖
-        run_command(['sudo', 'apt-get', 'update'])
-        run_command(['sudo', 'apt-get', 'install', '-y', 'git', 'curl', 'wget', 'openssl','socat'])
+        ensure_packages(missing)
         check_environment()
     print_message("环境检查通过。", 'green')
 
 def install_acme(home_dir, config_home, email,istall_dir):
     """安装acme.sh并指定安装目录和配置。"""
+    import tarfile
     acme_path = os.path.join(home_dir, "acme.sh")
     if check_command('acme.sh'):
         print_message("acme.sh 已经安装。", 'yellow')
         return
-    os.chdir(istall_dir)
-    run_command(['git', 'clone','--depth','1','https://github.com/acmesh-official/acme.sh.git'])
-    os.chdir('acme.sh')
+    tarball = fetch_artifact(
+        f'https://github.com/acmesh-official/acme.sh/archive/refs/tags/{ACME_VERSION}.tar.gz',
+        name=f'acme.sh-{ACME_VERSION}.tar.gz', sha256=ACME_SHA256)
+    with tarfile.open(tarball) as tar:
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(istall_dir, filter='data')
+        else:
+            # 旧版 Python 没有解包过滤器，手动拒绝绝对路径、越界路径和链接
+            for member in tar.getmembers():
+                target = os.path.realpath(os.path.join(istall_dir, member.name))
+                if member.issym() or member.islnk() or \
+                        os.path.commonpath([target, os.path.realpath(istall_dir)]) != os.path.realpath(istall_dir):
+                    raise RuntimeError(f"压缩包中存在不安全的路径: {member.name}")
+            tar.extractall(istall_dir)
+        top_dir = tar.getnames()[0].split('/')[0]
+    os.chdir(os.path.join(istall_dir, top_dir))
     install_command = [
         './acme.sh','--install',
         '--home', home_dir,
@@ -81,7 +445,7 @@ def install_acme(home_dir, config_home, email,istall_dir):
         
     # 创建软连接
     # 创建符号链接，指向 /usr/local/bin
-    symlink_path = "/usr/local/bin/acme.sh"
+    symlink_path = ACME_SYMLINK
     if os.path.islink(symlink_path):
         os.remove(symlink_path)  # 删除现有的符号链接
     elif os.path.exists(symlink_path):
@@ -92,42 +456,47 @@ def install_acme(home_dir, config_home, email,istall_dir):
 
 def configure_dns_api():
     """根据用户输入配置 acme.sh 的 DNS API 验证。"""
-    cdns = {
-        "阿里云": ("dns_ali", "Ali"),
-        # "Cloudflare": ("dns_cf", "CF"),
-        # 可以添加其他 DNS 提供商
-    }
+    cdns = list(DNS_PROVIDERS.values())
 
     print_message("请选择一个 DNS 提供商用于 API 验证：", 'cyan')
-    for idx, provider in enumerate(cdns.keys(), 1):
-        print_message(f"{idx}. {provider}", 'cyan')
+    for idx, provider in enumerate(cdns, 1):
+        print_message(f"{idx}. {provider.title}", 'cyan')
 
     try:
         choice = int(get_user_input("请输入 DNS 提供商的编号：", required=True))
         if choice < 1 or choice > len(cdns):
             raise ValueError("无效的编号")
-        provider_key = list(cdns.keys())[choice - 1]
+        provider = cdns[choice - 1]
     except (ValueError, IndexError):
         print_message("请输入有效的提供商编号。", 'red')
         return None
 
-    # 设置 API 环境变量前缀
-    dns_api, api_env_prefix = cdns[provider_key]
-
-    # 获取 API Key 和 Secret
-    key = get_user_input(f"请输入 {provider_key} 的 API Key：", required=True)
-    secret = get_user_input(f"请输入 {provider_key} 的 API Secret：", required=True)
+    # 获取凭据并设置为 acme.sh 插件读取的环境变量
+    for env_name, label in provider.env.items():
+        os.environ[env_name] = get_user_input(f"请输入 {provider.title} 的 {label}：", required=True, secret=True)
 
-    # 设置环境变量
-    os.environ[f"{api_env_prefix}_Key"] = key
-    os.environ[f"{api_env_prefix}_Secret"] = secret
+    print_message(f"{provider.title} 的 DNS API 验证已配置。", 'green')
+    return provider.dns_api
 
-    print_message(f"{provider_key} 的 DNS API 验证已配置。", 'green')
-    return dns_api
 
+def account_registered(email, config_home):
+    """检查 config_home 下是否已缓存该邮箱的 ACME 账户。"""
+    # acme.sh 按 CA 地址分层保存账户，如 ca/acme.zerossl.com/v2/DV90/account.json
+    for account_json in glob.glob(os.path.join(config_home, 'ca', '**', 'account.json'), recursive=True):
+        ca_conf = os.path.join(os.path.dirname(account_json), 'ca.conf')
+        if not os.path.exists(ca_conf):
+            continue
+        with open(ca_conf, 'r') as f:
+            if f"CA_EMAIL='{email}'" in f.read():
+                return True
+    return False
 
-def register_account(email,home_dir):
-    """使用acme.sh注册一个新账户。"""
+def register_account(email,home_dir,config_home=None):
+    """使用acme.sh注册一个新账户，已注册过的账户直接复用。"""
+    config_home = config_home or f'{home_dir}/data'
+    if account_registered(email, config_home):
+        print_message(f"账户 {email} 已注册，复用已有账户。", 'yellow')
+        return
     os.chdir(home_dir)
     command = ['acme.sh', '--register-account', '-m' ,email]
     result = run_command(command, check=True, silent=False)
@@ -136,16 +505,348 @@ def register_account(email,home_dir):
         sys.exit(1)
     print_message("账户注册成功。", 'green')
 
-def issue_certificate(domain, dns_provider,home_dir):
+DNS_TYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'TXT': 16}
+DNS_PORT = 53
+
+def _encode_name(name):
+    """将域名编码为 DNS 报文格式"""
+    labels = [label for label in name.rstrip('.').split('.') if label]
+    return b''.join(bytes([len(label)]) + label.encode('ascii') for label in labels) + b'\0'
+
+def _read_name(message, offset):
+    """读取报文中的域名 (支持压缩指针)，返回 (域名, 下一个偏移)"""
+    import struct
+    labels = []
+    end = None
+    while True:
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack('>H', message[offset:offset + 2])[0] & 0x3FFF
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+def dns_query(server, name, qtype, timeout=2.0, recursion=True):
+    """向指定 DNS 服务器发送一次查询，返回 {'rcode', 'answers': [(类型, 值)]}"""
+    import socket
+    import struct
+    qid = random.getrandbits(16)
+    flags = 0x0100 if recursion else 0
+    packet = struct.pack('>HHHHHH', qid, flags, 1, 0, 0, 0) + _encode_name(name) + struct.pack('>HH', DNS_TYPES[qtype], 1)
+    family = socket.AF_INET6 if ':' in server else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        sock.sendto(packet, (server, DNS_PORT))
+        while True:
+            message, _ = sock.recvfrom(65535)
+            if struct.unpack('>H', message[:2])[0] == qid:
+                break
+    if struct.unpack('>H', message[2:4])[0] & 0x0200:
+        # 响应被截断，改用 TCP 重新查询
+        with socket.create_connection((server, DNS_PORT), timeout=timeout) as sock:
+            sock.sendall(struct.pack('>H', len(packet)) + packet)
+            length = struct.unpack('>H', sock.recv(2))[0]
+            message = b''
+            while len(message) < length:
+                chunk = sock.recv(length - len(message))
+                if not chunk:
+                    break
+                message += chunk
+
+    _, flags, qdcount, ancount, _, _ = struct.unpack('>HHHHHH', message[:12])
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(message, offset)
+        offset += 4
+    answers = []
+    for _ in range(ancount):
+        _, offset = _read_name(message, offset)
+        rtype, _, _, rdlength = struct.unpack('>HHIH', message[offset:offset + 10])
+        offset += 10
+        rdata = message[offset:offset + rdlength]
+        if rtype == DNS_TYPES['A']:
+            answers.append(('A', socket.inet_ntoa(rdata)))
+        elif rtype in (DNS_TYPES['NS'], DNS_TYPES['CNAME']):
+            answers.append(('NS' if rtype == DNS_TYPES['NS'] else 'CNAME', _read_name(message, offset)[0]))
+        elif rtype == DNS_TYPES['TXT']:
+            parts, i = [], 0
+            while i < len(rdata):
+                parts.append(rdata[i + 1:i + 1 + rdata[i]].decode('utf-8', 'replace'))
+                i += 1 + rdata[i]
+            answers.append(('TXT', ''.join(parts)))
+        offset += rdlength
+    return {'rcode': flags & 0xF, 'answers': answers}
+
+def system_resolvers():
+    """读取 /etc/resolv.conf 中的递归 DNS 服务器"""
+    resolvers = []
+    try:
+        with open('/etc/resolv.conf', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    resolvers.append(fields[1])
+    except OSError:
+        pass
+    return resolvers or ['223.5.5.5', '8.8.8.8']
+
+_authoritative_cache = {}
+
+def authoritative_servers(fqdn, resolver):
+    """查找 fqdn 所在区域的权威 DNS 服务器 IP 列表"""
+    labels = fqdn.rstrip('.').split('.')
+    for i in range(len(labels) - 1):
+        zone = '.'.join(labels[i:])
+        if zone in _authoritative_cache:
+            return _authoritative_cache[zone]
+        hosts = [value for rtype, value in dns_query(resolver, zone, 'NS')['answers'] if rtype == 'NS']
+        if hosts:
+            servers = []
+            for host in hosts:
+                servers += [value for rtype, value in dns_query(resolver, host, 'A')['answers'] if rtype == 'A']
+            _authoritative_cache[zone] = servers
+            return servers
+    return []
+
+def cname_target(fqdn, resolver, max_depth=8):
+    """跟随 CNAME 链 (如 _acme-challenge 委派到其它区域)，返回实际存放 TXT 记录的域名"""
+    name = fqdn.rstrip('.')
+    for _ in range(max_depth):
+        cnames = [value for rtype, value in dns_query(resolver, name, 'CNAME')['answers'] if rtype == 'CNAME']
+        if not cnames:
+            break
+        name = cnames[0].rstrip('.')
+    return name
+
+def _txt_visible(server, fqdn, value, recursion):
+    """检查某个 DNS 服务器上是否已能查到指定的 TXT 记录值"""
+    import struct
+    try:
+        answers = dns_query(server, fqdn, 'TXT', recursion=recursion)['answers']
+    except (OSError, struct.error, IndexError):
+        return False
+    return ('TXT', value) in answers
+
+def wait_for_txt(records, resolvers=(), timeout=300, interval=3):
+    """并行轮询权威 DNS (及可选的递归 DNS)，所有 TXT 记录可见时返回 True，超时返回 False"""
+    import struct
+    from concurrent.futures import ThreadPoolExecutor
+    lookup = system_resolvers()[0]
+    checks = set()
+    for fqdn, value in records:
+        try:
+            fqdn = cname_target(fqdn, lookup)
+            servers = authoritative_servers(fqdn, lookup)
+        except (OSError, struct.error, IndexError) as e:
+            print_message(f"查询 {fqdn} 的权威 DNS 失败: {e}", 'yellow')
+            servers = []
+        checks.update((server, fqdn, value, False) for server in servers)
+        checks.update((server, fqdn, value, True) for server in resolvers or ([] if servers else [lookup]))
+    deadline = time.monotonic() + timeout
+    with ThreadPoolExecutor(max_workers=min(32, max(1, len(checks)))) as executor:
+        while checks:
+            pending = list(checks)
+            for check, visible in zip(pending, executor.map(lambda c: _txt_visible(*c), pending)):
+                if visible:
+                    checks.discard(check)
+            if not checks:
+                break
+            if time.monotonic() >= deadline:
+                print_message(f"等待 DNS 生效超时，仍有 {len(checks)} 处未生效。", 'yellow')
+                return False
+            time.sleep(interval)
+    print_message(f"{len(records)} 条 TXT 记录已在所有 DNS 服务器上生效。", 'green')
+    return True
+
+# acme.sh DNS 插件包装：调用实际插件添加记录，全部添加后由 acme.py 主动轮询生效情况。
+# 首次签发时的 ACMEPY_* 环境变量保存在域名配置中，acme.sh 自身的 cron 或 renew 续期时从中读取
+DNS_HOOK = """\
+#!/usr/bin/env sh
+# 由 acme.py 生成，请勿手动修改
+
+_acmepy_load() {
+  for _acmepy_key in ACMEPY_DNS_BACKEND ACMEPY_PYTHON ACMEPY_SCRIPT ACMEPY_DNS_TIMEOUT ACMEPY_DNS_RESOLVERS; do
+    eval "_acmepy_value=\\"\\${$_acmepy_key}\\""
+    if [ -n "$_acmepy_value" ]; then
+      _savedomainconf "$_acmepy_key" "$_acmepy_value"
+    else
+      eval "$_acmepy_key=\\"\\$(_readdomainconf $_acmepy_key)\\""
+    fi
+  done
+  ACMEPY_HOME="${ACMEPY_HOME:-$LE_WORKING_DIR}"
+  ACMEPY_PYTHON="${ACMEPY_PYTHON:-python3}"
+  ACMEPY_SCRIPT="${ACMEPY_SCRIPT:-$ACMEPY_HOME/acme.py}"
+  ACMEPY_DNS_TIMEOUT="${ACMEPY_DNS_TIMEOUT:-300}"
+  # 续期时没有 acme.py 传入的临时文件，按 acme.sh 进程号使用独立的文件
+  ACMEPY_PENDING="${ACMEPY_PENDING:-${TMPDIR:-/tmp}/acmepy-$$.pending}"
+  if [ -z "$ACMEPY_DNS_BACKEND" ]; then
+    echo "dns_acmepy: 缺少 ACMEPY_DNS_BACKEND，且域名配置中没有保存"
+    return 1
+  fi
+  . "$ACMEPY_HOME/dnsapi/$ACMEPY_DNS_BACKEND.sh"
+}
+
+# 本次需要添加的 TXT 记录数：acme.sh 的 vlist 中未验证过的 dns-01 挑战 (已复用的授权为 verified_ok)
+_acmepy_expect() {
+  if [ -n "$ACMEPY_EXPECT" ]; then
+    echo "$ACMEPY_EXPECT"
+    return
+  fi
+  _acmepy_count=0
+  for _acmepy_entry in $(echo "$vlist" | tr ',' ' '); do
+    [ "$(echo "$_acmepy_entry" | cut -d '#' -f 2)" = "verified_ok" ] && continue
+    [ "$(echo "$_acmepy_entry" | cut -d '#' -f 4)" = "dns-01" ] || continue
+    _acmepy_count=$((_acmepy_count + 1))
+  done
+  # 拿不到 vlist 时每添加一条就等待一次
+  [ "$_acmepy_count" -gt 0 ] || _acmepy_count=1
+  echo "$_acmepy_count"
+}
+
+dns_acmepy_add() {
+  _acmepy_load || return 1
+  "${ACMEPY_DNS_BACKEND}_add" "$1" "$2" || return 1
+  echo "$1=$2" >> "$ACMEPY_PENDING"
+  if [ "$(wc -l < "$ACMEPY_PENDING")" -ge "$(_acmepy_expect)" ]; then
+    if [ -f "$ACMEPY_SCRIPT" ]; then
+      "$ACMEPY_PYTHON" "$ACMEPY_SCRIPT" wait-dns --file "$ACMEPY_PENDING" \\
+        --timeout "$ACMEPY_DNS_TIMEOUT" --resolvers "$ACMEPY_DNS_RESOLVERS" \\
+        || echo "DNS 记录未在超时时间内全部生效，继续验证"
+    else
+      # acme.py 已被删除或移动时退回 acme.sh 默认的固定等待
+      echo "dns_acmepy: 找不到 $ACMEPY_SCRIPT，固定等待 ${ACMEPY_FALLBACK_SLEEP:-120} 秒"
+      sleep "${ACMEPY_FALLBACK_SLEEP:-120}"
+    fi
+  fi
+  return 0
+}
+
+dns_acmepy_rm() {
+  _acmepy_load || return 1
+  rm -f "${TMPDIR:-/tmp}/acmepy-$$.pending"
+  "${ACMEPY_DNS_BACKEND}_rm" "$1" "$2"
+}
+"""
+
+def install_script(home_dir):
+    """把脚本复制到安装目录并返回其路径：交互运行结束时会删除原脚本，cron 续期与 dns_acmepy 插件使用这份副本"""
+    script_path = os.path.join(home_dir, 'acme.py')
+    if os.path.abspath(__file__) != script_path:
+        shutil.copyfile(os.path.abspath(__file__), f'{script_path}.tmp')
+        os.chmod(f'{script_path}.tmp', 0o700)
+        os.replace(f'{script_path}.tmp', script_path)
+    return script_path
+
+def install_dns_hook(home_dir):
+    """在 acme.sh 的 dnsapi 目录中写入 dns_acmepy 包装插件，并复制插件调用的 acme.py。
+    写入临时文件后重命名，正在加载插件的 acme.sh 进程不会读到不完整的文件"""
+    hook_path = os.path.join(home_dir, 'dnsapi', 'dns_acmepy.sh')
+    os.makedirs(os.path.dirname(hook_path), exist_ok=True)
+    install_script(home_dir)
+    with open(f'{hook_path}.tmp', 'w') as f:
+        f.write(DNS_HOOK)
+    os.chmod(f'{hook_path}.tmp', 0o755)
+    os.replace(f'{hook_path}.tmp', hook_path)
+
+def dns_poll_env(home_dir, dns_provider, pending_file, dns_timeout, resolvers=()):
+    """生成 dns_acmepy 插件运行所需的环境变量"""
+    return dict(
+        os.environ,
+        ACMEPY_HOME=home_dir,
+        ACMEPY_DNS_BACKEND=dns_provider,
+        ACMEPY_PENDING=pending_file,
+        ACMEPY_PYTHON=sys.executable,
+        ACMEPY_SCRIPT=os.path.join(home_dir, 'acme.py'),
+        ACMEPY_DNS_TIMEOUT=str(dns_timeout),
+        ACMEPY_DNS_RESOLVERS=','.join(resolvers),
+    )
+
+def issue_command(domain, dns_provider, poll_dns=False):
+    """生成为域名及其泛域名签发证书的 acme.sh 命令。"""
+    if poll_dns:
+        # 由 dns_acmepy 插件主动轮询，跳过 acme.sh 自身的等待
+        return ['acme.sh', '--issue', '-d', domain, '-d', f'*.{domain}', '--dns', 'dns_acmepy', '--dnssleep', '0']
+    return ['acme.sh', '--issue', '-d', domain, '-d', f'*.{domain}', '--dns', dns_provider]
+
+def run_issue(domain, dns_provider, home_dir, dns_timeout=None, resolvers=(), capture=False):
+    """执行 acme.sh 签发命令；指定 dns_timeout 时使用主动轮询 DNS 的方式，调用前需先 install_dns_hook"""
+    if dns_timeout is None:
+        return run_command(issue_command(domain, dns_provider), check=False, cwd=home_dir, capture=capture)
+    import tempfile
+    fd, pending_file = tempfile.mkstemp(prefix=f'acmepy-{domain}-')
+    os.close(fd)
+    try:
+        env = dns_poll_env(home_dir, dns_provider, pending_file, dns_timeout, resolvers)
+        return run_command(issue_command(domain, dns_provider, poll_dns=True),
+                           check=False, cwd=home_dir, capture=capture, env=env)
+    finally:
+        os.remove(pending_file)
+
+def issue_certificate(domain, dns_provider,home_dir,dns_timeout=None,resolvers=()):
     """为指定域名签发证书。"""
     os.chdir(home_dir)
-    command = ['acme.sh', '--issue', '-d', domain, '-d', f'*.{domain}', '--dns', dns_provider]
-    result = run_command(command, check=True, silent=False)
+    if dns_timeout is not None:
+        install_dns_hook(home_dir)
+    result = run_issue(domain, dns_provider, home_dir, dns_timeout, resolvers)
     if result.returncode != 0:
         print_message(f"为域名 {domain} 签发证书失败", 'red')
         sys.exit(1)
     print_message(f"证书已为域名 {domain} 签发。", 'green')
 
+def _issue_one(domain, dns_provider, home_dir, dns_timeout=None, resolvers=()):
+    """签发单个域名证书并返回结果，供批量模式的线程池调用。"""
+    start = time.monotonic()
+    result = run_issue(domain, dns_provider, home_dir, dns_timeout, resolvers, capture=True)
+    # acme.sh 返回 2 表示证书未到续期时间，已跳过
+    status = {0: 'issued', 2: 'skipped'}.get(result.returncode, 'failed')
+    output = result.stdout.strip().splitlines()
+    return {
+        'domain': domain,
+        'status': status,
+        'returncode': result.returncode,
+        'seconds': round(time.monotonic() - start, 1),
+        'message': output[-1] if output else '',
+    }
+
+def issue_certificates(domains, dns_provider, home_dir, workers=8, dns_timeout=None, resolvers=()):
+    """使用有界线程池并发签发多个域名的证书，返回每个域名的结果。"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    results = []
+    if dns_timeout is not None:
+        # 只在启动线程池前安装一次，避免并发改写其它 acme.sh 进程正在加载的插件
+        install_dns_hook(home_dir)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_issue_one, domain, dns_provider, home_dir, dns_timeout, resolvers): domain
+                   for domain in domains}
+        for future in as_completed(futures):
+            domain = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'domain': domain, 'status': 'failed', 'returncode': None, 'seconds': 0, 'message': str(e)}
+            color = {'issued': 'green', 'skipped': 'yellow'}.get(result['status'], 'red')
+            print_message(f"[{len(results) + 1}/{len(domains)}] {domain}: {result['status']} ({result['seconds']}s) {result['message']}", color)
+            results.append(result)
+    order = {domain: i for i, domain in enumerate(domains)}
+    return sorted(results, key=lambda r: order[r['domain']])
+
+def read_domains(domains, domains_file=None):
+    """合并命令行与文件中的域名列表，忽略空行与 # 注释并去重。"""
+    merged = list(domains)
+    if domains_file:
+        with open(domains_file, 'r') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    merged.append(line)
+    return list(dict.fromkeys(merged))
+
 def deploy_certificate(domain, nginx_cert_dir):
     """将签发的证书部署到Nginx。"""
     key_file = os.path.join(nginx_cert_dir, f"{domain}.key")
@@ -167,7 +868,8 @@ def deploy_certificate(domain, nginx_cert_dir):
 
 def main():
     # 环境检查
-    check_environment()
+    with phase('check_environment'):
+        check_environment()
 
     # 输入安装目录和配置
     home_dir = get_user_input("请输入acme.sh的安装目录 默认/home/acme：", required=False,default="/home/acme")
@@ -178,28 +880,32 @@ def main():
     # 创建目录
     create_directory(home_dir)
     create_directory(config_home)
-    istall_dir = '/home/tmp_acme'
+    istall_dir = ACME_INSTALL_TMP
     create_directory(istall_dir)
 
     # 安装acme.sh
-    install_acme(home_dir, config_home, email,istall_dir)
+    with phase('install_acme'):
+        install_acme(home_dir, config_home, email,istall_dir)
 
     # 配置DNS-API
     dns_provider = configure_dns_api()
 
     # # 注册账户
-    register_account(email,home_dir)
+    with phase('register_account'):
+        register_account(email,home_dir,config_home)
 
     # 解析域名并签发证书
     domain = get_user_input("请输入要签发证书的域名：如 exp.com: ", required=True)
-    issue_certificate(domain, dns_provider,home_dir)
+    with phase('issue_certificate'):
+        issue_certificate(domain, dns_provider,home_dir,dns_timeout=300)
 
     # 部署到Nginx
     deploy_nginx = get_user_input("是否将证书部署到Nginx？(y/n)：", default="n").lower()
     if deploy_nginx == "y":
         nginx_cert_dir = get_user_input("请输入Nginx证书存放目录：", required=True)
         create_directory(nginx_cert_dir)
-        deploy_certificate(domain, nginx_cert_dir)
+        with phase('deploy_certificate'):
+            deploy_certificate(domain, nginx_cert_dir)
 
     script_path = os.path.abspath(__file__)
     print_message(f"脚本执行完成，正在删除脚本文件: {script_path}", 'green')
@@ -209,5 +915,702 @@ def main():
     except Exception as e:
         print_message(f"删除脚本文件失败: {e}", 'red')
 
+class HTTPSPool:
+    """按地址复用的 HTTP(S) 长连接池，供 DNS API 插件在多线程中共享"""
+
+    def __init__(self, timeout=15):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, endpoint, path, body=None, headers=None):
+        """向 endpoint (如 https://alidns.aliyuncs.com) 发送请求并返回 (状态码, 解析后的 JSON)，连接失效时自动重连一次"""
+        import http.client
+        url = urlparse(endpoint)
+        connection = http.client.HTTPConnection if url.scheme == 'http' else http.client.HTTPSConnection
+        payload = json.dumps(body).encode() if isinstance(body, (dict, list)) else body
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            headers.setdefault('Content-Type', 'application/json')
+        for attempt in range(2):
+            with self._lock:
+                idle = self._idle.setdefault(endpoint, [])
+                conn = idle.pop() if idle else connection(url.netloc, timeout=self.timeout)
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            with self._lock:
+                self._idle[endpoint].append(conn)
+            return response.status, json.loads(data) if data else {}
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+def register_dns_provider(name, title, dns_api):
+    """注册一个 DNS 提供商：name 用于 --provider，title 用于交互菜单，dns_api 为对应的 acme.sh 插件"""
+    def decorator(cls):
+        cls.name, cls.title, cls.dns_api = name, title, dns_api
+        DNS_PROVIDERS[name] = cls
+        return cls
+    return decorator
+
+class DNSProvider(abc.ABC):
+    """DNS API 插件基类，子类实现批量添加/删除 TXT 记录"""
+    name = title = dns_api = None
+    env = {}  # 需要的环境变量: 变量名 -> 交互模式中的提示
+    endpoint = None  # API 地址，可用 ACMEPY_<NAME>_ENDPOINT 或参数覆盖 (如指向本地模拟服务)
+
+    def __init__(self, pool=None, workers=8, endpoint=None):
+        missing = [name for name in self.env if not os.environ.get(name)]
+        if missing:
+            raise ValueError(f"缺少 DNS API 环境变量：{', '.join(missing)}")
+        self.pool = pool or HTTPSPool()
+        self.workers = workers
+        self.endpoint = endpoint or os.environ.get(f'ACMEPY_{self.name.upper()}_ENDPOINT') or self.endpoint
+
+    def each(self, func, records):
+        """对每条记录并发调用 func(fqdn, value)，供没有批量接口的插件使用"""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(lambda r: func(*r), records))
+
+    @abc.abstractmethod
+    def add_records(self, records):
+        """添加多条 TXT 记录，records 为 [(fqdn, value)]"""
+
+    @abc.abstractmethod
+    def remove_records(self, records):
+        """删除多条 TXT 记录"""
+
+@register_dns_provider('ali', '阿里云', 'dns_ali')
+class AliyunDNS(DNSProvider):
+    """阿里云解析 (alidns) API，凭据取自 Ali_Key / Ali_Secret"""
+    env = {'Ali_Key': 'API Key', 'Ali_Secret': 'API Secret'}
+    endpoint = 'https://alidns.aliyuncs.com'
+
+    def __init__(self, pool=None, workers=8, endpoint=None):
+        super().__init__(pool, workers, endpoint)
+        self._zones = {}
+        self._record_ids = {}  # (fqdn, value) -> AddDomainRecord 返回的 RecordId
+
+    def call(self, action, **params):
+        """发送签名后的 RPC 请求"""
+        import hmac
+        import base64
+        import uuid
+        from urllib.parse import quote, urlencode
+        params.update(
+            Action=action, Format='JSON', Version='2015-01-09',
+            AccessKeyId=os.environ['Ali_Key'], SignatureMethod='HMAC-SHA1', SignatureVersion='1.0',
+            SignatureNonce=uuid.uuid4().hex, Timestamp=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        )
+
+        def encode(value):
+            return quote(str(value), safe='~')
+
+        canonical = '&'.join(f"{encode(k)}={encode(v)}" for k, v in sorted(params.items()))
+        string_to_sign = f"GET&{encode('/')}&{encode(canonical)}"
+        key = f"{os.environ['Ali_Secret']}&".encode()
+        params['Signature'] = base64.b64encode(hmac.new(key, string_to_sign.encode(), hashlib.sha1).digest()).decode()
+        status, data = self.pool.request('GET', self.endpoint, '/?' + urlencode(params, quote_via=quote))
+        if status != 200:
+            raise RuntimeError(f"{action} 失败: {data.get('Code')} {data.get('Message')}")
+        return data
+
+    def split(self, fqdn):
+        """将完整域名拆分为 (主域名, 主机记录)"""
+        if fqdn not in self._zones:
+            data = self.call('GetMainDomainName', InputString=fqdn)
+            self._zones[fqdn] = (data['DomainName'], data['RR'])
+        return self._zones[fqdn]
+
+    def add_record(self, fqdn, value):
+        domain, rr = self.split(fqdn)
+        data = self.call('AddDomainRecord', DomainName=domain, RR=rr, Type='TXT', Value=value, TTL=600)
+        self._record_ids[(fqdn, value)] = data['RecordId']
+
+    def remove_record(self, fqdn, value):
+        # 只删除本次添加的记录，同一主机记录下其它签发进程或客户端的挑战不受影响
+        record_id = self._record_ids.pop((fqdn, value), None)
+        if record_id is not None:
+            self.call('DeleteDomainRecord', RecordId=record_id)
+
+    def add_records(self, records):
+        self.each(self.add_record, records)
+
+    def remove_records(self, records):
+        self.each(self.remove_record, records)
+
+@register_dns_provider('cf', 'Cloudflare', 'dns_cf')
+class CloudflareDNS(DNSProvider):
+    """Cloudflare API，凭据取自 CF_Token，按区域使用批量接口一次提交多条记录"""
+    env = {'CF_Token': 'API Token'}
+    endpoint = 'https://api.cloudflare.com'
+
+    def __init__(self, pool=None, workers=8, endpoint=None):
+        super().__init__(pool, workers, endpoint)
+        self._zones = {}
+
+    def call(self, method, path, body=None):
+        """发送带 Token 的 API 请求"""
+        headers = {'Authorization': f"Bearer {os.environ['CF_Token']}"}
+        status, data = self.pool.request(method, self.endpoint, f'/client/v4{path}', body, headers)
+        if status >= 400 or not data.get('success', False):
+            raise RuntimeError(f"{method} {path} 失败: {data.get('errors')}")
+        return data['result']
+
+    def zone_id(self, fqdn):
+        """查找完整域名所在区域的 zone id"""
+        labels = fqdn.split('.')
+        for i in range(len(labels) - 1):
+            zone = '.'.join(labels[i:])
+            if zone in self._zones:
+                return self._zones[zone]
+            result = self.call('GET', f'/zones?name={zone}')
+            if result:
+                self._zones[zone] = result[0]['id']
+                return result[0]['id']
+        raise RuntimeError(f"在 Cloudflare 中找不到 {fqdn} 所在的区域")
+
+    def _group_by_zone(self, records):
+        zones = {}
+        for fqdn, value in records:
+            zones.setdefault(self.zone_id(fqdn), []).append((fqdn, value))
+        return zones
+
+    def add_records(self, records):
+        for zone, items in self._group_by_zone(records).items():
+            posts = [{'type': 'TXT', 'name': fqdn, 'content': value, 'ttl': 60} for fqdn, value in items]
+            self.call('POST', f'/zones/{zone}/dns_records/batch', {'posts': posts})
+
+    def remove_records(self, records):
+        for zone, items in self._group_by_zone(records).items():
+            deletes = []
+            for fqdn in dict.fromkeys(fqdn for fqdn, _ in items):
+                values = {value for name, value in items if name == fqdn}
+                for record in self.call('GET', f'/zones/{zone}/dns_records?type=TXT&name={fqdn}'):
+                    if record['content'].strip('"') in values:
+                        deletes.append({'id': record['id']})
+            if deletes:
+                self.call('POST', f'/zones/{zone}/dns_records/batch', {'deletes': deletes})
+
+# acme.sh 手动 DNS 模式：第一步输出需要添加的 TXT 记录，第二步 --renew 完成验证
+MANUAL_DNS_FLAG = '--yes-I-know-dns-manual-mode-enough-go-ahead-please'
+
+def parse_manual_records(output):
+    """从 acme.sh 手动 DNS 模式的输出中解析 (域名, TXT 值)"""
+    records, fqdn = [], None
+    for line in output.splitlines():
+        match = re.search(r"Domain: '([^']+)'", line)
+        if match:
+            fqdn = match.group(1)
+            continue
+        match = re.search(r"TXT value: '([^']+)'", line)
+        if match and fqdn:
+            records.append((fqdn, match.group(1)))
+            fqdn = None
+    return records
+
+def native_dns_issue(domains, provider_name, home_dir, workers=8, dns_timeout=300, resolvers=(), renew=False, ecc=None):
+    """使用 DNS API 插件批量签发/续期：并发生成挑战，批量添加记录，统一轮询生效，并发完成验证后批量删除记录"""
+    from concurrent.futures import ThreadPoolExecutor
+    provider = DNS_PROVIDERS[provider_name](workers=workers)
+    ecc = ecc or {}
+    results = {}
+
+    def prepare(domain):
+        if renew:
+            command = ['acme.sh', '--renew', '-d', domain, '--force']
+        else:
+            command = ['acme.sh', '--issue', '-d', domain, '-d', f'*.{domain}', '--dns']
+        command += [MANUAL_DNS_FLAG] + (['--ecc'] if ecc.get(domain) else [])
+        return acme_command(command)
+
+    def finish(domain):
+        # 续期时证书未到 acme.sh 自身的续期时间，不加 --force 会被跳过
+        command = ['acme.sh', '--renew', '-d', domain, MANUAL_DNS_FLAG] + (['--force'] if renew else [])
+        return acme_command(command + (['--ecc'] if ecc.get(domain) else []))
+
+    def acme_command(command):
+        # 单个域名找不到 acme.sh 等错误只记为该域名失败
+        try:
+            return run_command(command, check=False, cwd=home_dir, capture=True)
+        except OSError as e:
+            return subprocess.CompletedProcess(command, None, stdout=str(e))
+
+    def last_line(result):
+        output = result.stdout.strip().splitlines()
+        return output[-1] if output else ''
+
+    start = time.monotonic()
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        with phase('dns_challenge'):
+            for domain, result in zip(domains, executor.map(prepare, domains)):
+                records = parse_manual_records(result.stdout)
+                if records:
+                    pending[domain] = records
+                elif result.returncode == 2:
+                    results[domain] = ('skipped', last_line(result))
+                else:
+                    results[domain] = ('failed', last_line(result))
+        records = [record for items in pending.values() for record in items]
+        try:
+            if records:
+                print_message(f"通过 {provider_name} 批量添加 {len(records)} 条 TXT 记录...", 'cyan')
+                with phase('dns_add'):
+                    provider.add_records(records)
+                with phase('dns_wait'):
+                    wait_for_txt(records, resolvers, dns_timeout)
+                with phase('dns_validate'):
+                    for domain, result in zip(pending, executor.map(finish, list(pending))):
+                        # acme.sh 返回 2 表示已跳过，与失败区分
+                        status = {0: 'issued', 2: 'skipped'}.get(result.returncode, 'failed')
+                        results[domain] = (status, last_line(result))
+        except Exception as e:
+            for domain in pending:
+                results.setdefault(domain, ('failed', str(e)))
+        finally:
+            if records:
+                try:
+                    with phase('dns_remove'):
+                        provider.remove_records(records)
+                except Exception as e:
+                    print_message(f"删除 TXT 记录失败: {e}", 'yellow')
+            provider.pool.close()
+    seconds = round(time.monotonic() - start, 1)
+    return [{'domain': domain, 'status': results[domain][0], 'returncode': None,
+             'seconds': seconds, 'message': results[domain][1]} for domain in domains]
+
+def batch_main(args):
+    """非交互式批量签发证书。"""
+    domains = read_domains(args.domains, args.file)
+    if not domains:
+        print_message("没有需要签发的域名。", 'red')
+        sys.exit(1)
+    by_dns_api = {cls.dns_api: cls for cls in DNS_PROVIDERS.values()}
+    provider = DNS_PROVIDERS[args.provider] if args.provider else by_dns_api.get(args.dns)
+    if provider:
+        missing = [name for name in provider.env if not os.environ.get(name)]
+        if missing:
+            print_message(f"缺少 DNS API 环境变量：{', '.join(missing)}", 'red')
+            sys.exit(1)
+
+    with phase('check_environment'):
+        check_environment()
+    config_home = f'{args.home}/data'
+    create_directory(args.home)
+    create_directory(config_home)
+    istall_dir = ACME_INSTALL_TMP
+    create_directory(istall_dir)
+    with phase('install_acme'):
+        install_acme(args.home, config_home, args.email, istall_dir)
+    with phase('register_account'):
+        register_account(args.email, args.home, config_home)
+
+    print_message(f"开始批量签发 {len(domains)} 个域名，并发数 {args.workers}。", 'cyan')
+    start = time.monotonic()
+    dns_timeout = None if args.no_poll_dns else args.dns_timeout
+    resolvers = [r for r in (args.resolvers or '').split(',') if r]
+    with phase('issue_certificates'):
+        if args.provider:
+            results = native_dns_issue(domains, args.provider, args.home, args.workers, args.dns_timeout, resolvers)
+        else:
+            results = issue_certificates(domains, args.dns, args.home, args.workers, dns_timeout, resolvers)
+    failed = [r for r in results if r['status'] == 'failed']
+    print_message(f"批量签发完成，用时 {time.monotonic() - start:.1f}s："
+                  f"成功 {sum(r['status'] == 'issued' for r in results)}，"
+                  f"跳过 {sum(r['status'] == 'skipped' for r in results)}，失败 {len(failed)}。",
+                  'red' if failed else 'green')
+    for r in failed:
+        print_message(f"  {r['domain']}: {r['message']}", 'red')
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print_message(f"结果已写入 {args.report}", 'green')
+    sys.exit(1 if failed else 0)
+
+def find_certificates(config_home):
+    """查找 config_home 下 acme.sh 签发的证书，返回 {域名: (证书文件, 是否为 ECC)}"""
+    certs = {}
+    for cert_dir in glob.glob(os.path.join(config_home, '*')):
+        dir_name = os.path.basename(cert_dir)
+        ecc = dir_name.endswith('_ecc')
+        domain = dir_name[:-len('_ecc')] if ecc else dir_name
+        cert_file = os.path.join(cert_dir, f'{domain}.cer')
+        if os.path.isfile(cert_file):
+            certs[domain] = (cert_file, ecc)
+    return certs
+
+def cert_not_after(cert_file):
+    """使用 openssl 读取证书的 notAfter，返回 Unix 时间戳"""
+    import calendar
+    result = run_command(['openssl', 'x509', '-enddate', '-noout', '-in', cert_file], capture=True)
+    value = result.stdout.strip().split('=', 1)[1]
+    return calendar.timegm(time.strptime(value, '%b %d %H:%M:%S %Y %Z'))
+
+def load_schedule(state_file):
+    """读取续期计划状态文件"""
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r') as f:
+        return json.load(f)
+
+def save_schedule(state_file, schedule):
+    """原子写入续期计划状态文件"""
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(schedule, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+def plan_renewals(config_home, schedule, renew_days=30, window_hours=72):
+    """根据证书到期时间更新续期计划：到期前 renew_days 天，向前随机抖动 window_hours 小时"""
+    certs = find_certificates(config_home)
+    for domain in list(schedule):
+        if domain not in certs:
+            del schedule[domain]
+    for domain, (cert_file, ecc) in certs.items():
+        entry = schedule.get(domain)
+        try:
+            not_after = cert_not_after(cert_file)
+        except (subprocess.CalledProcessError, OSError, IndexError, ValueError) as e:
+            # 单个证书无法读取时不影响其它域名：标记为立即续期，已在失败退避中的保持原计划
+            print_message(f"{domain}: 无法读取证书 {cert_file} 的到期时间: {e}", 'red')
+            entry = dict(entry or {'not_after': 0, 'failures': 0}, ecc=ecc)
+            if not entry['failures']:
+                entry['renew_at'] = int(time.time())
+            schedule[domain] = entry
+            continue
+        if entry and entry.get('not_after') == not_after:
+            continue
+        # 新证书或已续期的证书重新计算续期时间
+        jitter = random.uniform(0, window_hours * 3600)
+        schedule[domain] = {
+            'not_after': not_after,
+            'renew_at': int(not_after - renew_days * 86400 - jitter),
+            'ecc': ecc,
+            'failures': 0,
+        }
+    return schedule
+
+def _renew_one(domain, ecc, home_dir):
+    """续期单个域名证书，供续期线程池调用"""
+    command = ['acme.sh', '--renew', '-d', domain, '--force'] + (['--ecc'] if ecc else [])
+    try:
+        result = run_command(command, check=False, cwd=home_dir, capture=True)
+    except OSError as e:
+        return False, str(e)
+    output = result.stdout.strip().splitlines()
+    return result.returncode == 0, output[-1] if output else ''
+
+def run_renewals(home_dir, state_file=None, renew_days=30, window_hours=72,
+                 concurrency=4, max_per_run=20, dry_run=False, provider=None, dns_timeout=300):
+    """执行一轮续期：更新计划，并以有限并发续期已到时间的证书"""
+    from concurrent.futures import ThreadPoolExecutor
+    config_home = f'{home_dir}/data'
+    state_file = state_file or os.path.join(config_home, 'renew_schedule.json')
+    schedule = plan_renewals(config_home, load_schedule(state_file), renew_days, window_hours)
+    now = time.time()
+    due = sorted((d for d, e in schedule.items() if e['renew_at'] <= now), key=lambda d: schedule[d]['renew_at'])
+    for domain in sorted(schedule, key=lambda d: schedule[d]['renew_at']):
+        entry = schedule[domain]
+        color = 'yellow' if domain in due else 'cyan'
+        expires = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['not_after'])) if entry['not_after'] else '未知'
+        print_message(f"{domain}: 到期 {expires}，"
+                      f"计划续期 {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['renew_at']))}", color)
+    batch = due[:max_per_run]
+    if len(due) > len(batch):
+        print_message(f"本轮只续期 {len(batch)} 个，其余 {len(due) - len(batch)} 个留到下一轮。", 'yellow')
+    if dry_run or not batch:
+        save_schedule(state_file, schedule)
+        return []
+
+    if provider:
+        native = native_dns_issue(batch, provider, home_dir, concurrency, dns_timeout, renew=True,
+                                  ecc={domain: schedule[domain]['ecc'] for domain in batch})
+        # 跳过 (acme.sh 返回 2) 不按失败退避，次日随计划重新检查
+        outcomes = [(r['domain'], r['status'] != 'failed', r['message']) for r in native]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = [(domain,) + outcome for domain, outcome in
+                        zip(batch, executor.map(lambda d: _renew_one(d, schedule[d]['ecc'], home_dir), batch))]
+
+    results = []
+    for domain, ok, message in outcomes:
+        entry = schedule[domain]
+        if ok:
+            entry['failures'] = 0
+            entry['last_renewed'] = int(time.time())
+            # 新证书的到期时间在下一轮读取后重新计划，此前不再重复续期
+            entry['renew_at'] = int(time.time() + 86400)
+            print_message(f"{domain}: 续期成功", 'green')
+        else:
+            # 失败后按指数退避重试，最长间隔一天
+            entry['failures'] = entry.get('failures', 0) + 1
+            entry['renew_at'] = int(time.time() + min(86400, 3600 * 2 ** (entry['failures'] - 1)))
+            print_message(f"{domain}: 续期失败 {message}", 'red')
+        results.append((domain, ok))
+        save_schedule(state_file, schedule)
+    return results
+
+RENEW_CRON_FILE = '/etc/cron.d/acme-py-renew'
+
+def install_renew_cron(home_dir, argv):
+    """将脚本复制到安装目录并创建每小时执行一次续期的 cron 任务，argv 为脚本之后的完整参数"""
+    import shlex
+    script_path = install_script(home_dir)
+    minute = random.randint(0, 59)
+    # cron 默认的 PATH 只有 /usr/bin:/bin，找不到 /usr/local/bin 下的 acme.sh
+    path_dirs = [os.path.dirname(ACME_SYMLINK), home_dir, '/usr/local/sbin', '/usr/sbin', '/usr/bin', '/sbin', '/bin']
+    with open(RENEW_CRON_FILE, 'w') as f:
+        f.write(f"PATH={':'.join(dict.fromkeys(path_dirs))}\n")
+        f.write(f"{minute} * * * * root {shlex.join([sys.executable, script_path] + argv)} "
+                f">> {shlex.quote(os.path.join(home_dir, 'renew.log'))} 2>&1\n")
+    print_message(f"已创建续期任务 {RENEW_CRON_FILE}，每小时第 {minute} 分钟执行。", 'green')
+
+def renew_main(args):
+    """renew 子命令入口"""
+    if args.install_cron:
+        home_dir = os.path.abspath(args.home)
+        argv = []
+        if args.run_report:
+            argv += ['--run-report', os.path.abspath(args.run_report)]
+        if args.prom_file:
+            argv += ['--prom-file', os.path.abspath(args.prom_file)]
+        argv += ['renew', '--home', home_dir, '--renew-days', str(args.renew_days),
+                 '--window-hours', str(args.window_hours), '-j', str(args.concurrency),
+                 '--max-per-run', str(args.max_per_run)]
+        if args.state:
+            argv += ['--state', os.path.abspath(args.state)]
+        if args.targets:
+            argv += ['--targets', os.path.abspath(args.targets)]
+        if args.provider:
+            argv += ['--provider', args.provider]
+        install_renew_cron(home_dir, argv)
+        return
+    with phase('renew'):
+        results = run_renewals(args.home, args.state, args.renew_days, args.window_hours,
+                               args.concurrency, args.max_per_run, args.dry_run, args.provider)
+    renewed = [domain for domain, ok in results if ok]
+    if renewed and args.targets:
+        with phase('deploy'):
+            deploy_certificates(renewed, args.home, load_targets(args.targets))
+    sys.exit(1 if any(not ok for _, ok in results) else 0)
+
+def load_targets(targets_file):
+    """读取部署目标清单，每项为 dir (本地目录) 或 docker (容器内目录)，并带有 reload 命令"""
+    with open(targets_file, 'r') as f:
+        targets = json.load(f)
+    for target in targets:
+        target.setdefault('type', 'dir')
+        if target['type'] not in ('dir', 'docker') or not target.get('path'):
+            raise ValueError(f"无效的部署目标: {target}")
+        if target['type'] == 'docker':
+            if not target.get('container'):
+                raise ValueError(f"docker 部署目标缺少 container: {target}")
+            target.setdefault('name', f"{target['container']}:{target['path']}")
+        target.setdefault('name', target['path'])
+    return targets
+
+def _read_target_file(target, path):
+    """读取部署目标上的文件内容，不存在时返回 None"""
+    if target['type'] == 'docker':
+        result = run_command(['docker', 'exec', target['container'], 'cat', path], check=False, capture=True)
+        return result.stdout if result.returncode == 0 else None
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read()
+
+def _write_target_file(target, path, source, mode):
+    """先写入临时文件再重命名，保证部署目标上不会出现写了一半的证书"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    if target['type'] == 'docker':
+        run_command(['docker', 'cp', source, f"{target['container']}:{tmp_path}"], silent=True)
+        run_command(['docker', 'exec', target['container'], 'chmod', f'{mode:o}', tmp_path], silent=True)
+        run_command(['docker', 'exec', target['container'], 'mv', '-f', tmp_path, path], silent=True)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 创建时即指定权限，私钥不会以 umask 权限短暂存在；之后的 chmod 只用于还原被 umask 收窄的证书权限
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(tmp_path)
+    with open(source, 'rb') as src, os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode), 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+def fingerprint(content):
+    """证书或私钥内容的 sha256 指纹"""
+    return hashlib.sha256(content.encode()).hexdigest() if content is not None else None
+
+def deploy_to_target(target, domains, certs, reload_state=None):
+    """将一批域名的证书部署到一个目标，只写入有变化的文件，最后只执行一次 reload。
+    reload_state 记录已写入但尚未重载成功的目标，重新运行时即使文件无变化也会再次重载"""
+    reload_state = reload_state or DeployState(None)
+    changed = []
+    for domain in domains:
+        cert_file, _ = certs[domain]
+        cert_dir = os.path.dirname(cert_file)
+        files = [
+            (os.path.join(cert_dir, f'{domain}.key'), f'{domain}.key', 0o600),
+            (os.path.join(cert_dir, 'fullchain.cer'), f'{domain}.cer', 0o644),
+        ]
+        for source, name, mode in files:
+            dest = os.path.join(target['path'], name)
+            with open(source, 'r') as f:
+                wanted = fingerprint(f.read())
+            if fingerprint(_read_target_file(target, dest)) == wanted:
+                continue
+            if target.get('reload') and not changed:
+                reload_state.mark(target['name'], True)
+            _write_target_file(target, dest, source, mode)
+            changed.append(name)
+    reloaded = None
+    if target.get('reload') and (changed or reload_state.pending(target['name'])):
+        reloaded = run_command(['sh', '-c', target['reload']], check=False, capture=True).returncode == 0
+        if reloaded:
+            reload_state.mark(target['name'], False)
+    return {'target': target['name'], 'changed': changed, 'reloaded': reloaded}
+
+class DeployState:
+    """部署目标的待重载状态，保存在 <home>/data/deploy_state.json，供各部署线程共用"""
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.lock = threading.Lock()
+        self.targets = load_schedule(state_file) if state_file else {}
+
+    def pending(self, name):
+        with self.lock:
+            return self.targets.get(name, {}).get('reload_pending', False)
+
+    def mark(self, name, pending):
+        with self.lock:
+            if pending:
+                self.targets[name] = {'reload_pending': True, 'since': int(time.time())}
+            elif self.targets.pop(name, None) is None:
+                return
+            if self.state_file:
+                save_schedule(self.state_file, self.targets)
+
+def deploy_certificates(domains, home_dir, targets, workers=8):
+    """并行部署到所有目标，返回每个目标的部署结果"""
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    certs = find_certificates(f'{home_dir}/data')
+    missing = [domain for domain in domains if domain not in certs]
+    if missing:
+        print_message(f"以下域名没有已签发的证书: {', '.join(missing)}", 'red')
+    domains = [domain for domain in domains if domain in certs]
+    reload_state = DeployState(os.path.join(home_dir, 'data', 'deploy_state.json'))
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as executor:
+        futures = {executor.submit(deploy_to_target, target, domains, certs, reload_state): target
+                   for target in targets}
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'target': target['name'], 'changed': [], 'reloaded': False, 'error': str(e)}
+            if result.get('error') or result['reloaded'] is False:
+                print_message(f"{result['target']}: 部署或重载失败 {result.get('error', '')}", 'red')
+            elif result['changed']:
+                print_message(f"{result['target']}: 更新 {len(result['changed'])} 个文件，已重载一次", 'green')
+            elif result['reloaded']:
+                print_message(f"{result['target']}: 补做上次失败的重载", 'green')
+            else:
+                print_message(f"{result['target']}: 证书无变化，跳过重载", 'yellow')
+            results.append(result)
+    return results
+
+def deploy_main(args):
+    """deploy 子命令入口"""
+    targets = load_targets(args.targets)
+    domains = read_domains(args.domains, args.file) or sorted(find_certificates(f'{args.home}/data'))
+    with phase('deploy'):
+        results = deploy_certificates(domains, args.home, targets, args.workers)
+    sys.exit(1 if any(r.get('error') or r['reloaded'] is False for r in results) else 0)
+
+def parse_args(argv=None):
+    """解析命令行参数，不带子命令时进入交互模式。"""
+    parser = argparse.ArgumentParser(description="acme.sh 泛域名证书申请脚本")
+    parser.add_argument('--run-report', help="将各阶段与各命令的耗时以 JSON 写入该文件")
+    parser.add_argument('--prom-file', help="将耗时指标写入 Prometheus textfile collector 文件")
+    subparsers = parser.add_subparsers(dest='command')
+
+    batch = subparsers.add_parser('batch', help="非交互式批量并发签发证书")
+    batch.add_argument('domains', nargs='*', help="要签发证书的域名，如 exp.com")
+    batch.add_argument('-f', '--file', help="域名列表文件，每行一个域名")
+    batch.add_argument('--email', required=True, help="用于注册 ACME 账户的邮箱")
+    batch.add_argument('--home', default='/home/acme', help="acme.sh 安装目录 (默认 /home/acme)")
+    batch.add_argument('--dns', default='dns_ali', help="acme.sh DNS 插件 (默认 dns_ali)，凭据从环境变量读取")
+    batch.add_argument('-j', '--workers', type=int, default=8, help="并发签发的最大数量 (默认 8)")
+    batch.add_argument('--report', help="将每个域名的结果以 JSON 写入该文件")
+    batch.add_argument('--provider', choices=sorted(DNS_PROVIDERS),
+                       help="直接调用 DNS API 的插件 (批量添加/删除记录)，指定后忽略 --dns")
+    batch.add_argument('--dns-timeout', type=int, default=300, help="主动轮询 DNS 记录生效的最长秒数 (默认 300)")
+    batch.add_argument('--resolvers', help="除权威 DNS 外还需确认生效的递归 DNS，逗号分隔")
+    batch.add_argument('--no-poll-dns', action='store_true', help="不主动轮询，使用 acme.sh 自身的等待")
+
+    wait_dns = subparsers.add_parser('wait-dns', help="轮询权威 DNS 直到 TXT 记录全部生效 (供 dns_acmepy 插件调用)")
+    wait_dns.add_argument('records', nargs='*', help="要等待的记录，格式为 域名=值")
+    wait_dns.add_argument('--file', help="从文件读取记录，每行一条 域名=值")
+    wait_dns.add_argument('--timeout', type=int, default=300, help="最长等待秒数 (默认 300)")
+    wait_dns.add_argument('--resolvers', default='', help="额外确认的递归 DNS，逗号分隔")
+
+    renew = subparsers.add_parser('renew', help="按证书到期时间分散、限流地续期证书")
+    renew.add_argument('--home', default='/home/acme', help="acme.sh 安装目录 (默认 /home/acme)")
+    renew.add_argument('--state', help="续期计划状态文件 (默认 <home>/data/renew_schedule.json)")
+    renew.add_argument('--renew-days', type=int, default=30, help="到期前多少天开始续期 (默认 30)")
+    renew.add_argument('--window-hours', type=int, default=72, help="续期时间随机分散的窗口小时数 (默认 72)")
+    renew.add_argument('-j', '--concurrency', type=int, default=4, help="同时进行的续期数量上限 (默认 4)")
+    renew.add_argument('--max-per-run', type=int, default=20, help="每轮最多续期的证书数量 (默认 20)")
+    renew.add_argument('--dry-run', action='store_true', help="只显示续期计划")
+    renew.add_argument('--install-cron', action='store_true', help="安装每小时执行一次的续期 cron 任务")
+    renew.add_argument('--provider', choices=sorted(DNS_PROVIDERS),
+                       help="使用 DNS API 插件批量续期 (用于通过 batch --provider 签发的证书)")
+    renew.add_argument('--targets', help="续期成功后批量部署到该清单中的目标")
+
+    deploy = subparsers.add_parser('deploy', help="将证书批量部署到多个目标，每个目标只重载一次")
+    deploy.add_argument('domains', nargs='*', help="要部署的域名，默认为全部已签发的域名")
+    deploy.add_argument('-f', '--file', help="域名列表文件，每行一个域名")
+    deploy.add_argument('--targets', required=True, help="JSON 格式的部署目标清单")
+    deploy.add_argument('--home', default='/home/acme', help="acme.sh 安装目录 (默认 /home/acme)")
+    deploy.add_argument('-j', '--workers', type=int, default=8, help="同时部署的目标数量 (默认 8)")
+    return parser.parse_args(argv)
+
+def cli(args):
+    """按子命令分发"""
+    if args.command == 'batch':
+        batch_main(args)
+    elif args.command == 'wait-dns':
+        records = list(args.records)
+        if args.file:
+            with open(args.file, 'r') as f:
+                records += [line.strip() for line in f if line.strip()]
+        records = list(dict.fromkeys(tuple(r.split('=', 1)) for r in records))
+        resolvers = [r for r in args.resolvers.split(',') if r]
+        sys.exit(0 if wait_for_txt(records, resolvers, args.timeout) else 1)
+    elif args.command == 'renew':
+        renew_main(args)
+    elif args.command == 'deploy':
+        deploy_main(args)
+    else:
+        main()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    REPORT_PATH = args.run_report or REPORT_PATH
+    PROM_PATH = args.prom_file or PROM_PATH
+    run_with_report(cli, args)
@@ -0,0 +1,297 @@
+import os
+import sys
+import json
+import time
+import shlex
+import asyncio
+import argparse
+import statistics
+try:
+    from termcolor import colored
+except ImportError:
+    # termcolor 为可选依赖，未安装时输出无颜色文本
+    def colored(text, color=None, *args, **kwargs):
+        return text
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def print_message(message, color='green'):
+    """打印彩色信息"""
+    print(colored(message, color))
+
+def parse_host(entry, defaults):
+    """把清单中的一项 ([user@]host[:port] 字符串或对象) 规范化为主机配置"""
+    if isinstance(entry, str):
+        entry = {'host': entry}
+    host = dict(defaults, **entry)
+    address = host['host']
+    if '@' in address:
+        host['user'], address = address.split('@', 1)
+    if address.count(':') == 1:
+        address, host['port'] = address.split(':')
+    host['host'] = address
+    host.setdefault('name', address)
+    return host
+
+def load_inventory(path):
+    """读取主机清单：JSON ({"defaults": {...}, "hosts": [...]}) 或每行一个 [user@]host[:port] 的文本"""
+    with open(path, 'r') as f:
+        content = f.read()
+    if content.lstrip().startswith(('{', '[')):
+        data = json.loads(content)
+        if isinstance(data, list):
+            data = {'hosts': data}
+    else:
+        data = {'hosts': [line.split('#')[0].strip() for line in content.splitlines() if line.split('#')[0].strip()]}
+    hosts = [parse_host(entry, data.get('defaults', {})) for entry in data['hosts']]
+    names = [host['name'] for host in hosts]
+    duplicated = {name for name in names if names.count(name) > 1}
+    if duplicated:
+        raise ValueError(f"清单中主机名称重复: {', '.join(sorted(duplicated))}")
+    return hosts
+
+def load_task(path):
+    """读取任务配置：要执行的脚本、非交互参数、需要上传的文件与环境变量"""
+    with open(path, 'r') as f:
+        task = json.load(f)
+    if not task.get('script'):
+        raise ValueError("任务配置缺少 script")
+    base = os.path.dirname(os.path.abspath(path))
+    script = os.path.join(base, task['script'])
+    if not os.path.exists(script):
+        # 只写脚本名时使用与 fleet.py 同目录的 acme.py / ossfs.py
+        script = os.path.join(SCRIPT_DIR, task['script'])
+    task['script'] = script
+    task['files'] = {remote: local if os.path.isabs(local) else os.path.join(base, local)
+                     for remote, local in task.get('files', {}).items()}
+    for local in [task['script']] + list(task['files'].values()):
+        if not os.path.exists(local):
+            raise ValueError(f"文件不存在: {local}")
+    task.setdefault('args', [])
+    task.setdefault('env', {})
+    task.setdefault('sudo', True)
+    task.setdefault('workdir', '/tmp/debian-script')  # 主机清单中可按主机覆盖
+    return task
+
+class HostRunner:
+    """在单台主机上通过 ssh/scp 上传脚本与文件并执行，记录每一步的耗时与输出"""
+
+    def __init__(self, host, task, log_dir, ssh='ssh', scp='scp', connect_timeout=10, timeout=1800):
+        self.host = host
+        self.task = task
+        self.log_path = os.path.join(log_dir, f"{host['name']}.log")
+        self.report_path = os.path.join(log_dir, f"{host['name']}.run-report.json")
+        self.ssh = shlex.split(ssh)
+        self.scp = shlex.split(scp)
+        self.timeout = timeout
+        # 同一主机的多次 ssh/scp 复用一个 ControlMaster 连接
+        self.options = ['-o', 'BatchMode=yes', '-o', f'ConnectTimeout={connect_timeout}',
+                        '-o', f"StrictHostKeyChecking={host.get('host_key_checking', 'accept-new')}",
+                        '-o', 'ControlMaster=auto', '-o', 'ControlPersist=60',
+                        '-o', f"ControlPath={os.path.join(log_dir, '.ssh-%C')}"]
+        if host.get('identity'):
+            self.options += ['-i', os.path.expanduser(host['identity'])]
+        self.options += host.get('ssh_options', [])
+        self.target = f"{host['user']}@{host['host']}" if host.get('user') else host['host']
+        self.workdir = host.get('workdir', task['workdir'])
+
+    async def _exec(self, step, command, log):
+        start = time.monotonic()
+        log.write(f"$ {' '.join(shlex.quote(part) for part in command)}\n")
+        log.flush()
+        process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.DEVNULL,
+                                                       stdout=log, stderr=asyncio.subprocess.STDOUT)
+        try:
+            returncode = await asyncio.wait_for(process.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            returncode = 'timeout'
+        seconds = round(time.monotonic() - start, 3)
+        log.write(f"[{step}] 退出码 {returncode}，耗时 {seconds}s\n")
+        return step, returncode, seconds
+
+    def ssh_command(self, remote):
+        port = ['-p', str(self.host['port'])] if self.host.get('port') else []
+        return self.ssh + self.options + port + [self.target, remote]
+
+    def scp_command(self, sources, remote_dir):
+        port = ['-P', str(self.host['port'])] if self.host.get('port') else []
+        return self.scp + ['-q'] + self.options + port + list(sources) + [f"{self.target}:{remote_dir}/"]
+
+    def remote_command(self):
+        workdir = self.workdir
+        script = os.path.basename(self.task['script'])
+        args = ['--run-report', f'{workdir}/run-report.json'] + [str(arg) for arg in self.task['args']]
+        run = f"python3 {shlex.quote(script)} {' '.join(shlex.quote(arg) for arg in args)}"
+        sudo = 'sudo -E ' if self.task['sudo'] and self.host.get('user') != 'root' else ''
+        # 环境变量 (如 DNS API 密钥) 放在权限为 600 的文件中读取，不出现在远端进程参数里
+        env = "set -a; . ./fleet.env; set +a; rm -f fleet.env; " if self.task['env'] else ''
+        return f"cd {shlex.quote(workdir)} && {env}{sudo}{run}"
+
+    async def run(self, attempt):
+        """执行一次完整流程，返回各步骤结果；任一步失败即停止"""
+        task = self.task
+        workdir = self.workdir
+        steps = []
+        with open(self.log_path, 'a') as log:
+            log.write(f"==== {self.host['name']} 第 {attempt} 次尝试 {time.strftime('%Y-%m-%d %H:%M:%S')} ====\n")
+            env_file = None
+            if task['env']:
+                env_file = os.path.join(os.path.dirname(self.log_path), f".{self.host['name']}.fleet.env")
+                fd = os.open(env_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'w') as f:
+                    f.writelines(f"{key}={shlex.quote(str(value))}\n" for key, value in task['env'].items())
+            try:
+                commands = [('connect', self.ssh_command(f"mkdir -p {shlex.quote(workdir)} && chmod 700 {shlex.quote(workdir)}"))]
+                uploads = [task['script']] + list(task['files'].values())
+                commands.append(('upload', self.scp_command(uploads, workdir)))
+                # files 的键为远端路径 (相对 workdir 或绝对路径，如 passwd-ossfs 的位置)
+                renames = [f"mkdir -p {shlex.quote(os.path.dirname(remote) or '.')} && "
+                           f"mv -f {shlex.quote(os.path.basename(local))} {shlex.quote(remote)}"
+                           for remote, local in task['files'].items() if os.path.basename(local) != remote]
+                if env_file:
+                    commands.append(('upload_env', self.scp_command([env_file], workdir)))
+                    renames.append(f"mv -f {shlex.quote(os.path.basename(env_file))} fleet.env")
+                if renames:
+                    commands.append(('prepare', self.ssh_command(f"cd {shlex.quote(workdir)} && " + ' && '.join(renames))))
+                commands.append(('run', self.ssh_command(self.remote_command())))
+                for step, command in commands:
+                    steps.append(await self._exec(step, command, log))
+                    if steps[-1][1] != 0:
+                        break
+                else:
+                    # 取回远端的运行报告 (各阶段耗时)，失败不影响结果
+                    port = ['-P', str(self.host['port'])] if self.host.get('port') else []
+                    await self._exec('fetch_report', self.scp + ['-q'] + self.options + port +
+                                     [f"{self.target}:{workdir}/run-report.json", self.report_path], log)
+            finally:
+                if env_file and os.path.exists(env_file):
+                    os.remove(env_file)
+                if env_file and any(step == 'upload_env' for step, _, _ in steps) and \
+                        not any(step == 'run' and code == 0 for step, code, _ in steps):
+                    # 远端命令在执行脚本前就会删除 fleet.env；没有走到那一步时单独删除，避免密钥留在远端
+                    await self._exec('cleanup', self.ssh_command(
+                        f"cd {shlex.quote(workdir)} && rm -f fleet.env {shlex.quote(os.path.basename(env_file))}"), log)
+        return steps
+
+async def run_host(runner, semaphore, retries, retry_delay, progress):
+    """在并发上限内执行单台主机，失败时按指数退避重试"""
+    result = {'host': runner.host['name'], 'status': 'failed', 'attempts': 0, 'steps': [], 'log': runner.log_path}
+    start = time.monotonic()
+    for attempt in range(1, retries + 2):
+        async with semaphore:
+            result['attempts'] = attempt
+            try:
+                steps = await runner.run(attempt)
+            except OSError as e:
+                steps = [('spawn', str(e), 0)]
+        result['steps'] = [{'step': step, 'returncode': code, 'seconds': seconds} for step, code, seconds in steps]
+        if steps and all(code == 0 for _, code, _ in steps) and steps[-1][0] == 'run':
+            result['status'] = 'ok'
+            result.pop('error', None)
+            break
+        failed = steps[-1] if steps else ('?', '?', 0)
+        result['error'] = f"{failed[0]} 退出码 {failed[1]}"
+        if attempt <= retries:
+            await asyncio.sleep(retry_delay * 2 ** (attempt - 1))
+    result['seconds'] = round(time.monotonic() - start, 3)
+    if os.path.exists(runner.report_path):
+        with open(runner.report_path, 'r') as f:
+            result['phases'] = {item['name']: item['seconds'] for item in json.load(f).get('phases', [])}
+    progress(result)
+    return result
+
+async def run_fleet(hosts, task, log_dir, concurrency=20, retries=1, retry_delay=5, ssh='ssh', scp='scp',
+                    connect_timeout=10, timeout=1800):
+    """并发在所有主机上执行任务，返回每台主机的结果"""
+    os.makedirs(log_dir, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    done = []
+
+    def progress(result):
+        done.append(result)
+        color = 'green' if result['status'] == 'ok' else 'red'
+        detail = '' if result['status'] == 'ok' else f" ({result.get('error')}，日志 {result['log']})"
+        print_message(f"[{len(done)}/{len(hosts)}] {result['host']}: {result['status']} "
+                      f"{result['seconds']}s，尝试 {result['attempts']} 次{detail}", color)
+
+    runners = [HostRunner(host, task, log_dir, ssh, scp, connect_timeout, timeout) for host in hosts]
+    return await asyncio.gather(*(run_host(runner, semaphore, retries, retry_delay, progress) for runner in runners))
+
+def summarize(results, wall_seconds):
+    """汇总成功/失败数量与耗时分布"""
+    ok = [r for r in results if r['status'] == 'ok']
+    failed = [r for r in results if r['status'] != 'ok']
+    durations = sorted(r['seconds'] for r in ok)
+    summary = {
+        'hosts': len(results), 'ok': len(ok), 'failed': len(failed),
+        'retried': sum(1 for r in results if r['attempts'] > 1),
+        'wall_seconds': round(wall_seconds, 3),
+        'failed_hosts': [r['host'] for r in failed],
+    }
+    if durations:
+        summary['host_seconds'] = {
+            'p50': durations[len(durations) // 2],
+            'p95': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            'max': durations[-1],
+            'mean': round(statistics.mean(durations), 3),
+        }
+    phases = {}
+    for result in ok:
+        for name, seconds in result.get('phases', {}).items():
+            phases.setdefault(name, []).append(seconds)
+    if phases:
+        summary['phase_seconds_p50'] = {name: sorted(values)[len(values) // 2] for name, values in phases.items()}
+    return summary
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="通过 SSH 在多台主机上并发执行 acme.py / ossfs.py 的非交互流程")
+    parser.add_argument('inventory', help="主机清单 (JSON 或每行一个 [user@]host[:port])")
+    parser.add_argument('task', help="任务配置 JSON：script、args、files、env、sudo、workdir")
+    parser.add_argument('-j', '--concurrency', type=int, default=20, help="同时执行的主机数 (默认 20)")
+    parser.add_argument('--retries', type=int, default=1, help="失败主机的重试次数 (默认 1)")
+    parser.add_argument('--retry-delay', type=float, default=5, help="首次重试前等待的秒数，之后按指数退避 (默认 5)")
+    parser.add_argument('--timeout', type=float, default=1800, help="单个步骤的超时秒数 (默认 1800)")
+    parser.add_argument('--connect-timeout', type=int, default=10, help="SSH 连接超时秒数 (默认 10)")
+    parser.add_argument('--limit', nargs='+', help="只在这些主机名上执行")
+    parser.add_argument('--log-dir', help="每台主机日志的目录 (默认 fleet-logs/<时间>)")
+    parser.add_argument('--report', help="将每台主机的结果与汇总写入该 JSON 文件")
+    parser.add_argument('--ssh', default='ssh', help="ssh 命令 (默认 ssh)")
+    parser.add_argument('--scp', default='scp', help="scp 命令 (默认 scp)")
+    return parser.parse_args(argv)
+
+def main(args):
+    hosts = load_inventory(args.inventory)
+    if args.limit:
+        hosts = [host for host in hosts if host['name'] in args.limit]
+    if not hosts:
+        print_message("没有需要执行的主机。", 'red')
+        sys.exit(1)
+    task = load_task(args.task)
+    log_dir = args.log_dir or os.path.join('fleet-logs', time.strftime('%Y%m%d-%H%M%S'))
+    print_message(f"在 {len(hosts)} 台主机上执行 {os.path.basename(task['script'])} {' '.join(map(str, task['args']))}，"
+                  f"并发 {args.concurrency}，日志目录 {log_dir}", 'cyan')
+    start = time.monotonic()
+    results = asyncio.run(run_fleet(hosts, task, log_dir, args.concurrency, args.retries, args.retry_delay,
+                                    args.ssh, args.scp, args.connect_timeout, args.timeout))
+    summary = summarize(results, time.monotonic() - start)
+    print_message(f"完成: {summary['ok']}/{summary['hosts']} 台成功，{summary['failed']} 台失败，"
+                  f"{summary['retried']} 台经过重试，总耗时 {summary['wall_seconds']}s",
+                  'green' if not summary['failed'] else 'red')
+    if summary.get('host_seconds'):
+        print_message(f"单台耗时 p50 {summary['host_seconds']['p50']}s，p95 {summary['host_seconds']['p95']}s，"
+                      f"最长 {summary['host_seconds']['max']}s", 'cyan')
+    for name, seconds in summary.get('phase_seconds_p50', {}).items():
+        print(f"  {name}: p50 {seconds}s")
+    if summary['failed']:
+        print_message(f"失败主机: {', '.join(summary['failed_hosts'])}", 'red')
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'summary': summary, 'hosts': results}, f, ensure_ascii=False, indent=2)
+        print_message(f"结果已写入 {args.report}", 'green')
+    if summary['failed']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(parse_args())
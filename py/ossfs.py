@@ -1,19 +1,39 @@
 import os
 import subprocess
 from urllib.parse import urlparse
-import socket
-from termcolor import colored
-import requests
+import sys
+import shutil
+import time
+import random
+import glob
+import json
+import argparse
+import re
+import hashlib
+import threading
+import contextlib
+try:
+    from termcolor import colored
+except ImportError:
+    # termcolor 为可选依赖，未安装时输出无颜色文本
+    def colored(text, color=None, *args, **kwargs):
+        return text
 
 
 def print_message(message, color='green'):
     """打印彩色信息"""
     print(colored(message, color))
 
-def get_user_input(prompt, default=None, required=False):
-    """获取用户输入并显示为青色"""
+def get_user_input(prompt, default=None, required=False, secret=False):
+    """获取用户输入并显示为青色，secret=True 的输入 (密钥、密码) 录制时不落盘"""
     while True:
+        start = time.monotonic()
         user_input = input(colored(prompt, 'cyan')).strip()
+        # 录制实际生效的值 (含默认值)
+        answer = user_input or (default if default is not None else '')
+        if answer and secret:
+            answer = '<redacted>'
+        record_event({'type': 'input', 'prompt': prompt, 'answer': answer, 'seconds': round(time.monotonic() - start, 3)})
         if user_input:
             return user_input
         if default is not None:
@@ -26,34 +46,348 @@ def create_directory(path):
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
 
-def run_command(command, check=True, silent=False):
-    """运行系统命令"""
+# 运行报告：记录每个阶段与每条命令的耗时，可通过环境变量或 --run-report/--prom-file 输出
+RUN_REPORT = {'script': os.path.basename(__file__), 'phases': [], 'commands': []}
+REPORT_PATH = os.environ.get('DEBIAN_SCRIPT_REPORT')
+PROM_PATH = os.environ.get('DEBIAN_SCRIPT_PROM')
+_run_started = time.time()
+_report_lock = threading.Lock()
+# 每个线程有自己的阶段栈，主线程的栈同时作为工作线程的默认阶段
+_phase_state = threading.local()
+_main_phase_stack = []
+
+# 录制：设置 DEBIAN_SCRIPT_RECORD 后，每次输入、命令和下载 (含耗时) 追加到该 JSON Lines 文件，供 replay.py 回放
+RECORD_PATH = os.environ.get('DEBIAN_SCRIPT_RECORD')
+_record_state = threading.local()
+_record_started = False
+
+def record_event(event):
+    """录制模式下追加一条事件，每个进程的第一条事件前写入脚本名与参数"""
+    global _record_started
+    if not RECORD_PATH or getattr(_record_state, 'paused', False):
+        return
+    with _report_lock:
+        with open(RECORD_PATH, 'a') as f:
+            if not _record_started:
+                _record_started = True
+                f.write(json.dumps({'type': 'start', 'script': RUN_REPORT['script'], 'argv': sys.argv[1:]}) + '\n')
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+def _phase_stack():
+    """当前线程的阶段栈"""
+    stack = getattr(_phase_state, 'stack', None)
+    if stack is None:
+        stack = _main_phase_stack if threading.current_thread() is threading.main_thread() else []
+        _phase_state.stack = stack
+    return stack
+
+def current_phase():
+    """当前线程最内层的阶段；线程池中的工作线程没有自己的阶段时归入主线程当前的阶段"""
+    for stack in (_phase_stack(), _main_phase_stack):
+        try:
+            return stack[-1]
+        except IndexError:
+            continue
+    return None
+
+@contextlib.contextmanager
+def phase(name):
+    """记录一个阶段的耗时与结果"""
+    start = time.monotonic()
+    status = 'ok'
+    parent = current_phase()
+    stack = _phase_stack()
+    stack.append(name)
     try:
-        result = subprocess.run(command, check=check, 
-                                stdout=subprocess.DEVNULL if silent else None, 
-                                stderr=subprocess.DEVNULL if silent else None)
+        yield
+    except BaseException:
+        status = 'failed'
+        raise
+    finally:
+        stack.pop()
+        with _report_lock:
+            RUN_REPORT['phases'].append({
+                'name': name, 'parent': parent,
+                'seconds': round(time.monotonic() - start, 3), 'status': status,
+            })
+
+def record_command(command, seconds, returncode, output_bytes):
+    """记录一条命令的耗时、退出码与输出字节数"""
+    with _report_lock:
+        RUN_REPORT['commands'].append({
+            'command': ' '.join(str(part) for part in command),
+            'phase': current_phase(),
+            'seconds': round(seconds, 3), 'returncode': returncode, 'output_bytes': output_bytes,
+        })
+
+def _prom_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+def write_run_report(success):
+    """写入 JSON 运行报告和 Prometheus textfile collector 文件"""
+    RUN_REPORT.update(started=_run_started, seconds=round(time.time() - _run_started, 3), success=success)
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'w') as f:
+            json.dump(RUN_REPORT, f, ensure_ascii=False, indent=2)
+    if not PROM_PATH:
+        return
+    script = _prom_label(RUN_REPORT['script'])
+    lines = [
+        '# HELP debian_script_run_duration_seconds Duration of the whole run.',
+        '# TYPE debian_script_run_duration_seconds gauge',
+        f'debian_script_run_duration_seconds{{script="{script}"}} {RUN_REPORT["seconds"]}',
+        '# HELP debian_script_run_success Whether the last run succeeded.',
+        '# TYPE debian_script_run_success gauge',
+        f'debian_script_run_success{{script="{script}"}} {int(success)}',
+        '# HELP debian_script_run_timestamp_seconds When the last run finished.',
+        '# TYPE debian_script_run_timestamp_seconds gauge',
+        f'debian_script_run_timestamp_seconds{{script="{script}"}} {int(time.time())}',
+    ]
+    # 同名阶段 (如多个挂载、多个线程) 合并为一条时间序列，避免重复的标签组合
+    phases = {}
+    for item in RUN_REPORT['phases']:
+        key = (item['name'], item['status'])
+        count, seconds = phases.get(key, (0, 0))
+        phases[key] = (count + 1, seconds + item['seconds'])
+    lines += ['# HELP debian_script_phase_duration_seconds Total duration of each phase.',
+              '# TYPE debian_script_phase_duration_seconds gauge']
+    lines += [f'debian_script_phase_duration_seconds{{script="{script}",phase="{_prom_label(n)}",'
+              f'status="{st}"}} {round(s, 3)}' for (n, st), (_, s) in sorted(phases.items())]
+    lines += ['# HELP debian_script_phase_runs Number of times each phase ran.',
+              '# TYPE debian_script_phase_runs gauge']
+    lines += [f'debian_script_phase_runs{{script="{script}",phase="{_prom_label(n)}",'
+              f'status="{st}"}} {c}' for (n, st), (c, _) in sorted(phases.items())]
+    # 按阶段和程序名聚合，避免标签基数过大
+    totals = {}
+    for item in RUN_REPORT['commands']:
+        parts = item['command'].split()
+        program = parts[1] if parts[0] == 'sudo' and len(parts) > 1 else parts[0]
+        key = (item['phase'] or '', os.path.basename(program))
+        count, seconds = totals.get(key, (0, 0))
+        totals[key] = (count + 1, seconds + item['seconds'])
+    lines += ['# HELP debian_script_command_duration_seconds Total time spent in subprocesses.',
+              '# TYPE debian_script_command_duration_seconds gauge']
+    lines += [f'debian_script_command_duration_seconds{{script="{script}",phase="{_prom_label(p)}",'
+              f'program="{_prom_label(c)}"}} {round(s, 3)}' for (p, c), (_, s) in sorted(totals.items())]
+    lines += ['# HELP debian_script_commands Number of subprocesses run.',
+              '# TYPE debian_script_commands gauge']
+    lines += [f'debian_script_commands{{script="{script}",phase="{_prom_label(p)}",'
+              f'program="{_prom_label(c)}"}} {n}' for (p, c), (n, _) in sorted(totals.items())]
+    tmp_path = f"{PROM_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, PROM_PATH)
+
+def run_with_report(func, *args):
+    """执行入口函数，结束时按需写入运行报告"""
+    success = False
+    try:
+        func(*args)
+        success = True
+    except SystemExit as e:
+        success = e.code in (0, None)
+        raise
+    finally:
+        if REPORT_PATH or PROM_PATH:
+            write_run_report(success)
+
+def run_command(command, check=True, silent=False, cwd=None, capture=False, env=None):
+    """运行系统命令，capture=True 时合并收集 stdout/stderr 到 result.stdout；开启运行报告时统计输出字节数"""
+    measure = capture or bool(REPORT_PATH or PROM_PATH)
+    start = time.monotonic()
+    try:
+        if measure and not capture and not silent:
+            # 一边原样输出，一边统计字节数
+            process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            output_bytes = 0
+            for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                sys.stdout.buffer.write(chunk)
+                sys.stdout.flush()
+                output_bytes += len(chunk)
+            result = subprocess.CompletedProcess(command, process.wait())
+        else:
+            if measure:
+                stdout, stderr = subprocess.PIPE, subprocess.STDOUT
+            else:
+                stdout = subprocess.DEVNULL if silent else None
+                stderr = subprocess.DEVNULL if silent else None
+            result = subprocess.run(command, cwd=cwd, env=env, stdout=stdout, stderr=stderr, text=capture)
+            output_bytes = len(result.stdout.encode() if capture else result.stdout or b'')
+    except OSError as e:
+        record_command(command, time.monotonic() - start, None, 0)
+        record_event({'type': 'command', 'command': [str(part) for part in command], 'cwd': cwd,
+                      'returncode': None, 'error': str(e), 'seconds': round(time.monotonic() - start, 3)})
+        raise
+    record_command(command, time.monotonic() - start, result.returncode, output_bytes)
+    record_event({'type': 'command', 'command': [str(part) for part in command], 'cwd': cwd,
+                  'returncode': result.returncode, 'stdout': result.stdout if capture else None,
+                  'seconds': round(time.monotonic() - start, 3)})
+    try:
+        if check:
+            result.check_returncode()
         return result
     except subprocess.CalledProcessError as e:
         print_message(f"命令执行失败: {e}", 'red')
         raise
 
-def install_required_packages():
-    """安装必要的软件包"""
-    print_message("检查并安装必要的依赖包...", 'cyan')
-    run_command(['sudo', 'apt-get', 'update'])
-    run_command(['sudo', 'apt-get', 'install', '-y', 'wget', 'python3-pip', 'gdebi-core', 'supervisor'])
+# 下载产物的本地缓存，可通过环境变量指定目录、内网镜像地址和容量上限
+ARTIFACT_CACHE = os.environ.get('DEBIAN_SCRIPT_CACHE', '/var/cache/debian-script')
+ARTIFACT_MIRROR = os.environ.get('DEBIAN_SCRIPT_MIRROR')
+ARTIFACT_CACHE_MAX_MB = int(os.environ.get('DEBIAN_SCRIPT_CACHE_MAX_MB', '1024'))
+# 产物固定校验值: 文件名 -> sha256，须从官方发布页核对后填写；
+# DEBIAN_SCRIPT_PINS 可指定 sha256sum 格式的补充清单。默认拒绝没有固定校验值的产物，
+# 避免缓存信任首次下载的内容；DEBIAN_SCRIPT_REQUIRE_PIN=0 时只打印警告
+ARTIFACT_SHA256 = {}
+ARTIFACT_PINS = os.environ.get('DEBIAN_SCRIPT_PINS')
+ARTIFACT_REQUIRE_PIN = os.environ.get('DEBIAN_SCRIPT_REQUIRE_PIN', '1') != '0'
+
+def sha256_file(path):
+    """计算文件的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cached_artifact_valid(path, sha256=None):
+    """校验缓存文件：指定了 sha256 时按其校验，否则按下载时记录的校验值校验"""
+    if not os.path.exists(path):
+        return False
+    if not sha256:
+        sidecar = f"{path}.sha256"
+        if not os.path.exists(sidecar):
+            return False
+        with open(sidecar, 'r') as f:
+            sha256 = f.read().strip()
+    return sha256_file(path) == sha256
+
+def pinned_sha256(name):
+    """返回产物的固定 sha256，DEBIAN_SCRIPT_PINS 清单优先于内置表"""
+    if ARTIFACT_PINS and os.path.exists(ARTIFACT_PINS):
+        with open(ARTIFACT_PINS, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2 and os.path.basename(fields[1].lstrip('*')) == name:
+                    return fields[0].lower()
+    return ARTIFACT_SHA256.get(name)
+
+def evict_artifacts(keep=None):
+    """按最近使用时间淘汰缓存，直到总大小不超过上限"""
+    entries = []
+    for name in os.listdir(ARTIFACT_CACHE):
+        path = os.path.join(ARTIFACT_CACHE, name)
+        if name.endswith(('.sha256', '.part')) or not os.path.isfile(path):
+            continue
+        entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= ARTIFACT_CACHE_MAX_MB * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        os.remove(path)
+        if os.path.exists(f"{path}.sha256"):
+            os.remove(f"{path}.sha256")
+        total -= size
+        print_message(f"已从缓存淘汰: {path}", 'yellow')
+
+def fetch_artifact(url, name=None, sha256=None):
+    """优先从本地缓存、其次从镜像、最后从原地址获取下载产物，返回缓存中的文件路径"""
+    start = time.monotonic()
+    # 下载过程中的 wget 等命令不单独录制，回放时整体替换为本次下载
+    _record_state.paused = True
+    try:
+        path = _fetch_artifact(url, name, sha256)
+    finally:
+        _record_state.paused = False
+    if RECORD_PATH:
+        with open(f"{path}.sha256") as f:
+            digest = f.read().strip()
+        record_event({'type': 'artifact', 'url': url, 'name': os.path.basename(path), 'sha256': digest,
+                      'seconds': round(time.monotonic() - start, 3)})
+    return path
+
+def _fetch_artifact(url, name=None, sha256=None):
+    name = name or urlparse(url).path.split('/')[-1]
+    sha256 = sha256 or pinned_sha256(name)
+    if not sha256:
+        if ARTIFACT_REQUIRE_PIN:
+            raise RuntimeError(f"{name} 没有固定的 sha256，拒绝下载；请从官方发布页核对后通过 DEBIAN_SCRIPT_PINS "
+                               f"指定，或设置 DEBIAN_SCRIPT_REQUIRE_PIN=0 跳过校验")
+        print_message(f"警告: {name} 没有固定的 sha256，仅按首次下载结果校验缓存", 'yellow')
+    os.makedirs(ARTIFACT_CACHE, exist_ok=True)
+    cached = os.path.join(ARTIFACT_CACHE, name)
+    if _cached_artifact_valid(cached, sha256):
+        os.utime(cached)
+        print_message(f"使用缓存: {cached}", 'green')
+        return cached
 
+    sources = [url]
+    if ARTIFACT_MIRROR:
+        sources.insert(0, f"{ARTIFACT_MIRROR.rstrip('/')}/{name}")
+    part = f"{cached}.part"
+    for source in sources:
+        print_message(f"正在下载: {source}", 'cyan')
+        try:
+            if source.startswith('file://') or os.path.isabs(source):
+                shutil.copyfile(urlparse(source).path if source.startswith('file://') else source, part)
+            else:
+                run_command(['wget', '-q', source, '-O', part])
+        except (OSError, subprocess.CalledProcessError) as e:
+            print_message(f"下载失败: {e}", 'yellow')
+            if os.path.exists(part):
+                os.remove(part)
+            continue
+        digest = sha256_file(part)
+        if sha256 and digest != sha256:
+            print_message(f"校验失败: {source} 的 sha256 为 {digest}，期望 {sha256}", 'red')
+            os.remove(part)
+            continue
+        os.replace(part, cached)
+        with open(f"{cached}.sha256", 'w') as f:
+            f.write(digest + '\n')
+        evict_artifacts(keep=cached)
+        return cached
+    raise RuntimeError(f"无法获取 {name}")
+
+APT_LISTS = '/var/lib/apt/lists'
+APT_LISTS_MAX_AGE = int(os.environ.get('DEBIAN_SCRIPT_APT_MAX_AGE', 86400))
+
+def missing_packages(packages):
+    """返回未安装的软件包 (通过 dpkg-query 判断)"""
+    missing = []
+    for pkg in packages:
+        result = run_command(['dpkg-query', '-W', '-f=${Status}', pkg], check=False, capture=True)
+        if result.returncode != 0 or 'install ok installed' not in result.stdout:
+            missing.append(pkg)
+    return missing
+
+def ensure_packages(packages):
+    """只安装缺失的软件包，软件包列表超过 APT_LISTS_MAX_AGE 秒未更新时才执行 apt-get update"""
+    missing = missing_packages(packages)
+    if not missing:
+        return []
     try:
-        import termcolor
-        print_message("termcolor 已安装", 'green')
-    except ImportError:
-        print_message("安装 termcolor...", 'cyan')
-        run_command(['pip3', 'install', 'termcolor'])
+        fresh = time.time() - os.stat(APT_LISTS).st_mtime < APT_LISTS_MAX_AGE
+    except OSError:
+        fresh = False
+    if not fresh:
+        run_command(['sudo', 'apt-get', 'update'])
+    run_command(['sudo', 'apt-get', 'install', '-y'] + missing)
+    return missing
+
+def install_required_packages():
+    """安装必要的软件包 (已全部安装时跳过 apt-get)"""
+    print_message("检查并安装必要的依赖包...", 'cyan')
+    installed = ensure_packages(['wget', 'gdebi-core', 'supervisor'])
+    if installed:
+        print_message(f"已安装: {' '.join(installed)}", 'green')
 
 
 # 全局变量
 file_path = "/home/supervisord/ossfs"
 supervisor_path = '/home/supervisord'
+SUPERVISOR_ETC_CONF = '/etc/supervisor/supervisord.conf'
 def initialize_globals():
     """初始化全局变量"""
     global file_path
@@ -84,12 +418,10 @@ def install_ossfs():
     )
 
     file_name = urlparse(down_path).path.split('/')[-1]
-    file_full_path = os.path.join("/home", file_name)
 
     print_message(f"正在安装 ossfs, 版本为: {file_name}...", 'cyan')
-    run_command(['sudo', 'wget', down_path, '-O', file_full_path])
-    run_command(['sudo', 'gdebi', '-n', file_full_path])
-    os.remove(file_full_path)
+    deb_path = fetch_artifact(down_path, sha256=os.environ.get('OSSFS_SHA256'))
+    run_command(['sudo', 'gdebi', '-n', deb_path])
     print_message("ossfs 安装完成", 'green')
 
 def configure_ossfs():
@@ -111,8 +443,8 @@ def add_secret_key(passwd_file):
     with open(passwd_file, 'a') as f:
         while True:
             bucket_name = get_user_input("请输入存储空间名称 (BucketName): ", required=True)
-            access_key_id = get_user_input("请输入 AccessKey ID: ", required=True)
-            access_key_secret = get_user_input("请输入 AccessKey Secret: ", required=True)
+            access_key_id = get_user_input("请输入 AccessKey ID: ", required=True, secret=True)
+            access_key_secret = get_user_input("请输入 AccessKey Secret: ", required=True, secret=True)
 
             secret_data = f"{bucket_name}:{access_key_id}:{access_key_secret}"
             f.write(secret_data + '\n')
@@ -125,6 +457,197 @@ def add_secret_key(passwd_file):
     os.chmod(passwd_file, 0o600)
     print_message(f"密钥已成功添加至 {passwd_file}", 'green')
 
+# 挂载性能预设: 名称 -> 说明
+PROFILES = {
+    'default': "不做调优，使用 ossfs 默认参数",
+    'streaming': "大文件顺序读写：大分片、高并发上传、本地磁盘缓存",
+    'small-files': "海量小文件/元数据密集：大 stat 缓存、批量 HEAD 请求",
+    'read-mostly': "以读为主：内核页缓存、长时间 stat 缓存、本地磁盘缓存",
+    'write-heavy': "以写为主：大分片、高并发上传、短 stat 缓存过期",
+}
+
+def host_resources(path='/'):
+    """返回主机内存、CPU 数和 path 所在磁盘总容量 (MB)"""
+    ram_mb = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    disk_mb = shutil.disk_usage(path).total // (1024 * 1024)
+    return ram_mb, os.cpu_count() or 1, disk_mb
+
+def profile_options(profile, cache_dir, overrides=None):
+    """根据性能预设和主机资源生成 ossfs -o 参数 (按总内存/总磁盘计算，保证结果稳定)"""
+    if profile not in PROFILES:
+        raise ValueError(f"未知的性能预设: {profile}，可选: {', '.join(PROFILES)}")
+    options = {}
+    if profile != 'default':
+        ram_mb, cpus, disk_mb = host_resources(cache_dir)
+
+        def stat_entries(ratio):
+            # 每条 stat 缓存约占 0.4KB，最多使用 ratio 比例的内存
+            return max(100000, int(ram_mb * ratio * 1024 / 0.4) // 10000 * 10000)
+
+        options['use_cache'] = cache_dir
+        # ensure_diskfree 为写缓存时必须保留的磁盘空闲空间：保留总容量的 20%，按 GB 取整
+        options['ensure_diskfree'] = max(1024, disk_mb // 5 // 1024 * 1024)
+        if profile == 'streaming':
+            options.update(multipart_size=64, parallel_count=min(64, cpus * 4),
+                           max_stat_cache_size=100000, stat_cache_expire=60)
+        elif profile == 'small-files':
+            options.update(max_stat_cache_size=stat_entries(0.02), stat_cache_expire=300,
+                           multireq_max=min(100, cpus * 10), parallel_count=min(20, cpus * 2),
+                           kernel_cache=True)
+        elif profile == 'read-mostly':
+            options.update(max_stat_cache_size=stat_entries(0.01), stat_cache_expire=900,
+                           multireq_max=min(50, cpus * 5), kernel_cache=True)
+        elif profile == 'write-heavy':
+            options.update(multipart_size=32, parallel_count=min(64, cpus * 4),
+                           max_stat_cache_size=100000, stat_cache_expire=30)
+    options.update(overrides or {})
+    return options
+
+def format_options(options):
+    """将参数字典转换为 ossfs 命令行的 -o 参数"""
+    parts = []
+    for key, value in options.items():
+        if value is True:
+            parts.append(f"-o {key}")
+        elif value not in (None, False):
+            parts.append(f"-o {key}={value}")
+    return ' '.join(parts)
+
+# 每个挂载的资源限制 (cgroup v2)，cache_quota 由 limits --enforce 在挂载停止时按访问时间清理缓存目录
+LIMIT_KEYS = ('memory_max', 'cpu_weight', 'io_weight', 'cache_quota')
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+def parse_size(value):
+    """把 512M、2G 或字节数转换为字节数"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    text = str(value).strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def validate_limits(limits):
+    """校验并规范化资源限制：内存与缓存配额转为字节数，权重范围为 1-10000"""
+    limits = dict(limits or {})
+    unknown = set(limits) - set(LIMIT_KEYS)
+    if unknown:
+        raise ValueError(f"未知的资源限制: {', '.join(sorted(unknown))}，可选: {', '.join(LIMIT_KEYS)}")
+    for key in ('memory_max', 'cache_quota'):
+        if limits.get(key) not in (None, ''):
+            limits[key] = parse_size(limits[key])
+    for key in ('cpu_weight', 'io_weight'):
+        if limits.get(key) not in (None, ''):
+            limits[key] = int(limits[key])
+            if not 1 <= limits[key] <= 10000:
+                raise ValueError(f"{key} 的取值范围为 1-10000: {limits[key]}")
+    return {key: value for key, value in limits.items() if value not in (None, '')}
+
+def render_limits(name, limits):
+    """生成启动脚本中设置 cgroup 限制的部分：有 systemd 时用 systemd-run --scope，否则直接写 cgroup v2"""
+    properties = []
+    files = []
+    if limits.get('memory_max'):
+        properties.append(f"-p MemoryMax={limits['memory_max']}")
+        files.append(('memory.max', limits['memory_max']))
+    if limits.get('cpu_weight'):
+        properties.append(f"-p CPUWeight={limits['cpu_weight']}")
+        files.append(('cpu.weight', limits['cpu_weight']))
+    if limits.get('io_weight'):
+        properties.append(f"-p IOWeight={limits['io_weight']}")
+        files.append(('io.weight', f"default {limits['io_weight']}"))
+    if not properties:
+        return ''
+    cgroup = f"{CGROUP_ROOT}/ossfs/{name}"
+    writes = ''.join(f'    echo "{value}" | sudo tee {cgroup}/{file} >/dev/null 2>&1 || echo "无法设置 {file}"\n'
+                     for file, value in files)
+    return f"""\
+# 资源限制 (cgroup v2)
+if command -v systemd-run >/dev/null 2>&1 && [ -d /run/systemd/system ]; then
+    RUN="sudo systemd-run --scope --quiet --collect --slice=ossfs-{name}.slice {' '.join(properties)}"
+else
+    sudo mkdir -p {cgroup}
+    echo "+memory +cpu +io" | sudo tee {CGROUP_ROOT}/cgroup.subtree_control {CGROUP_ROOT}/ossfs/cgroup.subtree_control >/dev/null 2>&1
+{writes}    echo $$ | sudo tee {cgroup}/cgroup.procs >/dev/null
+    RUN=
+fi
+"""
+
+def render_start_script(bucket, local_path, region, passwd_file, options=None, limits=None):
+    """生成挂载单个存储空间的 start_ossfs_*.sh 脚本内容"""
+    options = options or {}
+    extra = f" {format_options(options)}" if options else ''
+    cache = f"mkdir -p {options['use_cache']}\n" if options.get('use_cache') else ''
+    cgroup = render_limits(os.path.basename(local_path.rstrip('/')), limits or {})
+    run = '$RUN ' if cgroup else ''
+    return f"""\
+#!/bin/bash
+echo "Unmounting {local_path}..."
+# 失效的 FUSE 挂载点上普通 umount 可能阻塞，超时后改用延迟卸载
+timeout 10 sudo umount {local_path} 2>/dev/null || sudo umount -l {local_path} 2>/dev/null
+{cache}{cgroup}
+echo "Mounting {bucket} to {local_path}..."
+{run}ossfs {bucket} {local_path} -ourl={region} -f -o passwd_file={passwd_file} -o allow_other{extra}
+
+echo "Finished."
+"""
+
+def render_program_conf(name, start_ossfs_script):
+    """生成 supervisord 中 ossfs_<name> 进程的配置内容"""
+    return f"""\
+[program:ossfs_{name}]
+command=bash {start_ossfs_script}
+autostart=true
+autorestart=true
+startsecs=5
+startretries=10
+stopasgroup=true
+killasgroup=true
+logfile={file_path}/log/
+logfile_maxbytes=1MB
+logfile_backups=10
+stdout_logfile={file_path}/log
+stdout_logfile_maxbytes=1MB
+stdout_logfile_backups=10
+stdout_capture_maxbytes=1MB
+"""
+
+def render_supervisor_conf(ip, port, username, password):
+    """生成 supervisord.conf 的主体配置 (不含 [include] 部分)"""
+    return f"""\
+[inet_http_server]    
+port={ip}:{port}
+username={username}
+password={password}
+
+[supervisord]
+nodaemon=false
+logfile={supervisor_path}/log/supervisord.log
+pidfile={supervisor_path}/run/supervisord.pid
+nocleanup=true
+logfile_backups=10
+logfile_maxbytes=50MB
+user=root
+
+[supervisorctl]
+serverurl=http://{ip}:{port}
+"""
+
+def link_supervisor_conf(supervisor_conf_path):
+    """将 /etc/supervisor/supervisord.conf 软链接到 supervisor_conf_path，返回是否新建了链接"""
+    target = SUPERVISOR_ETC_CONF
+    if os.path.realpath(target) == os.path.realpath(supervisor_conf_path):
+        return False
+    try:
+        if os.path.islink(target) or os.path.exists(target):
+            os.remove(target)
+        os.symlink(supervisor_conf_path, target)
+        print_message(f"已创建软链接: {supervisor_conf_path} -> {target}", 'green')
+        return True
+    except Exception as e:
+        print_message(f"创建软链接失败: {e}", 'red')
+        return False
+
 def mount_oss():
     """挂载oss"""
     passwd_file = os.path.join(file_path, 'passwd', 'passwd-ossfs')
@@ -144,41 +667,39 @@ def mount_oss():
 
     local_path = get_user_input("请输入oss挂载到服务器上的路径 (默认为 /home/data): ", default="/home/data")
     region = get_user_input("请输入oss存储空间所在地域名称 如: oss-cn-hongkong-internal.aliyuncs.com (必填): ", required=True)
+    print_message("可用的性能预设: ", 'cyan')
+    for name, desc in PROFILES.items():
+        print(f"{name}: {desc}")
+    profile = get_user_input("请选择性能预设 (默认为 default): ", default="default")
+    while profile not in PROFILES:
+        profile = get_user_input("无效的性能预设，请重新输入: ", default="default")
+
+    limits = {}
+    if get_user_input("是否为该挂载设置资源限制 (内存上限、CPU/IO 权重、缓存配额)？(y/n): ", default="n").lower() == 'y':
+        limits = validate_limits({
+            'memory_max': get_user_input("内存上限，如 2G (留空不限制): ", default=''),
+            'cpu_weight': get_user_input("CPU 权重 1-10000，默认 100 (留空不设置): ", default=''),
+            'io_weight': get_user_input("IO 权重 1-10000，默认 100 (留空不设置): ", default=''),
+            'cache_quota': get_user_input("本地缓存配额，如 20G (留空不限制): ", default=''),
+        })
 
     create_directory(local_path)
-    run_command(['sudo', 'apt-get', 'install', '-y', 'supervisor'])
+    ensure_packages(['supervisor'])
 
     ossfs_scripts = os.path.join(file_path, os.path.basename(local_path))
     create_directory(ossfs_scripts)
 
     start_ossfs_script = os.path.join(ossfs_scripts, f'start_ossfs_{os.path.basename(local_path)}.sh')
 
-    umount_command = f"sudo umount {local_path}"
-    script_content = f"""\
-#!/bin/bash
-echo "Unmounting {local_path}..."
-{umount_command}
+    options = profile_options(profile, os.path.join(file_path, 'cache', os.path.basename(local_path)))
+    script_content = render_start_script(selected_bucket, local_path, region, passwd_file, options, limits)
+    write_limits(ossfs_scripts, os.path.basename(local_path), limits)
 
-echo "Mounting {selected_bucket} to {local_path}..."
-ossfs {selected_bucket} {local_path} -ourl={region} -f -o passwd_file={passwd_file} -o allow_other
-
-echo "Finished."
-"""
-    
-    if os.path.exists(start_ossfs_script):
-        # 一次打开文件，并使用with语句确保文件正确关闭
-        with open(start_ossfs_script, 'r+') as f:  # 使用'r+'模式以便读写
-            content = f.read()
-            if umount_command in content:
-                print_message(f"挂载路径 {local_path} 已在 {start_ossfs_script} 中配置，无需更改。", 'cyan')
-            else:
-                # 移动文件指针到文件末尾
-                f.seek(0, os.SEEK_END)
-                f.write(script_content)   
+    # 与 apply_manifest 一致：按本次选择的预设与限制重新生成启动脚本，内容不变时不改写
+    if write_if_changed(start_ossfs_script, script_content, mode=0o700):
+        print_message(f"已写入启动脚本 {start_ossfs_script}", 'green')
     else:
-        with open(start_ossfs_script, 'w') as f:
-            f.write(script_content)
-
+        print_message(f"挂载路径 {local_path} 已在 {start_ossfs_script} 中配置，无需更改。", 'cyan')
     os.chmod(start_ossfs_script, 0o700)
     # supervisord配置
     file_path_ini = os.path.join(ossfs_scripts, f'config_ossfs_{os.path.basename(local_path)}.ini')
@@ -187,50 +708,13 @@ echo "Finished."
     create_directory(os.path.join(supervisor_path, 'run'))
     port =  get_user_input("请输入supervisord port (默认为9001): ",default="9001")
     username = get_user_input("请输入supervisord username (默认为root): ",default="root")
-    password = get_user_input("请输入supervisord password (默认为1234): ",default="1234")
+    password = get_user_input("请输入supervisord password (默认为1234): ",default="1234", secret=True)
     ip = '0.0.0.0' 
-    target = '/etc/supervisor/supervisord.conf'
-    try:
-        if os.path.islink(target) or os.path.exists(target):
-            os.remove(target)
-        os.symlink(supervisor_conf_path, target)
-        print_message(f"已创建软链接: {supervisor_conf_path} -> {target}", 'green')
-    except Exception as e:
-        print_message(f"创建软链接失败: {e}", 'red')
-
-    supervisor_conf = f"""\
-[inet_http_server]    
-port={ip}:{port}
-username={username}
-password={password}
+    # 刚安装的 supervisor 以 Debian 默认配置运行 (没有 [inet_http_server])，换成本脚本的配置后需要重启才能生效
+    base_written = link_supervisor_conf(supervisor_conf_path) or not os.path.exists(supervisor_conf_path)
 
-[supervisord]
-nodaemon=false
-logfile={supervisor_path}/log/supervisord.log
-pidfile={supervisor_path}/run/supervisord.pid
-nocleanup=true
-logfile_backups=10
-logfile_maxbytes=50MB
-user=root
-
-[supervisorctl]
-serverurl=http://{ip}:{port}
-"""
-    supervisor_ossfs_conf = f"""\
-[program:ossfs_{os.path.basename(local_path)}]
-command=bash {start_ossfs_script}
-autostart=true
-autorestart=true
-stopasgroup=true
-killasgroup=true
-logfile={file_path}/log/
-logfile_maxbytes=1MB
-logfile_backups=10
-stdout_logfile={file_path}/log
-stdout_logfile_maxbytes=1MB
-stdout_logfile_backups=10
-stdout_capture_maxbytes=1MB
-"""
+    supervisor_conf = render_supervisor_conf(ip, port, username, password)
+    supervisor_ossfs_conf = render_program_conf(os.path.basename(local_path), start_ossfs_script)
     supervisor_ossfs_ini = f"""\
 [include]
 files = {file_path_ini}
@@ -282,32 +766,1675 @@ files = {file_path_ini}
         
 
     try:
-        run_command(['sudo','systemctl','start','supervisor'])
-        run_command(['sudo','systemctl','restart','supervisor'])
+        with phase('supervisor_reload'):
+            if not supervisor_running():
+                run_command(['sudo','systemctl','start','supervisor'])
+            elif base_written:
+                run_command(['sudo','systemctl','restart','supervisor'])
+            else:
+                reload_or_restart(supervisor_conf_path, [os.path.basename(local_path)])
         print_message("====  ossfs启动成功  ====", 'green')
         print_message(f"==== supervisor管理地址: http://{get_ip_address()}:{port}  ====", 'green')
     except Exception as e:
         print_message(f"ossfs启动失败: {e}", 'red')
-def get_ip_address():
+PUBLIC_IP_TTL = 86400
+_public_ip = None
+
+def _local_ip():
+    """通过 UDP connect 取得默认路由所用的本机地址 (不发送任何数据包)"""
+    import socket
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect(('223.5.5.5', 53))
+        return s.getsockname()[0]
+
+def get_ip_address(timeout=3):
+    """获取公网 IP：本机网卡为公网地址时直接使用，否则限时查询 ip-api.com，结果缓存"""
+    global _public_ip
+    import ipaddress
+    if _public_ip:
+        return _public_ip
+    cache_file = os.path.join(supervisor_path, 'run', 'public_ip')
+    try:
+        if time.time() - os.path.getmtime(cache_file) < PUBLIC_IP_TTL:
+            with open(cache_file) as f:
+                _public_ip = f.read().strip()
+            if _public_ip:
+                return _public_ip
+    except OSError:
+        pass
+    local = None
+    try:
+        local = _local_ip()
+        if ipaddress.ip_address(local).is_global:
+            _public_ip = local
+    except (OSError, ValueError):
+        pass
+    if not _public_ip:
+        from urllib.request import urlopen
+        try:
+            with urlopen('http://ip-api.com/json', timeout=timeout) as response:
+                _public_ip = json.loads(response.read())['query']
+        except Exception as e:
+            print_message(f"获取公网 IP 失败: {e}", 'yellow')
+            # 失败结果只在本进程内缓存，不写入缓存文件
+            _public_ip = local or '127.0.0.1'
+            return _public_ip
+    try:
+        with open(cache_file, 'w') as f:
+            f.write(_public_ip + '\n')
+    except OSError:
+        pass
+    return _public_ip
+def write_if_changed(path, content, mode=None, dry_run=False):
+    """仅在内容变化时写入文件，返回是否发生了变化"""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            if f.read() == content:
+                return False
+    if not dry_run:
+        with open(path, 'w') as f:
+            f.write(content)
+        if mode is not None:
+            os.chmod(path, mode)
+    return True
+
+def write_limits(ossfs_scripts, name, limits, dry_run=False):
+    """把资源限制写入 limits_ossfs_<name>.json，没有限制时删除该文件，返回是否发生了变化"""
+    limits_file = os.path.join(ossfs_scripts, f'limits_ossfs_{name}.json')
+    if limits:
+        return write_if_changed(limits_file, json.dumps(limits, indent=2) + '\n', dry_run=dry_run)
+    if os.path.exists(limits_file):
+        if not dry_run:
+            os.remove(limits_file)
+        return True
+    return False
+
+def load_manifest(manifest_path):
+    """读取并校验挂载清单"""
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    mounts = manifest.get('mounts') or []
+    names = set()
+    for mount in mounts:
+        for key in ('bucket', 'path', 'region'):
+            if not mount.get(key):
+                raise ValueError(f"挂载项缺少 {key}: {mount}")
+        if mount.get('profile', 'default') not in PROFILES:
+            raise ValueError(f"未知的性能预设: {mount['profile']}，可选: {', '.join(PROFILES)}")
+        mount['limits'] = validate_limits(mount.get('limits'))
+        name = os.path.basename(mount['path'].rstrip('/'))
+        if name in names:
+            raise ValueError(f"挂载路径尾部名称重复: {name}")
+        names.add(name)
+        mount['name'] = name
+    return manifest
+
+def supervisor_running():
+    """检查 supervisor 服务是否在运行"""
+    return run_command(['systemctl', 'is-active', '--quiet', 'supervisor'], check=False, silent=True).returncode == 0
+
+def supervisor_rpc(supervisor_conf_path):
+    """根据 supervisord.conf 中的 [inet_http_server] 配置创建 XML-RPC 客户端"""
+    import configparser
+    import xmlrpc.client
+    config = configparser.ConfigParser(interpolation=None, strict=False)
+    config.read(supervisor_conf_path)
+    server = config['inet_http_server']
+    port = server.get('port').strip().rsplit(':', 1)[-1]
+    auth = ''
+    if server.get('username'):
+        auth = f"{server.get('username').strip()}:{server.get('password', '').strip()}@"
+    return xmlrpc.client.ServerProxy(f"http://{auth}127.0.0.1:{port}/RPC2")
+
+def _stop_group(rpc, group):
+    """停止进程组，忽略进程本来就未运行的情况"""
+    import xmlrpc.client
+    try:
+        rpc.supervisor.stopProcessGroup(group)
+    except xmlrpc.client.Fault as e:
+        if 'NOT_RUNNING' not in e.faultString and 'BAD_NAME' not in e.faultString:
+            raise
+
+def hot_reload(supervisor_conf_path, restart_programs=()):
+    """通过 supervisor XML-RPC 重新读取配置，只增删/重启受影响的 ossfs_<name> 进程"""
+    rpc = supervisor_rpc(supervisor_conf_path)
+    added, changed, removed = rpc.supervisor.reloadConfig()[0]
+    for group in removed:
+        _stop_group(rpc, group)
+        rpc.supervisor.removeProcessGroup(group)
+        print_message(f"已停止并移除 {group}", 'yellow')
+    for group in changed:
+        _stop_group(rpc, group)
+        rpc.supervisor.removeProcessGroup(group)
+        rpc.supervisor.addProcessGroup(group)
+        print_message(f"已按新配置重新加载 {group}", 'cyan')
+    for group in added:
+        rpc.supervisor.addProcessGroup(group)
+        print_message(f"已添加并启动 {group}", 'green')
+    reloaded = set(added) | set(changed)
+    for name in restart_programs:
+        group = f'ossfs_{name}'
+        if group in reloaded:
+            continue
+        _stop_group(rpc, group)
+        rpc.supervisor.startProcessGroup(group)
+        print_message(f"已重启 {group}", 'cyan')
+
+def reload_or_restart(supervisor_conf_path, restart_programs=()):
+    """优先通过 XML-RPC 热加载；运行中的 supervisord 没有开启 XML-RPC 或无法连接时，退回到重启 supervisor"""
+    import xmlrpc.client
+    try:
+        # 通过 XML-RPC 只启动/重启受影响的进程，不影响其它挂载
+        hot_reload(supervisor_conf_path, restart_programs)
+    except (OSError, KeyError, xmlrpc.client.ProtocolError) as e:
+        print_message(f"supervisor XML-RPC 不可用 ({e})，改为重启 supervisor", 'yellow')
+        run_command(['sudo', 'systemctl', 'restart', 'supervisor'])
+
+def apply_manifest(manifest_path, prune=False, dry_run=False):
+    """按清单一次性生成所有挂载的脚本与配置，只改动有变化的部分，最后只重载一次 supervisor"""
+    global file_path
+    manifest = load_manifest(manifest_path)
+    file_path = manifest.get('file_path', '/home/supervisord/program/ossfs')
+    supervisor = manifest.get('supervisor', {})
+    passwd_file = os.path.join(file_path, 'passwd', 'passwd-ossfs')
+    with open(passwd_file, 'r') as f:
+        buckets = {line.split(':')[0] for line in f if line.strip()}
+
+    missing = [m['bucket'] for m in manifest['mounts'] if m['bucket'] not in buckets]
+    if missing:
+        print_message(f"以下存储空间在 {passwd_file} 中没有密钥: {', '.join(missing)}", 'red')
+        sys.exit(1)
+
+    changed_programs = []   # 配置有变化，需要 supervisor 重新读取
+    restart_programs = []   # 仅启动脚本变化，需要重启进程
+    for mount in manifest['mounts']:
+        name = mount['name']
+        ossfs_scripts = os.path.join(file_path, name)
+        start_ossfs_script = os.path.join(ossfs_scripts, f'start_ossfs_{name}.sh')
+        file_path_ini = os.path.join(ossfs_scripts, f'config_ossfs_{name}.ini')
+        if not dry_run:
+            create_directory(mount['path'])
+            create_directory(ossfs_scripts)
+        script_changed = write_if_changed(
+            start_ossfs_script,
+            render_start_script(mount['bucket'], mount['path'], mount['region'], passwd_file,
+                                profile_options(mount.get('profile', 'default'),
+                                                os.path.join(file_path, 'cache', name),
+                                                mount.get('options')),
+                                mount['limits']),
+            mode=0o700, dry_run=dry_run)
+        # 记录资源限制，供 limits 子命令汇报与清理缓存；内存/CPU/IO 限制已体现在启动脚本中，
+        # 只有 cache_quota 变化时不需要重启 ossfs
+        limits_changed = write_limits(ossfs_scripts, name, mount['limits'], dry_run=dry_run)
+        ini_changed = write_if_changed(file_path_ini, render_program_conf(name, start_ossfs_script), dry_run=dry_run)
+        if ini_changed:
+            changed_programs.append(name)
+        elif script_changed:
+            restart_programs.append(name)
+        state = '已更新' if script_changed or ini_changed or limits_changed else '无变化'
+        print_message(f"ossfs_{name}: {state}", 'green' if state == '无变化' else 'cyan')
+
+    wanted = {m['name'] for m in manifest['mounts']}
+    for ini in glob.glob(os.path.join(file_path, '*', 'config_ossfs_*.ini')):
+        name = os.path.basename(ini)[len('config_ossfs_'):-len('.ini')]
+        if name in wanted:
+            continue
+        if not prune:
+            print_message(f"ossfs_{name}: 不在清单中 (使用 --prune 删除)", 'yellow')
+            continue
+        print_message(f"ossfs_{name}: 已从清单移除，删除配置", 'yellow')
+        changed_programs.append(name)
+        if not dry_run:
+            os.remove(ini)
+            start_ossfs_script = os.path.join(os.path.dirname(ini), f'start_ossfs_{name}.sh')
+            if os.path.exists(start_ossfs_script):
+                os.remove(start_ossfs_script)
+            write_limits(os.path.dirname(ini), name, {})
+
+    supervisor_conf_path = os.path.join(supervisor_path, 'supervisord.conf')
+    base_conf = render_supervisor_conf(
+        '0.0.0.0', supervisor.get('port', '9001'),
+        supervisor.get('username', 'root'), supervisor.get('password', '1234'))
+    old_conf = None
+    if os.path.exists(supervisor_conf_path):
+        with open(supervisor_conf_path, 'r') as f:
+            old_conf = f.read()
+    include = f"\n[include]\nfiles = {file_path}/*/config_ossfs_*.ini\n"
+    conf_changed = write_if_changed(supervisor_conf_path, base_conf + include, dry_run=dry_run)
+    base_changed = old_conf is None or not old_conf.startswith(base_conf)
+
+    if not (changed_programs or restart_programs or conf_changed):
+        if dry_run or supervisor_running():
+            print_message("所有挂载与清单一致，无需变更。", 'green')
+            return
+        print_message("配置无变化，但 supervisor 未运行，正在启动。", 'yellow')
+    if dry_run:
+        print_message("dry-run: 未写入任何文件。", 'yellow')
+        return
+
+    create_directory(os.path.join(supervisor_path, 'log'))
+    create_directory(os.path.join(supervisor_path, 'run'))
+    base_changed |= link_supervisor_conf(supervisor_conf_path)
+    if not check_command('supervisord'):
+        with phase('install_supervisor'):
+            ensure_packages(['supervisor'])
+
+    with phase('supervisor_reload'):
+        if not supervisor_running() or base_changed:
+            # supervisord 自身的配置变化只能通过重启生效
+            run_command(['sudo', 'systemctl', 'restart' if base_changed and supervisor_running() else 'start', 'supervisor'])
+        else:
+            reload_or_restart(supervisor_conf_path, restart_programs)
+    print_message(f"清单已应用：{len(changed_programs)} 个配置变化，{len(restart_programs)} 个脚本变化。", 'green')
+
+def check_command(cmd):
+    """检查系统中是否存在指定命令"""
+    return run_command(['which', cmd], check=False, silent=True).returncode == 0
+
+def percentiles(samples):
+    """计算延迟样本 (秒) 的 p50/p95/p99，单位毫秒"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {}
+    for q in (0.5, 0.95, 0.99):
+        value = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        result[f'p{int(q * 100)}_ms'] = round(value * 1000, 3)
+    return result
+
+def op_stats(latencies):
+    """每秒操作数与延迟分位数，没有样本 (如 --ops 0) 时只返回 0"""
+    total = sum(latencies)
+    return {'ops_per_s': round(len(latencies) / total, 2) if total > 0 else 0, **percentiles(latencies)}
+
+def _drop_page_cache(fd):
+    """尽量丢弃文件的页缓存，避免读测试直接命中内存"""
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except (AttributeError, OSError):
+        pass
+
+def mount_options(mount):
+    """从 /proc/mounts 读取挂载点的文件系统类型与挂载参数"""
+    mount = os.path.realpath(mount)
+    try:
+        with open('/proc/mounts', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and fields[1] == mount:
+                    return {'fstype': fields[2], 'options': fields[3]}
+    except OSError:
+        pass
+    return {}
+
+def bench_mount(mount, size_mb=256, block_kb=1024, random_ops=200, files=500, list_files=2000):
+    """在挂载点上运行 I/O 基准测试并返回结果字典"""
+    work_dir = os.path.join(mount, f'.ossfs-bench-{os.getpid()}')
+    os.makedirs(work_dir)
+    results = {}
+    try:
+        # 顺序写
+        data_file = os.path.join(work_dir, 'seq.dat')
+        block = os.urandom(block_kb * 1024)
+        blocks = size_mb * 1024 // block_kb
+        print_message(f"顺序写 {size_mb}MB...", 'cyan')
+        start = time.monotonic()
+        with open(data_file, 'wb') as f:
+            for _ in range(blocks):
+                f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        elapsed = time.monotonic() - start
+        results['seq_write'] = {'mb_per_s': round(size_mb / elapsed, 2), 'seconds': round(elapsed, 3)}
+
+        # 顺序读
+        print_message(f"顺序读 {size_mb}MB...", 'cyan')
+        with open(data_file, 'rb') as f:
+            _drop_page_cache(f.fileno())
+            start = time.monotonic()
+            while f.read(block_kb * 1024):
+                pass
+            elapsed = time.monotonic() - start
+        results['seq_read'] = {'mb_per_s': round(size_mb / elapsed, 2), 'seconds': round(elapsed, 3)}
+
+        # 随机读
+        file_size = blocks * block_kb * 1024
+        fd = os.open(data_file, os.O_RDONLY)
+        try:
+            for read_kb in (4, 64):
+                print_message(f"随机读 {read_kb}K x {random_ops}...", 'cyan')
+                _drop_page_cache(fd)
+                read_size = read_kb * 1024
+                latencies = []
+                for _ in range(random_ops):
+                    offset = random.randrange(0, max(1, file_size - read_size)) // read_size * read_size
+                    start = time.monotonic()
+                    os.pread(fd, read_size, offset)
+                    latencies.append(time.monotonic() - start)
+                results[f'random_read_{read_kb}k'] = op_stats(latencies)
+        finally:
+            os.close(fd)
+        os.remove(data_file)
+
+        # 小文件 create/stat/unlink
+        print_message(f"小文件 create/stat/unlink x {files}...", 'cyan')
+        small_dir = os.path.join(work_dir, 'small')
+        os.makedirs(small_dir)
+        payload = os.urandom(1024)
+        paths = [os.path.join(small_dir, f'f{i:06d}') for i in range(files)]
+        for op in ('create', 'stat', 'unlink'):
+            latencies = []
+            for path in paths:
+                start = time.monotonic()
+                if op == 'create':
+                    with open(path, 'wb') as f:
+                        f.write(payload)
+                elif op == 'stat':
+                    os.stat(path)
+                else:
+                    os.unlink(path)
+                latencies.append(time.monotonic() - start)
+            results[f'small_file_{op}'] = op_stats(latencies)
+
+        # 大目录列举
+        print_message(f"大目录列举 {list_files} 个文件...", 'cyan')
+        list_dir = os.path.join(work_dir, 'list')
+        os.makedirs(list_dir)
+        for i in range(list_files):
+            open(os.path.join(list_dir, f'f{i:06d}'), 'wb').close()
+        start = time.monotonic()
+        names = os.listdir(list_dir)
+        listdir_seconds = time.monotonic() - start
+        for name in names:
+            os.stat(os.path.join(list_dir, name))
+        results['large_dir_list'] = {
+            'entries': len(names),
+            'listdir_ms': round(listdir_seconds * 1000, 3),
+            'listdir_stat_ms': round((time.monotonic() - start) * 1000, 3),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def compare_benchmarks(paths):
+    """对比多个基准测试结果文件，以第一个为基准显示变化百分比"""
+    reports = []
+    for path in paths:
+        with open(path, 'r') as f:
+            reports.append(json.load(f))
+    base = reports[0]
+    labels = [r.get('label') or os.path.basename(p) for r, p in zip(reports, paths)]
+    print(f"{'metric':<36}" + ''.join(f"{label:>22}" for label in labels))
+    for test, metrics in base['results'].items():
+        for metric, base_value in metrics.items():
+            row = f"{test + '.' + metric:<36}{base_value:>22}"
+            for report in reports[1:]:
+                value = report['results'].get(test, {}).get(metric)
+                if value is None:
+                    row += f"{'-':>22}"
+                    continue
+                delta = f" ({(value - base_value) / base_value * 100:+.1f}%)" if base_value else ''
+                row += f"{str(value) + delta:>22}"
+            print(row)
+
+class RateLimiter:
+    """令牌桶限速，多个线程共享，rate 为每秒字节数，0 表示不限速"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = rate
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate)
+            self.last = now
+            self.allowance -= amount
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def within(path, root):
+    """path 是否为 root 本身或位于 root 之下 (两者都应为 realpath)"""
+    return os.path.commonpath([path, root]) == root
+
+def warm_targets(mount, prefixes=(), manifest=None):
+    """按清单顺序和前缀遍历需要预热的文件，遍历时的 stat 同时预热 ossfs 的 stat 缓存"""
+    paths = list(prefixes)
+    if manifest:
+        with open(manifest, 'r') as f:
+            paths += [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    if not paths:
+        paths = ['.']
+    seen = set()
+    mount = os.path.realpath(mount)
+    for path in paths:
+        # 清单中的绝对路径在挂载点内时直接使用，其余都按相对挂载点处理；解析后不能离开挂载点
+        if not (os.path.isabs(path) and within(os.path.realpath(path), mount)):
+            path = os.path.join(mount, path.lstrip('/'))
+        path = os.path.realpath(path)
+        if not within(path, mount):
+            print_message(f"跳过挂载点之外的路径 {path}", 'yellow')
+            continue
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            print_message(f"跳过 {path}: {e}", 'yellow')
+            continue
+        if not os.path.isdir(path):
+            if path not in seen:
+                seen.add(path)
+                yield path, st.st_size
+            continue
+        stack = [path]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and entry.path not in seen:
+                            seen.add(entry.path)
+                            yield entry.path, entry.stat(follow_symlinks=False).st_size
+            except OSError as e:
+                print_message(f"无法列出目录: {e}", 'yellow')
+
+def warm_cache(mount, prefixes=(), manifest=None, workers=8, rate_mb=0, budget_mb=0,
+               chunk_kb=1024, progress_interval=2):
+    """通过挂载点并发读取热点文件，预热页缓存、ossfs 本地磁盘缓存和 stat 缓存"""
+    from concurrent.futures import ThreadPoolExecutor, wait
+    limiter = RateLimiter(rate_mb * 1024 * 1024)
+    budget = budget_mb * 1024 * 1024
+    chunk = chunk_kb * 1024
+    lock = threading.Lock()
+    stats = {'files': 0, 'bytes': 0, 'errors': 0, 'queued': 0, 'queued_bytes': 0}
+    stop = threading.Event()
+
+    def reserve(amount):
+        # 在预算内预留本次读取的字节数，返回实际可读取的字节数
+        with lock:
+            if budget:
+                amount = min(amount, budget - stats['bytes'])
+            if amount <= 0:
+                stop.set()
+                return 0
+            stats['bytes'] += amount
+            return amount
+
+    def warm_file(path):
+        if stop.is_set():
+            return
+        buffer = bytearray(chunk)
+        try:
+            with open(path, 'rb', buffering=0) as f:
+                while not stop.is_set():
+                    amount = reserve(chunk)
+                    if not amount:
+                        break
+                    limiter.acquire(amount)
+                    read = f.readinto(memoryview(buffer)[:amount])
+                    if read < amount:
+                        with lock:
+                            stats['bytes'] -= amount - read
+                        break
+            with lock:
+                stats['files'] += 1
+        except OSError as e:
+            with lock:
+                stats['errors'] += 1
+            print_message(f"读取失败 {path}: {e}", 'yellow')
+
+    def report(final=False):
+        elapsed = time.monotonic() - start
+        with lock:
+            done, total, read = stats['files'], stats['queued'], stats['bytes']
+        print_message(f"{'完成' if final else '预热中'}: {done}/{total} 个文件, {read / 1048576:.1f}MB, "
+                      f"{read / 1048576 / max(elapsed, 1e-6):.1f}MB/s, {elapsed:.1f}s", 'green' if final else 'cyan')
+
+    start = time.monotonic()
+    last_report = start
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for path, size in warm_targets(mount, prefixes, manifest):
+            if stop.is_set() or (budget and stats['queued_bytes'] >= budget):
+                break
+            stats['queued'] += 1
+            stats['queued_bytes'] += size
+            futures.append(executor.submit(warm_file, path))
+            if time.monotonic() - last_report >= progress_interval:
+                report()
+                last_report = time.monotonic()
+        while not wait(futures, timeout=progress_interval).done.issuperset(futures):
+            report()
+    report(final=True)
+    stats['seconds'] = round(time.monotonic() - start, 3)
+    return stats
+
+def discover_mounts():
+    """从 file_path 下已生成的 start_ossfs_*.sh 中解析出 {名称: (存储空间, 挂载路径)}"""
+    mounts = {}
+    for script in glob.glob(os.path.join(file_path, '*', 'start_ossfs_*.sh')):
+        name = os.path.basename(script)[len('start_ossfs_'):-len('.sh')]
+        with open(script, 'r') as f:
+            match = re.search(r'^(?:\$RUN )?ossfs (\S+) (\S+) ', f.read(), re.MULTILINE)
+        if match:
+            mounts[name] = (match.group(1), match.group(2))
+    return mounts
+
+def is_mounted(path):
+    """检查 path 是否出现在 /proc/mounts 中"""
+    path = os.path.realpath(path)
+    with open('/proc/mounts', 'r') as f:
+        return any(line.split()[1] == path for line in f if len(line.split()) > 1)
+
+# 超时后被杀掉但仍卡在内核里的探测进程，由 health_check 的主循环回收；probe_mount 在线程池中追加，需持锁
+_stuck_probes = []
+_stuck_probes_lock = threading.Lock()
+
+def reap_stuck_probes():
+    """回收已经退出的卡死探测进程，返回仍未退出的数量"""
+    with _stuck_probes_lock:
+        _stuck_probes[:] = [proc for proc in _stuck_probes if proc.poll() is None]
+        return len(_stuck_probes)
+
+def probe_mount(path, timeout=3):
+    """在子进程中限时执行 statfs/stat 探测挂载点，返回 ok/unmounted/stale/hung"""
+    if not is_mounted(path):
+        return 'unmounted'
+    proc = subprocess.Popen(['sh', '-c', 'stat -f -c %T "$0" && stat -c %i "$0"', path],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        _, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        with _stuck_probes_lock:
+            _stuck_probes.append(proc)
+        return 'hung'
+    if proc.returncode != 0:
+        return 'stale' if 'not connected' in stderr.lower() else 'error'
+    return 'ok'
+
+def recover_mount(rpc, name, path):
+    """延迟卸载失效的挂载点，并通过 supervisor 只重启该挂载的进程"""
+    run_command(['sudo', 'umount', '-l', path], check=False, silent=True)
+    group = f'ossfs_{name}'
+    _stop_group(rpc, group)
+    rpc.supervisor.startProcessGroup(group, False)
+
+def health_check(interval=5, timeout=3, max_backoff=300, once=False):
+    """周期性探测所有 ossfs 挂载，发现失效或卡死后按指数退避只恢复对应的进程"""
+    import xmlrpc.client
+    from concurrent.futures import ThreadPoolExecutor
+    supervisor_conf_path = os.path.join(supervisor_path, 'supervisord.conf')
+    state = {}  # 名称 -> {'failures': 连续失败次数, 'next_attempt': 下次允许恢复的时间}
+    while True:
+        mounts = discover_mounts()
+        rpc = supervisor_rpc(supervisor_conf_path)
+        reap_stuck_probes()
+        with ThreadPoolExecutor(max_workers=max(1, len(mounts))) as executor:
+            statuses = dict(zip(mounts, executor.map(lambda item: probe_mount(item[1], timeout), mounts.values())))
+        now = time.monotonic()
+        for name, status in statuses.items():
+            bucket, path = mounts[name]
+            entry = state.setdefault(name, {'failures': 0, 'next_attempt': 0})
+            if status == 'ok':
+                if entry['failures']:
+                    print_message(f"{time.strftime('%H:%M:%S')} ossfs_{name}: 已恢复", 'green')
+                entry.update(failures=0, next_attempt=0)
+                continue
+            try:
+                process = rpc.supervisor.getProcessInfo(f'ossfs_{name}')
+            except (xmlrpc.client.Fault, OSError) as e:
+                print_message(f"ossfs_{name}: 无法获取进程状态: {e}", 'red')
+                continue
+            # 人工停止或正在启动中的进程不做处理
+            if process['statename'] in ('STOPPED', 'STARTING', 'BACKOFF') and status == 'unmounted':
+                continue
+            if now < entry['next_attempt']:
+                continue
+            backoff = min(max_backoff, interval * 2 ** entry['failures'])
+            print_message(f"{time.strftime('%H:%M:%S')} ossfs_{name} ({bucket} -> {path}): {status}，"
+                          f"正在恢复 (第 {entry['failures'] + 1} 次，{backoff:g}s 内不再重试)", 'yellow')
+            try:
+                recover_mount(rpc, name, path)
+            except (xmlrpc.client.Fault, OSError) as e:
+                print_message(f"ossfs_{name}: 恢复失败: {e}", 'red')
+            entry['failures'] += 1
+            entry['next_attempt'] = now + backoff
+        if once:
+            return statuses
+        time.sleep(interval)
+
+def read_start_script(name):
+    """解析 start_ossfs_<name>.sh，返回存储空间、挂载路径、endpoint 与 -o 参数"""
+    script = os.path.join(file_path, name, f'start_ossfs_{name}.sh')
+    with open(script, 'r') as f:
+        match = re.search(r'^(?:\$RUN )?ossfs (\S+) (\S+) (.*)$', f.read(), re.MULTILINE)
+    if not match:
+        return None
+    args = match.group(3)
+    url = re.search(r'-ourl=(\S+)', args)
+    options = {}
+    for option in re.findall(r'-o (\S+)', args):
+        key, _, value = option.partition('=')
+        options[key] = value or True
+    return {'bucket': match.group(1), 'path': match.group(2),
+            'url': url.group(1) if url else None, 'options': options}
+
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+def _proc_children(pid):
+    """返回 pid 的直接子进程，内核不支持 children 文件时扫描 /proc"""
     try:
-        response = requests.get('http://ip-api.com/json')
-        if response.status_code == 200:
-            data = response.json()
-            return data['query']
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except FileNotFoundError:
+        children = []
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as f:
+                        if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                            children.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        return children
+    except OSError:
+        return []
+
+def find_ossfs_pid(pid):
+    """supervisor 管理的是 bash 启动脚本，在其子进程中查找真正的 ossfs 进程"""
+    queue = [pid]
+    while queue:
+        current = queue.pop(0)
+        try:
+            with open(f'/proc/{current}/comm') as f:
+                if f.read().strip() == 'ossfs':
+                    return current
+        except OSError:
+            continue
+        queue.extend(_proc_children(current))
+    return None
+
+def sample_process(pid):
+    """读取 /proc 中单个进程的内存、CPU、I/O、线程数和打开的文件数"""
+    sample = {'pid': pid}
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    sample['cpu_seconds'] = (int(fields[11]) + int(fields[12])) / CLK_TCK
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                sample['rss_bytes'] = int(line.split()[1]) * 1024
+            elif line.startswith('Threads:'):
+                sample['threads'] = int(line.split()[1])
+    try:
+        with open(f'/proc/{pid}/io') as f:
+            io = dict(line.split(': ') for line in f.read().splitlines())
+        for key in ('rchar', 'wchar', 'read_bytes', 'write_bytes'):
+            sample[f'io_{key}'] = int(io[key])
+    except (OSError, KeyError):
+        pass
+    try:
+        sample['open_fds'] = len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        pass
+    return sample
+
+def dir_usage(path):
+    """统计目录实际占用的磁盘字节数 (按块计算)"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_blocks * 512
+        except OSError:
+            continue
+    return total
+
+METRICS = [
+    ('ossfs_up', 'gauge', 'ossfs 进程是否在运行', 'up'),
+    ('ossfs_restarts_total', 'counter', '导出器运行期间 supervisor 重启该进程的次数', 'restarts'),
+    ('ossfs_uptime_seconds', 'gauge', '当前进程已运行的秒数', 'uptime_seconds'),
+    ('ossfs_resident_memory_bytes', 'gauge', 'ossfs 进程的 RSS', 'rss_bytes'),
+    ('ossfs_cpu_seconds_total', 'counter', 'ossfs 进程累计的用户态与内核态 CPU 时间', 'cpu_seconds'),
+    ('ossfs_io_rchar_bytes_total', 'counter', 'ossfs 进程读取的字节数 (含网络)', 'io_rchar'),
+    ('ossfs_io_wchar_bytes_total', 'counter', 'ossfs 进程写出的字节数 (含网络)', 'io_wchar'),
+    ('ossfs_io_read_bytes_total', 'counter', 'ossfs 进程从块设备读取的字节数', 'io_read_bytes'),
+    ('ossfs_io_write_bytes_total', 'counter', 'ossfs 进程写入块设备的字节数', 'io_write_bytes'),
+    ('ossfs_threads', 'gauge', 'ossfs 进程的线程数', 'threads'),
+    ('ossfs_open_fds', 'gauge', 'ossfs 进程打开的文件描述符数', 'open_fds'),
+    ('ossfs_cache_bytes', 'gauge', '本地缓存目录占用的磁盘字节数', 'cache_bytes'),
+]
+
+def format_metrics_prom(samples):
+    """按 Prometheus 文本格式输出每个挂载的指标"""
+    lines = []
+    for metric, kind, help_text, key in METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, sample in samples.items():
+            if sample.get(key) is not None:
+                labels = f'mount="{_prom_label(name)}",bucket="{_prom_label(sample["bucket"])}"'
+                lines.append(f"{metric}{{{labels}}} {sample[key]}")
+    return '\n'.join(lines) + '\n'
+
+def collect_metrics(rpc, state, cache_interval=60):
+    """通过 getAllProcessInfo 找到每个 ossfs_<name> 进程并采样，state 在多次调用之间保存重启次数和缓存统计"""
+    now = time.time()
+    mounts = {}
+    for name in discover_mounts():
+        info = read_start_script(name)
+        if info:
+            mounts[name] = info
+    samples = {}
+    for process in rpc.supervisor.getAllProcessInfo():
+        group = process['group']
+        if not group.startswith('ossfs_') or group[len('ossfs_'):] not in mounts:
+            continue
+        name = group[len('ossfs_'):]
+        info = mounts[name]
+        entry = state.setdefault(name, {'start': process['start'], 'restarts': 0, 'pid': None, 'ossfs_pid': None,
+                                        'cache_bytes': None, 'cache_at': 0})
+        if process['start'] != entry['start']:
+            entry['restarts'] += 1
+            entry['start'] = process['start']
+        sample = {'bucket': info['bucket'], 'path': info['path'], 'state': process['statename'],
+                  'up': 0, 'restarts': entry['restarts']}
+        if process['statename'] == 'RUNNING' and process['pid']:
+            # 启动脚本 pid 不变时复用上次找到的 ossfs 子进程，避免每轮遍历进程树
+            if entry['pid'] != process['pid'] or not entry['ossfs_pid'] or not os.path.exists(f"/proc/{entry['ossfs_pid']}"):
+                entry['pid'] = process['pid']
+                entry['ossfs_pid'] = find_ossfs_pid(process['pid'])
+            if entry['ossfs_pid']:
+                try:
+                    sample.update(sample_process(entry['ossfs_pid']))
+                    sample['up'] = 1
+                    sample['uptime_seconds'] = max(0, int(now) - process['start'])
+                except OSError:
+                    entry['ossfs_pid'] = None
+        cache_dir = info['options'].get('use_cache')
+        if isinstance(cache_dir, str):
+            # 遍历缓存目录开销较大，按更长的间隔统计
+            if entry['cache_bytes'] is None or now - entry['cache_at'] >= cache_interval:
+                entry['cache_bytes'] = dir_usage(cache_dir)
+                entry['cache_at'] = now
+            sample['cache_bytes'] = entry['cache_bytes']
+        samples[name] = sample
+    return samples
+
+def export_metrics(interval=15, fmt='prom', output=None, cache_interval=60, once=False):
+    """按固定间隔输出每个挂载的运行时指标，output 为空时打印到标准输出"""
+    supervisor_conf_path = os.path.join(supervisor_path, 'supervisord.conf')
+    rpc = supervisor_rpc(supervisor_conf_path)
+    state = {}
+    while True:
+        started = time.monotonic()
+        try:
+            samples = collect_metrics(rpc, state, cache_interval)
+        except OSError as e:
+            print_message(f"无法连接 supervisor: {e}", 'red')
+            samples = None
+        if samples is not None:
+            if fmt == 'json':
+                content = json.dumps({'timestamp': int(time.time()), 'mounts': samples}, ensure_ascii=False, indent=2) + '\n'
+            else:
+                content = format_metrics_prom(samples)
+            if output:
+                # 先写临时文件再重命名，避免 node_exporter 读到不完整的文件
+                with open(f"{output}.tmp", 'w') as f:
+                    f.write(content)
+                os.replace(f"{output}.tmp", output)
+            else:
+                sys.stdout.write(content)
+                sys.stdout.flush()
+        if once:
+            return samples
+        time.sleep(max(0, interval - (time.monotonic() - started)))
+
+# OSS 直连传输：绕过 FUSE，使用 passwd-ossfs 中的密钥直接调用 OSS API 并发分片上传/分段下载
+OSS_PART_SIZE_MB = 16
+OSS_SUBRESOURCES = ('acl', 'uploads', 'uploadId', 'partNumber', 'location', 'delete')
+
+class OSSError(Exception):
+    """OSS 返回的错误响应"""
+
+    def __init__(self, status, code, message=''):
+        super().__init__(f"{status} {code} {message}".strip())
+        self.status = status
+        self.code = code
+
+def _oss_time(text):
+    """把 OSS 返回的 ISO8601 时间 (如 2024-01-01T00:00:00.000Z) 转为 Unix 时间戳"""
+    import calendar
+    return calendar.timegm(time.strptime(text[:19], '%Y-%m-%dT%H:%M:%S')) if text else 0
+
+def _xml_text(element, name):
+    """按不带命名空间的标签名查找子元素文本 (兼容 OSS 与带命名空间的 S3 兼容服务)"""
+    for child in element.iter():
+        if child.tag.rsplit('}', 1)[-1] == name:
+            return child.text
+    return None
+
+class OSSClient:
+    """使用 V1 签名访问单个存储空间，每个线程复用一个 HTTP 长连接"""
+
+    def __init__(self, bucket, endpoint, access_key_id, access_key_secret, path_style=False, timeout=60):
+        if '://' not in endpoint:
+            endpoint = f'https://{endpoint}'
+        parsed = urlparse(endpoint)
+        self.bucket = bucket
+        self.scheme = parsed.scheme
+        self.host = parsed.netloc if path_style else f'{bucket}.{parsed.netloc}'
+        self.path_style = path_style
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connection(self, reset=False):
+        import http.client
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and reset:
+            conn.close()
+            conn = None
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self.local.conn = cls(self.host, timeout=self.timeout)
+        return conn
+
+    def _sign(self, method, key, params, headers):
+        import hmac
+        import base64
+        from email.utils import formatdate
+        headers['Date'] = formatdate(usegmt=True)
+        oss_headers = ''.join(f'{k.lower()}:{v}\n' for k, v in sorted(headers.items()) if k.lower().startswith('x-oss-'))
+        resource = f'/{self.bucket}/{key}'
+        sub = sorted((k, v) for k, v in params.items() if k in OSS_SUBRESOURCES)
+        if sub:
+            resource += '?' + '&'.join(k if v is None else f'{k}={v}' for k, v in sub)
+        string_to_sign = (f"{method}\n{headers.get('Content-MD5', '')}\n{headers.get('Content-Type', '')}\n"
+                          f"{headers['Date']}\n{oss_headers}{resource}")
+        digest = hmac.new(self.access_key_secret.encode(), string_to_sign.encode(), 'sha1').digest()
+        headers['Authorization'] = f"OSS {self.access_key_id}:{base64.b64encode(digest).decode()}"
+
+    def request(self, method, key='', params=None, body=None, headers=None, expect=(200,), sink=None, retries=3):
+        """发送请求，返回 (状态码, 响应头, 响应体)；提供 sink 时把响应体分块交给 sink 处理"""
+        import http.client
+        from urllib.parse import quote, urlencode
+        params = params or {}
+        path = (f'/{self.bucket}/' if self.path_style else '/') + quote(key, safe='/')
+        query = '&'.join(k if v is None else urlencode({k: v}) for k, v in params.items())
+        if query:
+            path += '?' + query
+        for attempt in range(retries):
+            request_headers = dict(headers or {})
+            self._sign(method, key, params, request_headers)
+            try:
+                conn = self._connection(reset=attempt > 0)
+                conn.request(method, path, body=body, headers=request_headers)
+                response = conn.getresponse()
+                if response.status in expect and sink is not None:
+                    while True:
+                        chunk = response.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        sink(chunk)
+                    data = b''
+                else:
+                    data = response.read()
+            except (OSError, http.client.HTTPException):
+                # 长连接可能已被服务端关闭，重建连接后重试
+                if attempt == retries - 1:
+                    raise
+                time.sleep(2 ** attempt)
+                continue
+            if response.status >= 500 and attempt < retries - 1:
+                time.sleep(2 ** attempt)
+                continue
+            if response.status not in expect:
+                import xml.etree.ElementTree as ElementTree
+                code = message = ''
+                try:
+                    root = ElementTree.fromstring(data)
+                    code, message = _xml_text(root, 'Code') or '', _xml_text(root, 'Message') or ''
+                except ElementTree.ParseError:
+                    pass
+                raise OSSError(response.status, code or response.reason, message)
+            return response.status, dict(response.getheaders()), data
+
+    def head_object(self, key):
+        _, headers, _ = self.request('HEAD', key)
+        headers = {k.lower(): v for k, v in headers.items()}
+        return int(headers['content-length']), headers.get('etag', '').strip('"')
+
+    def put_object(self, key, data):
+        import base64
+        md5 = base64.b64encode(hashlib.md5(data).digest()).decode()
+        self.request('PUT', key, body=data, headers={'Content-MD5': md5, 'Content-Length': str(len(data))})
+
+    def get_object(self, key, sink, start=None, end=None):
+        headers = {'Range': f'bytes={start}-{end}'} if start is not None else {}
+        self.request('GET', key, headers=headers, expect=(200, 206), sink=sink)
+
+    def initiate_multipart(self, key):
+        import xml.etree.ElementTree as ElementTree
+        _, _, data = self.request('POST', key, params={'uploads': None})
+        return _xml_text(ElementTree.fromstring(data), 'UploadId')
+
+    def upload_part(self, key, upload_id, number, data):
+        import base64
+        md5 = hashlib.md5(data)
+        _, headers, _ = self.request('PUT', key, params={'partNumber': str(number), 'uploadId': upload_id}, body=data,
+                                     headers={'Content-MD5': base64.b64encode(md5.digest()).decode(),
+                                              'Content-Length': str(len(data))})
+        etag = {k.lower(): v for k, v in headers.items()}.get('etag', '').strip('"')
+        if etag.lower() != md5.hexdigest():
+            raise OSSError(0, 'InvalidDigest', f"分片 {number} 的 ETag 与本地 MD5 不一致")
+        return etag
+
+    def complete_multipart(self, key, upload_id, parts):
+        body = ''.join(f'<Part><PartNumber>{n}</PartNumber><ETag>"{etag}"</ETag></Part>' for n, etag in parts)
+        body = f'<CompleteMultipartUpload>{body}</CompleteMultipartUpload>'.encode()
+        self.request('POST', key, params={'uploadId': upload_id}, body=body,
+                     headers={'Content-Type': 'application/xml', 'Content-Length': str(len(body))})
+
+    def _list_pages(self, prefix, delimiter=''):
+        """分页发送 ListObjects 请求，逐页返回 (对象列表, 公共前缀列表)，对象为 (key, size, etag, mtime)"""
+        import xml.etree.ElementTree as ElementTree
+        marker = ''
+        while True:
+            params = {'prefix': prefix, 'marker': marker, 'max-keys': '1000'}
+            if delimiter:
+                params['delimiter'] = delimiter
+            _, _, data = self.request('GET', params=params)
+            root = ElementTree.fromstring(data)
+            objects, prefixes = [], []
+            for item in root:
+                tag = item.tag.rsplit('}', 1)[-1]
+                if tag == 'Contents':
+                    objects.append((_xml_text(item, 'Key'), int(_xml_text(item, 'Size')),
+                                    (_xml_text(item, 'ETag') or '').strip('"'), _oss_time(_xml_text(item, 'LastModified'))))
+                elif tag == 'CommonPrefixes':
+                    prefixes.append(_xml_text(item, 'Prefix'))
+            yield objects, prefixes
+            if (_xml_text(root, 'IsTruncated') or '').lower() != 'true':
+                return
+            next_marker = _xml_text(root, 'NextMarker') or max([obj[0] for obj in objects] + prefixes, default='')
+            if next_marker <= marker:
+                # 截断的空页且没有 NextMarker 时无法继续，按不完整的列举报错，避免死循环或把缺失当作删除
+                raise OSSError(0, 'InvalidResponse', f"{prefix} 的列举结果被截断但无法确定下一页的 marker")
+            marker = next_marker
+
+    def list_objects(self, prefix=''):
+        """分页列出前缀下的所有对象，逐个返回 (key, size, etag, mtime)"""
+        for objects, _ in self._list_pages(prefix):
+            yield from objects
+
+    def list_directory(self, prefix=''):
+        """按 / 分隔列出前缀下一层，返回 (直接位于该层的对象列表, 子目录前缀列表)"""
+        objects, prefixes = [], []
+        for page_objects, page_prefixes in self._list_pages(prefix, '/'):
+            objects.extend(page_objects)
+            prefixes.extend(page_prefixes)
+        return objects, prefixes
+
+def oss_credentials(bucket, passwd_file):
+    """从 add_secret_key() 写入的 passwd-ossfs (bucket:AccessKeyId:AccessKeySecret) 中读取密钥"""
+    with open(passwd_file, 'r') as f:
+        for line in f:
+            parts = line.strip().split(':')
+            if len(parts) == 3 and parts[0] == bucket:
+                return parts[1], parts[2]
+    raise ValueError(f"{passwd_file} 中没有存储空间 {bucket} 的密钥")
+
+def oss_mount(bucket):
+    """从已生成的启动脚本中查找存储空间的 endpoint 与挂载路径"""
+    for name in discover_mounts():
+        info = read_start_script(name)
+        if info and info['bucket'] == bucket:
+            return info
+    return None
+
+def oss_client(bucket, endpoint=None, passwd_file=None, path_style=False):
+    """按 passwd-ossfs 与启动脚本中的配置创建 OSSClient"""
+    passwd_file = passwd_file or os.path.join(file_path, 'passwd', 'passwd-ossfs')
+    if not endpoint:
+        mount = oss_mount(bucket)
+        if not mount or not mount['url']:
+            raise ValueError(f"找不到存储空间 {bucket} 的挂载配置，请用 --endpoint 指定")
+        endpoint = mount['url']
+    access_key_id, access_key_secret = oss_credentials(bucket, passwd_file)
+    return OSSClient(bucket, endpoint, access_key_id, access_key_secret, path_style=path_style)
+
+def _transfer_state(direction, bucket, key, local, resume):
+    """断点续传状态文件路径与已保存的状态"""
+    state_dir = os.path.join(ARTIFACT_CACHE, 'transfer')
+    os.makedirs(state_dir, exist_ok=True)
+    digest = hashlib.sha1(f'{direction}:{bucket}:{key}:{os.path.abspath(local)}'.encode()).hexdigest()
+    path = os.path.join(state_dir, f'{digest}.json')
+    state = {}
+    if resume and os.path.exists(path):
+        with open(path, 'r') as f:
+            state = json.load(f)
+    return path, state
+
+def _save_state(path, state):
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+def _wait_parts(futures):
+    """等待所有分片结束后再抛出第一个错误，避免关闭仍在被其它分片使用的文件描述符"""
+    from concurrent.futures import wait
+    wait(futures)
+    for future in futures:
+        future.result()
+
+def upload_file(client, local, key, part_size, part_pool, resume=True):
+    """上传单个文件：小文件直接 PUT，大文件并发分片上传，已完成的分片记录在状态文件中"""
+    st = os.stat(local)
+    if st.st_size <= part_size:
+        with open(local, 'rb') as f:
+            client.put_object(key, f.read())
+        return st.st_size
+    state_path, state = _transfer_state('upload', client.bucket, key, local, resume)
+    resumed = (state.get('size'), state.get('mtime'), state.get('part_size')) == (st.st_size, st.st_mtime, part_size)
+    lock = threading.Lock()
+    count = (st.st_size + part_size - 1) // part_size
+
+    def upload(number):
+        data = os.pread(fd, part_size, (number - 1) * part_size)
+        etag = client.upload_part(key, state['upload_id'], number, data)
+        with lock:
+            state['parts'][str(number)] = etag
+            _save_state(state_path, state)
+
+    while True:
+        if not resumed:
+            state = {'size': st.st_size, 'mtime': st.st_mtime, 'part_size': part_size,
+                     'upload_id': client.initiate_multipart(key), 'parts': {}}
+            _save_state(state_path, state)
+        fd = os.open(local, os.O_RDONLY)
+        try:
+            pending = [n for n in range(1, count + 1) if str(n) not in state['parts']]
+            _wait_parts([part_pool.submit(upload, n) for n in pending])
+            client.complete_multipart(key, state['upload_id'], sorted((int(n), e) for n, e in state['parts'].items()))
+            break
+        except OSSError as e:
+            if e.code != 'NoSuchUpload':
+                raise
+            # 分片任务已过期或被清理，丢弃状态文件；续传的任务失效时立即重新发起一次分片上传
+            os.remove(state_path)
+            if not resumed:
+                raise
+            print_message(f"{local}: 分片任务 {state['upload_id']} 已失效，重新上传", 'yellow')
+            resumed = False
+        finally:
+            os.close(fd)
+    os.remove(state_path)
+    return st.st_size
+
+def download_file(client, key, local, size, etag, part_size, part_pool, resume=True):
+    """下载单个对象：按 Range 并发分段写入 .part 文件，已完成的分段记录在状态文件中"""
+    os.makedirs(os.path.dirname(os.path.abspath(local)), exist_ok=True)
+    temp = f'{local}.part'
+    state_path, state = _transfer_state('download', client.bucket, key, local, resume)
+    if (state.get('size'), state.get('etag'), state.get('part_size')) != (size, etag, part_size) or not os.path.exists(temp):
+        state = {'size': size, 'etag': etag, 'part_size': part_size, 'parts': []}
+    lock = threading.Lock()
+    fd = os.open(temp, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def download(index):
+        offset = [index * part_size]
+
+        def sink(chunk):
+            os.pwrite(fd, chunk, offset[0])
+            offset[0] += len(chunk)
+
+        client.get_object(key, sink, index * part_size, min(size, (index + 1) * part_size) - 1)
+        with lock:
+            state['parts'].append(index)
+            _save_state(state_path, state)
+
+    try:
+        os.ftruncate(fd, size)
+        if size:
+            count = (size + part_size - 1) // part_size
+            pending = [i for i in range(count) if i not in state['parts']]
+            _wait_parts([part_pool.submit(download, i) for i in pending])
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(temp, local)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    return size
+
+def parse_oss_url(url):
+    """解析 oss://bucket/key，不是 OSS 地址时返回 None"""
+    if not url.startswith('oss://'):
+        return None
+    bucket, _, key = url[len('oss://'):].partition('/')
+    return bucket, key
+
+def refresh_mount_view(client, keys):
+    """列出挂载点中受影响的目录，让 ossfs 刷新目录与 stat 缓存，使传输结果通过挂载可见"""
+    mount = oss_mount(client.bucket)
+    if not mount or not is_mounted(mount['path']):
+        return
+    for directory in sorted({os.path.dirname(key) for key in keys}):
+        path = os.path.join(mount['path'], directory)
+        try:
+            os.listdir(path)
+            print_message(f"已刷新挂载目录: {path}", 'green')
+        except OSError as e:
+            print_message(f"刷新挂载目录失败 {path}: {e}", 'yellow')
+
+def transfer(src, dst, endpoint=None, passwd_file=None, path_style=False, jobs=4, concurrency=16,
+             part_size_mb=OSS_PART_SIZE_MB, resume=True):
+    """在本地与 OSS 之间传输文件或目录树，src/dst 之一为 oss://bucket/key"""
+    import http.client
+    import xml.etree.ElementTree as ElementTree
+    from concurrent.futures import ThreadPoolExecutor
+    source, target = parse_oss_url(src), parse_oss_url(dst)
+    if bool(source) == bool(target):
+        raise ValueError("src 与 dst 必须一个为本地路径，一个为 oss://bucket/key")
+    bucket = (source or target)[0]
+    client = oss_client(bucket, endpoint, passwd_file, path_style)
+    part_size = int(part_size_mb * 1024 * 1024)
+    if target:
+        prefix = target[1]
+        if os.path.isdir(src):
+            prefix = prefix.rstrip('/') + '/' if prefix else ''
+            tasks = [(os.path.join(root, name), prefix + os.path.relpath(os.path.join(root, name), src).replace(os.sep, '/'))
+                     for root, _, names in os.walk(src) for name in sorted(names)]
         else:
-            return 'Failed to retrieve public IP address.'
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        return 'Failed to retrieve public IP address.'
+            tasks = [(src, prefix + os.path.basename(src) if not prefix or prefix.endswith('/') else prefix)]
+    else:
+        key = source[1]
+        if not key or key.endswith('/'):
+            objects = [obj for obj in client.list_objects(key) if not obj[0].endswith('/')]
+            tasks = [(k, os.path.join(dst, k[len(key):]), size, etag) for k, size, etag, _ in objects]
+        else:
+            size, etag = client.head_object(key)
+            local = os.path.join(dst, os.path.basename(key)) if os.path.isdir(dst) else dst
+            tasks = [(key, local, size, etag)]
+    stats = {'files': 0, 'bytes': 0, 'failed': []}
+    if source and (len(tasks) != 1 or tasks[0][1] != dst):
+        # 本地路径由对象名拼出，对象名中的 ../ 或开头的 / 不能把文件写到 dst 之外
+        root = os.path.realpath(dst)
+        unsafe = [task for task in tasks if os.path.realpath(task[1]) == root or
+                  not within(os.path.realpath(task[1]), root)]
+        for task in unsafe:
+            print_message(f"跳过会写到 {dst} 之外的对象 {task[0]}", 'red')
+            stats['failed'].append(task[0])
+        tasks = [task for task in tasks if task not in unsafe]
+    print_message(f"共 {len(tasks)} 个文件，并发文件数 {jobs}，并发分片数 {concurrency}，分片大小 {part_size_mb}MB", 'cyan')
+    start = time.monotonic()
+    lock = threading.Lock()
+
+    def run(task):
+        try:
+            if target:
+                done = upload_file(client, task[0], task[1], part_size, part_pool, resume)
+            else:
+                done = download_file(client, task[0], task[1], task[2], task[3], part_size, part_pool, resume)
+        except (OSSError, OSError, ValueError, http.client.HTTPException, ElementTree.ParseError) as e:
+            print_message(f"传输失败 {task[0]}: {e}", 'red')
+            with lock:
+                stats['failed'].append(task[0])
+            return
+        with lock:
+            stats['files'] += 1
+            stats['bytes'] += done
+            elapsed = time.monotonic() - start
+            print_message(f"[{stats['files']}/{len(tasks)}] {task[0]} -> {task[1]} "
+                          f"({stats['bytes'] / 1048576 / max(elapsed, 1e-6):.1f}MB/s)", 'green')
+
+    with ThreadPoolExecutor(max_workers=concurrency) as part_pool, ThreadPoolExecutor(max_workers=jobs) as file_pool:
+        list(file_pool.map(run, tasks))
+    stats['seconds'] = round(time.monotonic() - start, 3)
+    stats['mb_per_s'] = round(stats['bytes'] / 1048576 / max(stats['seconds'], 1e-6), 2)
+    if target:
+        refresh_mount_view(client, [task[1] for task in tasks])
+        invalidate_index(bucket, [task[1] for task in tasks])
+    print_message(f"传输完成: {stats['files']} 个文件, {stats['bytes'] / 1048576:.1f}MB, "
+                  f"{stats['seconds']}s, {stats['mb_per_s']}MB/s，失败 {len(stats['failed'])} 个",
+                  'red' if stats['failed'] else 'green')
+    return stats
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key TEXT PRIMARY KEY, parent TEXT NOT NULL, name TEXT NOT NULL,
+    size INTEGER NOT NULL, mtime INTEGER NOT NULL, etag TEXT NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS objects_parent ON objects (parent, name);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS prefixes (
+    prefix TEXT PRIMARY KEY, recursive INTEGER NOT NULL, refreshed REAL NOT NULL,
+    objects INTEGER NOT NULL, bytes INTEGER NOT NULL, invalidated REAL NOT NULL DEFAULT 0) WITHOUT ROWID;
+"""
+# 大于任何合法字符的上界，前缀范围查询写作 key >= prefix AND key < prefix + INDEX_MAX
+INDEX_MAX = '\U0010ffff'
+
+def index_path(bucket):
+    """存储空间元数据索引的 SQLite 文件路径"""
+    return os.path.join(file_path, 'index', f'{bucket}.db')
+
+def open_index(bucket, create=True):
+    """打开存储空间的索引，索引不存在且 create 为 False 时返回 None"""
+    import sqlite3
+    path = index_path(bucket)
+    if not create and not os.path.exists(path):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, timeout=30)
+    # WAL 模式下刷新索引时查询不会被阻塞
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(INDEX_SCHEMA)
+    if 'invalidated' not in {row[1] for row in db.execute('PRAGMA table_info(prefixes)')}:
+        # 旧版本建立的索引没有 invalidated 列
+        db.execute('ALTER TABLE prefixes ADD COLUMN invalidated REAL NOT NULL DEFAULT 0')
+    return db
+
+def index_buckets(passwd_file=None):
+    """passwd-ossfs 中配置的所有存储空间"""
+    passwd_file = passwd_file or os.path.join(file_path, 'passwd', 'passwd-ossfs')
+    buckets = []
+    with open(passwd_file, 'r') as f:
+        for line in f:
+            parts = line.strip().split(':')
+            if len(parts) == 3 and parts[0] not in buckets:
+                buckets.append(parts[0])
+    return buckets
+
+def _dir_prefix(path):
+    """把查询路径规范为目录前缀：'' 或以 / 结尾"""
+    path = path.strip('/')
+    return f'{path}/' if path else ''
+
+def _parent(key):
+    """对象或目录的上级目录前缀"""
+    head, sep, _ = key.rstrip('/').rpartition('/')
+    return head + sep
+
+def _ancestors(key):
+    """key 的所有上级目录前缀 (不含根目录)"""
+    parts = key.rstrip('/').split('/')[:-1]
+    return ['/'.join(parts[:i]) + '/' for i in range(1, len(parts) + 1)]
+
+def _index_write(db, prefix, recursive, objects, subdirs=(), started=None):
+    """在一个事务中替换 prefix 下的索引内容：recursive 为真时替换整个子树，否则只替换直接位于该层的对象与子目录。
+    started 为开始列举的时间，记为刷新时间；列举期间被 invalidate_index 标记过期的分片保持过期"""
+    dirs = {(d, _parent(d)) for d in subdirs}
+    dirs.update((d, _parent(d)) for d in _ancestors(prefix + 'x'))
+    rows = []
+    for key, size, etag, mtime in objects:
+        dirs.update((d, _parent(d)) for d in _ancestors(key) if len(d) > len(prefix))
+        if key.endswith('/'):
+            # ossfs 创建的目录占位对象只记录为目录
+            if len(key) > len(prefix):
+                dirs.add((key, _parent(key)))
+            continue
+        rows.append((key, _parent(key), key.rsplit('/', 1)[-1], size, mtime, etag))
+    with db:
+        if recursive:
+            db.execute('DELETE FROM objects WHERE key >= ? AND key < ?', (prefix, prefix + INDEX_MAX))
+            db.execute('DELETE FROM dirs WHERE path > ? AND path < ?', (prefix, prefix + INDEX_MAX))
+        else:
+            db.execute('DELETE FROM objects WHERE parent = ?', (prefix,))
+            db.execute('DELETE FROM dirs WHERE parent = ?', (prefix,))
+        db.executemany('INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)', rows)
+        db.executemany('INSERT OR IGNORE INTO dirs VALUES (?, ?)', sorted(dirs))
+        started = time.time() if started is None else started
+        db.execute('INSERT INTO prefixes (prefix, recursive, refreshed, objects, bytes) VALUES (?, ?, ?, ?, ?) '
+                   'ON CONFLICT (prefix) DO UPDATE SET recursive = excluded.recursive, objects = excluded.objects, '
+                   'bytes = excluded.bytes, '
+                   'refreshed = CASE WHEN prefixes.invalidated >= excluded.refreshed THEN 0 ELSE excluded.refreshed END',
+                   (prefix, int(recursive), started, len(rows), sum(row[3] for row in rows)))
+    return len(rows)
+
+def _index_drop(db, prefix, recursive):
+    """删除一个已不存在的目录在索引中的内容"""
+    with db:
+        if recursive:
+            db.execute('DELETE FROM objects WHERE key >= ? AND key < ?', (prefix, prefix + INDEX_MAX))
+            db.execute('DELETE FROM dirs WHERE path >= ? AND path < ?', (prefix, prefix + INDEX_MAX))
+        else:
+            db.execute('DELETE FROM objects WHERE parent = ?', (prefix,))
+            db.execute('DELETE FROM dirs WHERE parent = ? OR path = ?', (prefix, prefix))
+        db.execute('DELETE FROM prefixes WHERE prefix = ?', (prefix,))
+
+def refresh_index(client, prefix='', depth=1, max_age=3600, workers=8):
+    """增量刷新索引：先按 / 逐层列出 depth 层目录得到分片，再并发完整列出各分片；
+    只有新出现、超过 max_age 未刷新或被 transfer 标记为过期的分片才会重新列举"""
+    import http.client
+    import xml.etree.ElementTree as ElementTree
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    errors = (OSSError, OSError, http.client.HTTPException, ElementTree.ParseError)
+    prefix = _dir_prefix(prefix)
+    db = open_index(client.bucket)
+    start = time.monotonic()
+    known = {row[0]: (bool(row[1]), row[2]) for row in db.execute(
+        'SELECT prefix, recursive, refreshed FROM prefixes WHERE prefix >= ? AND prefix < ?', (prefix, prefix + INDEX_MAX))}
+    stats = {'bucket': client.bucket, 'shards': 0, 'listed': 0, 'skipped': 0, 'removed': 0, 'failed': []}
+
+    def list_level(shard):
+        started = time.time()
+        try:
+            return started, client.list_directory(shard)
+        except errors as e:
+            print_message(f"{client.bucket}: 列举 {shard} 失败: {e}", 'red')
+            return started, None
+
+    def list_shard(shard):
+        started = time.time()
+        return started, list(client.list_objects(shard))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        levels, shards = {}, [prefix]
+        for _ in range(depth):
+            next_shards = []
+            for shard, (started, listing) in zip(shards, pool.map(list_level, shards)):
+                if listing is None:
+                    # 该目录及其下层保留旧的索引内容，下次刷新时重试
+                    stats['failed'].append(shard)
+                    continue
+                levels[shard] = (started, listing)
+                next_shards += listing[1]
+            shards = next_shards
+        current = {p: False for p in levels}
+        current.update((s, True) for s in shards)
+        for p, (recursive, _) in known.items():
+            if current.get(p) == recursive or any(p.startswith(f) for f in stats['failed']):
+                continue
+            if any(r and p.startswith(s) and p != s for s, r in current.items()):
+                # 已被上层分片完整覆盖 (如减小了 --depth)，只删除分片记录
+                with db:
+                    db.execute('DELETE FROM prefixes WHERE prefix = ?', (p,))
+            else:
+                _index_drop(db, p, recursive)
+                stats['removed'] += 1
+        for p, (started, (objects, subdirs)) in levels.items():
+            _index_write(db, p, False, objects, subdirs, started)
+        cutoff = time.time() - max_age
+        stale = [s for s in shards if not (known.get(s, (False, 0))[0] and known[s][1] >= cutoff)]
+        stats['shards'], stats['skipped'] = len(shards), len(shards) - len(stale)
+        futures = {pool.submit(list_shard, s): s for s in stale}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                started, objects = future.result()
+                count = _index_write(db, shard, True, objects, started=started)
+            except errors as e:
+                # 保留旧的索引内容，下次刷新时重试
+                print_message(f"{client.bucket}: 列举 {shard} 失败: {e}", 'red')
+                stats['failed'].append(shard)
+                continue
+            stats['listed'] += 1
+            print_message(f"[{stats['listed']}/{len(stale)}] {client.bucket}/{shard}: {count} 个对象", 'green')
+    stats['objects'], stats['bytes'] = db.execute('SELECT count(*), coalesce(sum(size), 0) FROM objects').fetchone()
+    stats['seconds'] = round(time.monotonic() - start, 3)
+    db.close()
+    return stats
+
+def invalidate_index(bucket, keys):
+    """把包含这些对象的索引分片标记为过期，下次 refresh 时重新列举"""
+    db = open_index(bucket, create=False)
+    if db is None:
+        return
+    prefixes = {''} | {d for key in keys for d in _ancestors(key)}
+    now = time.time()
+    with db:
+        # invalidated 让正在进行的刷新在写入时保持过期，而不是用列举开始前的结果覆盖
+        db.executemany('UPDATE prefixes SET refreshed = 0, invalidated = ? WHERE prefix = ?',
+                       [(now, p) for p in sorted(prefixes)])
+    db.close()
+
+def index_ls(db, path=''):
+    """列出目录下一层，返回 (子目录列表, [(文件名, 大小, 修改时间)])"""
+    prefix = _dir_prefix(path)
+    dirs = [row[0][len(prefix):] for row in db.execute('SELECT path FROM dirs WHERE parent = ? ORDER BY path', (prefix,))]
+    files = db.execute('SELECT name, size, mtime FROM objects WHERE parent = ? ORDER BY name', (prefix,)).fetchall()
+    return dirs, files
+
+def index_find(db, prefix='', name=None, min_size=None, max_size=None, newer=None, older=None):
+    """按 key 前缀、文件名通配符、大小与修改时间 (天) 过滤，逐个返回 (key, 大小, 修改时间)"""
+    prefix = prefix.lstrip('/')
+    sql = 'SELECT key, size, mtime FROM objects WHERE key >= ? AND key < ?'
+    params = [prefix, prefix + INDEX_MAX]
+    for clause, value in (('name GLOB ?', name), ('size >= ?', min_size), ('size <= ?', max_size),
+                          ('mtime >= ?', newer and time.time() - newer * 86400),
+                          ('mtime < ?', older and time.time() - older * 86400)):
+        if value is not None:
+            sql += f' AND {clause}'
+            params.append(value)
+    yield from db.execute(sql + ' ORDER BY key', params)
+
+def index_du(db, path=''):
+    """统计目录总量及按下一层子目录的分布，返回 ((对象数, 字节数), [(子目录, 对象数, 字节数)])"""
+    prefix = _dir_prefix(path)
+    bounds = (prefix, prefix + INDEX_MAX)
+    total = db.execute('SELECT count(*), coalesce(sum(size), 0) FROM objects WHERE key >= ? AND key < ?', bounds).fetchone()
+    offset = len(prefix) + 1
+    children = db.execute("""
+        SELECT CASE WHEN instr(substr(key, ?), '/') > 0 THEN substr(key, ?, instr(substr(key, ?), '/')) ELSE '' END AS child,
+               count(*), sum(size)
+        FROM objects WHERE key >= ? AND key < ? GROUP BY child ORDER BY 3 DESC""", (offset, offset, offset) + bounds).fetchall()
+    return total, children
+
+def index_main(args):
+    """index 子命令入口"""
+    if args.index_command == 'refresh':
+        buckets = args.buckets or index_buckets(args.passwd_file)
+        failed = []
+        for bucket in buckets:
+            try:
+                client = oss_client(bucket, args.endpoint, args.passwd_file, args.path_style)
+                stats = refresh_index(client, args.prefix, args.depth, args.max_age, args.workers)
+            except (OSSError, OSError, ValueError) as e:
+                # 一个存储空间失败不影响其它存储空间的刷新
+                print_message(f"{bucket}: 刷新索引失败: {e}", 'red')
+                failed.append(bucket)
+                continue
+            print_message(f"{bucket}: 分片 {stats['shards']} 个，重新列举 {stats['listed']} 个，跳过 {stats['skipped']} 个，"
+                          f"删除 {stats['removed']} 个；共 {stats['objects']} 个对象 {stats['bytes'] / 1048576:.1f}MB，"
+                          f"用时 {stats['seconds']}s", 'red' if stats['failed'] else 'green')
+            if stats['failed']:
+                failed.append(bucket)
+        if failed:
+            sys.exit(1)
+        return
+    db = open_index(args.bucket, create=False)
+    if db is None:
+        print_message(f"存储空间 {args.bucket} 尚未建立索引，请先运行 index refresh {args.bucket}", 'red')
+        sys.exit(1)
+    if args.index_command == 'ls':
+        dirs, files = index_ls(db, args.path)
+        for name in dirs:
+            print(f"{'-':>12}  {'':16}  {name}")
+        for name, size, mtime in files:
+            print(f"{size:>12}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}  {name}")
+    elif args.index_command == 'find':
+        root = None
+        if args.local:
+            mount = oss_mount(args.bucket)
+            if not mount:
+                print_message(f"找不到存储空间 {args.bucket} 的挂载路径", 'red')
+                sys.exit(1)
+            root = mount['path']
+        end = '\0' if args.print0 else '\n'
+        for key, _, _ in index_find(db, args.prefix, args.name, args.min_size, args.max_size, args.newer, args.older):
+            sys.stdout.write((os.path.join(root, key) if root else key) + end)
+    elif args.index_command == 'du':
+        (count, total), children = index_du(db, args.path)
+        if not args.summarize:
+            for child, child_count, child_bytes in children:
+                print(f"{child_bytes / 1048576:>12.1f}MB  {child_count:>10}  {child or '(本层文件)'}")
+        print(f"{total / 1048576:>12.1f}MB  {count:>10}  {_dir_prefix(args.path) or '/'}")
+    db.close()
+
+def read_limits(name):
+    """读取 limits_ossfs_<name>.json 中记录的资源限制"""
+    limits_file = os.path.join(file_path, name, f'limits_ossfs_{name}.json')
+    if not os.path.exists(limits_file):
+        return {}
+    with open(limits_file, 'r') as f:
+        return validate_limits(json.load(f))
+
+def process_cgroup(pid):
+    """返回进程所在的 cgroup v2 目录"""
+    with open(f'/proc/{pid}/cgroup') as f:
+        for line in f:
+            if line.startswith('0::'):
+                return CGROUP_ROOT + line.strip()[3:]
+    return None
+
+def read_cgroup(path):
+    """读取 cgroup 中与资源限制相关的当前值"""
+    values = {}
+    for file in ('memory.current', 'memory.max', 'memory.peak', 'cpu.weight', 'io.weight'):
+        try:
+            with open(os.path.join(path, file)) as f:
+                values[file] = f.read().split('\n')[0].replace('default ', '')
+        except OSError:
+            continue
+    try:
+        with open(os.path.join(path, 'memory.events')) as f:
+            events = dict(line.split() for line in f if line.strip())
+        values['oom_kill'] = events.get('oom_kill', '0')
+    except OSError:
+        pass
+    return values
+
+def trim_cache(cache_dir, quota, low_water=0.9):
+    """缓存目录超过配额时按访问时间从旧到新删除文件，直到低于配额的 low_water，返回释放的字节数"""
+    files = []
+    total = 0
+    stack = [cache_dir]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files.append((st.st_atime, st.st_blocks * 512, entry.path))
+                        total += st.st_blocks * 512
+        except OSError:
+            continue
+    if total <= quota:
+        return 0
+    freed = 0
+    target = total - quota * low_water
+    for _, size, path in sorted(files):
+        if freed >= target:
+            break
+        try:
+            os.remove(path)
+            freed += size
+        except OSError:
+            continue
+    return freed
+
+def limits_report(enforce=False, as_json=False):
+    """汇报每个挂载配置的资源限制与 cgroup 中的实际值，enforce 时按 cache_quota 清理缓存目录"""
+    import xmlrpc.client
+    supervisor_conf_path = os.path.join(supervisor_path, 'supervisord.conf')
+    pids = {}
+    supervisor_known = False
+    try:
+        for process in supervisor_rpc(supervisor_conf_path).supervisor.getAllProcessInfo():
+            if process['group'].startswith('ossfs_') and process['statename'] == 'RUNNING':
+                pids[process['group'][len('ossfs_'):]] = process['pid']
+        supervisor_known = True
+    except (OSError, KeyError, xmlrpc.client.Fault) as e:
+        print_message(f"无法从 supervisor 获取进程信息: {e}", 'yellow')
+    report = {}
+    for name in sorted(discover_mounts()):
+        info = read_start_script(name) or {'options': {}}
+        limits = read_limits(name)
+        entry = {'limits': limits}
+        ossfs_pid = find_ossfs_pid(pids[name]) if name in pids else None
+        if ossfs_pid:
+            cgroup = process_cgroup(ossfs_pid)
+            entry['cgroup'] = cgroup
+            entry['current'] = read_cgroup(cgroup) if cgroup else {}
+        cache_dir = info['options'].get('use_cache')
+        if isinstance(cache_dir, str) and os.path.isdir(cache_dir):
+            if enforce and limits.get('cache_quota'):
+                # ossfs 运行时可能正在读写缓存文件，只在挂载停止后清理；运行中依靠 ossfs 自身的 ensure_diskfree
+                stopped = supervisor_known and name not in pids and not (info.get('path') and is_mounted(info['path']))
+                if not stopped:
+                    print_message(f"ossfs_{name}: 挂载运行中，跳过缓存清理", 'yellow')
+                else:
+                    freed = trim_cache(cache_dir, limits['cache_quota'])
+                    if freed:
+                        print_message(f"ossfs_{name}: 缓存超出配额，已清理 {freed / 1048576:.1f}MB", 'yellow')
+            entry['cache_bytes'] = dir_usage(cache_dir)
+        report[name] = entry
+    if as_json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return report
+    for name, entry in report.items():
+        limits, current = entry['limits'], entry.get('current', {})
+        cache = f"{entry['cache_bytes'] / 1048576:.0f}MB" if 'cache_bytes' in entry else '-'
+        quota = f"/{limits['cache_quota'] / 1048576:.0f}MB" if limits.get('cache_quota') else ''
+        memory = f"{int(current['memory.current']) / 1048576:.0f}MB" if 'memory.current' in current else '-'
+        print(f"ossfs_{name}: 内存 {memory}/{current.get('memory.max', limits.get('memory_max', 'max'))}, "
+              f"CPU 权重 {current.get('cpu.weight', limits.get('cpu_weight', '-'))}, "
+              f"IO 权重 {current.get('io.weight', limits.get('io_weight', '-'))}, "
+              f"OOM {current.get('oom_kill', '-')}, 缓存 {cache}{quota}, cgroup {entry.get('cgroup', '-')}")
+    return report
+
+def bench_main(args):
+    """bench 子命令入口"""
+    if args.compare:
+        compare_benchmarks(args.compare)
+        return
+    if not args.mount or not os.path.isdir(args.mount):
+        print_message("请指定一个已挂载的目录。", 'red')
+        sys.exit(1)
+    report = {
+        'label': args.label,
+        'mount': os.path.realpath(args.mount),
+        'mount_info': mount_options(args.mount),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'params': {'size_mb': args.size_mb, 'random_ops': args.ops, 'files': args.files, 'list_files': args.list_files},
+        'results': bench_mount(args.mount, args.size_mb, random_ops=args.ops, files=args.files, list_files=args.list_files),
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print_message(f"基准测试结果已写入 {args.output}", 'green')
+    else:
+        print(output)
+
 def main():
 
-    install_required_packages()
+    with phase('install_required_packages'):
+        install_required_packages()
     initialize_globals()
     if not check_ossfs_installed():
-        install_ossfs()
+        with phase('install_ossfs'):
+            install_ossfs()
 
     configure_ossfs()
-    mount_oss()
+    with phase('mount_oss'):
+        mount_oss()
 
     script_path = os.path.abspath(__file__)
     print_message(f"脚本执行完成，正在删除脚本文件: {script_path}", 'green')
@@ -317,5 +2444,150 @@ def main():
     except Exception as e:
         print_message(f"删除脚本文件失败: {e}", 'red')
 
+def parse_args(argv=None):
+    """解析命令行参数，不带子命令时进入交互模式"""
+    parser = argparse.ArgumentParser(description="ossfs 一键安装与挂载脚本")
+    parser.add_argument('--run-report', help="将各阶段与各命令的耗时以 JSON 写入该文件")
+    parser.add_argument('--prom-file', help="将耗时指标写入 Prometheus textfile collector 文件")
+    subparsers = parser.add_subparsers(dest='command')
+
+    apply = subparsers.add_parser('apply', help="按清单文件一次性应用所有挂载")
+    apply.add_argument('manifest', help="JSON 格式的挂载清单")
+    apply.add_argument('--prune', action='store_true', help="删除不在清单中的挂载配置")
+    apply.add_argument('--dry-run', action='store_true', help="只显示变更，不写入文件")
+
+    bench = subparsers.add_parser('bench', help="对挂载目录运行 I/O 基准测试，输出 JSON")
+    bench.add_argument('mount', nargs='?', help="要测试的挂载目录")
+    bench.add_argument('--label', help="本次测试的标签，如性能预设名称")
+    bench.add_argument('--output', help="将 JSON 结果写入该文件")
+    bench.add_argument('--size-mb', type=int, default=256, help="顺序读写测试文件大小 (默认 256MB)")
+    bench.add_argument('--ops', type=int, default=200, help="随机读次数 (默认 200)")
+    bench.add_argument('--files', type=int, default=500, help="小文件测试数量 (默认 500)")
+    bench.add_argument('--list-files', type=int, default=2000, help="大目录列举测试的文件数 (默认 2000)")
+    bench.add_argument('--compare', nargs='+', metavar='JSON', help="对比多个结果文件，以第一个为基准")
+
+    health = subparsers.add_parser('health', help="探测所有挂载，发现失效后自动恢复对应进程")
+    health.add_argument('--file-path', default='/home/supervisord/program/ossfs', help="ossfs 脚本主目录")
+    health.add_argument('--interval', type=float, default=5, help="探测间隔秒数 (默认 5)")
+    health.add_argument('--timeout', type=float, default=3, help="单次探测超时秒数 (默认 3)")
+    health.add_argument('--max-backoff', type=float, default=300, help="恢复重试的最大退避秒数 (默认 300)")
+    health.add_argument('--once', action='store_true', help="只探测并恢复一轮")
+
+    warm = subparsers.add_parser('warm', help="并发读取热点文件，预热挂载的页缓存、本地磁盘缓存和 stat 缓存")
+    warm.add_argument('mount', help="ossfs 挂载目录")
+    warm.add_argument('prefixes', nargs='*', help="需要预热的目录或文件 (相对挂载目录)，默认整个挂载")
+    warm.add_argument('--manifest', help="每行一个路径的清单文件，按顺序预热")
+    warm.add_argument('-j', '--workers', type=int, default=8, help="并发读取的线程数 (默认 8)")
+    warm.add_argument('--rate-mb', type=float, default=0, help="读取速率上限 MB/s (默认不限)")
+    warm.add_argument('--budget-mb', type=float, default=0, help="最多读取的数据量 MB (默认不限)")
+    warm.add_argument('--progress-interval', type=float, default=2, help="进度输出间隔秒数 (默认 2)")
+
+    transfer_parser = subparsers.add_parser('transfer', help="绕过 FUSE 直接通过 OSS API 并发分片上传/下载文件或目录")
+    transfer_parser.add_argument('src', help="本地路径或 oss://bucket/key")
+    transfer_parser.add_argument('dst', help="本地路径或 oss://bucket/key (以 / 结尾表示目录前缀)")
+    transfer_parser.add_argument('--file-path', default='/home/supervisord/program/ossfs', help="ossfs 脚本主目录，用于读取密钥和 endpoint")
+    transfer_parser.add_argument('--passwd-file', help="密钥文件 (默认 <主目录>/passwd/passwd-ossfs)")
+    transfer_parser.add_argument('--endpoint', help="OSS endpoint，默认使用该存储空间启动脚本中的 -ourl")
+    transfer_parser.add_argument('--path-style', action='store_true', help="使用 path-style 地址 (本地兼容服务)")
+    transfer_parser.add_argument('-j', '--jobs', type=int, default=4, help="同时传输的文件数 (默认 4)")
+    transfer_parser.add_argument('-c', '--concurrency', type=int, default=16, help="同时进行的分片请求数 (默认 16)")
+    transfer_parser.add_argument('--part-size-mb', type=float, default=OSS_PART_SIZE_MB, help=f"分片大小 MB (默认 {OSS_PART_SIZE_MB})")
+    transfer_parser.add_argument('--no-resume', action='store_true', help="忽略断点续传状态，重新传输")
+
+    index = subparsers.add_parser('index', help="为 passwd-ossfs 中的存储空间维护本地 SQLite 元数据索引，快速执行 ls/find/du")
+    index_commands = index.add_subparsers(dest='index_command', required=True)
+    refresh = index_commands.add_parser('refresh', help="增量刷新索引，只重新列举新增或过期的目录分片")
+    refresh.add_argument('buckets', nargs='*', help="要刷新的存储空间，默认 passwd-ossfs 中的全部")
+    refresh.add_argument('--prefix', default='', help="只刷新该目录前缀")
+    refresh.add_argument('--depth', type=int, default=1, help="按该层数的子目录划分分片 (默认 1)")
+    refresh.add_argument('--max-age', type=float, default=3600, help="分片超过该秒数未刷新才重新列举，0 表示全部重新列举 (默认 3600)")
+    refresh.add_argument('-j', '--workers', type=int, default=8, help="并发列举的线程数 (默认 8)")
+    refresh.add_argument('--passwd-file', help="密钥文件 (默认 <主目录>/passwd/passwd-ossfs)")
+    refresh.add_argument('--endpoint', help="OSS endpoint，默认使用该存储空间启动脚本中的 -ourl")
+    refresh.add_argument('--path-style', action='store_true', help="使用 path-style 地址 (本地兼容服务)")
+    index_ls_parser = index_commands.add_parser('ls', help="列出目录下一层")
+    index_ls_parser.add_argument('bucket', help="存储空间名称")
+    index_ls_parser.add_argument('path', nargs='?', default='', help="目录 (默认根目录)")
+    index_find_parser = index_commands.add_parser('find', help="按前缀、文件名、大小和修改时间查找对象")
+    index_find_parser.add_argument('bucket', help="存储空间名称")
+    index_find_parser.add_argument('prefix', nargs='?', default='', help="key 前缀")
+    index_find_parser.add_argument('--name', help="文件名通配符，如 '*.parquet'")
+    index_find_parser.add_argument('--min-size', type=parse_size, help="最小大小，如 10M")
+    index_find_parser.add_argument('--max-size', type=parse_size, help="最大大小，如 1G")
+    index_find_parser.add_argument('--newer', type=float, help="只列出最近该天数内修改的对象")
+    index_find_parser.add_argument('--older', type=float, help="只列出该天数之前修改的对象")
+    index_find_parser.add_argument('--local', action='store_true', help="输出挂载目录中的本地路径")
+    index_find_parser.add_argument('-0', '--print0', action='store_true', help="以 \\0 分隔输出，配合 xargs -0")
+    index_du_parser = index_commands.add_parser('du', help="统计目录占用及下一层子目录的分布")
+    index_du_parser.add_argument('bucket', help="存储空间名称")
+    index_du_parser.add_argument('path', nargs='?', default='', help="目录 (默认根目录)")
+    index_du_parser.add_argument('-s', '--summarize', action='store_true', help="只输出总量")
+    for sub in (refresh, index_ls_parser, index_find_parser, index_du_parser):
+        sub.add_argument('--file-path', default='/home/supervisord/program/ossfs', help="ossfs 脚本主目录，索引保存在其下的 index 目录")
+
+    limits = subparsers.add_parser('limits', help="汇报每个挂载的资源限制与 cgroup 实际值，可按缓存配额清理")
+    limits.add_argument('--file-path', default='/home/supervisord/program/ossfs', help="ossfs 脚本主目录")
+    limits.add_argument('--enforce', action='store_true', help="已停止的挂载缓存目录超出 cache_quota 时按访问时间清理")
+    limits.add_argument('--interval', type=float, help="按该间隔秒数循环执行 (配合 --enforce 常驻)")
+    limits.add_argument('--json', action='store_true', help="以 JSON 输出")
+
+    metrics = subparsers.add_parser('metrics', help="按固定间隔导出每个挂载的 RSS、CPU、I/O、线程、文件描述符、缓存占用与重启次数")
+    metrics.add_argument('--file-path', default='/home/supervisord/program/ossfs', help="ossfs 脚本主目录")
+    metrics.add_argument('--interval', type=float, default=15, help="采样间隔秒数 (默认 15)")
+    metrics.add_argument('--cache-interval', type=float, default=60, help="统计缓存目录占用的间隔秒数 (默认 60)")
+    metrics.add_argument('--format', choices=['prom', 'json'], default='prom', help="输出格式 (默认 prom)")
+    metrics.add_argument('--output', help="写入该文件 (如 node_exporter textfile 目录下的 ossfs.prom)，默认输出到标准输出")
+    metrics.add_argument('--once', action='store_true', help="只采样一次")
+    return parser.parse_args(argv)
+
+def cli(args):
+    """按子命令分发"""
+    global file_path
+    if args.command == 'apply':
+        apply_manifest(args.manifest, args.prune, args.dry_run)
+    elif args.command == 'bench':
+        bench_main(args)
+    elif args.command == 'health':
+        file_path = args.file_path
+        health_check(args.interval, args.timeout, args.max_backoff, args.once)
+    elif args.command == 'warm':
+        if not os.path.isdir(args.mount):
+            print_message("请指定一个已挂载的目录。", 'red')
+            sys.exit(1)
+        warm_cache(args.mount, args.prefixes, args.manifest, args.workers, args.rate_mb, args.budget_mb,
+                   progress_interval=args.progress_interval)
+    elif args.command == 'transfer':
+        file_path = args.file_path
+        try:
+            stats = transfer(args.src, args.dst, args.endpoint, args.passwd_file, args.path_style, args.jobs,
+                             args.concurrency, args.part_size_mb, not args.no_resume)
+        except (OSSError, OSError, ValueError) as e:
+            print_message(f"传输失败: {e}", 'red')
+            sys.exit(1)
+        if stats['failed']:
+            sys.exit(1)
+    elif args.command == 'index':
+        file_path = args.file_path
+        try:
+            index_main(args)
+        except (OSSError, OSError, ValueError) as e:
+            print_message(f"索引操作失败: {e}", 'red')
+            sys.exit(1)
+    elif args.command == 'limits':
+        file_path = args.file_path
+        while True:
+            limits_report(args.enforce, args.json)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    elif args.command == 'metrics':
+        file_path = args.file_path
+        export_metrics(args.interval, args.format, args.output, args.cache_interval, args.once)
+    else:
+        main()
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    REPORT_PATH = args.run_report or REPORT_PATH
+    PROM_PATH = args.prom_file or PROM_PATH
+    run_with_report(cli, args)
@@ -0,0 +1,289 @@
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+import contextlib
+import types
+try:
+    from termcolor import colored
+except ImportError:
+    # termcolor 为可选依赖，未安装时输出无颜色文本
+    def colored(text, color=None, *args, **kwargs):
+        return text
+
+# 回放时改写到沙箱目录下的模块级路径，避免写入真实系统
+SANDBOX_GLOBALS = {
+    'acme.py': ('ARTIFACT_CACHE', 'ACME_SYMLINK', 'ACME_INSTALL_TMP'),
+    'ossfs.py': ('ARTIFACT_CACHE', 'supervisor_path', 'file_path', 'SUPERVISOR_ETC_CONF'),
+}
+# 录制中没有覆盖的网络操作，回放时替换为立即返回
+NETWORK_STUBS = {
+    'acme.py': {},
+    'ossfs.py': {'hot_reload': lambda *args, **kwargs: None, 'get_ip_address': lambda *args, **kwargs: '127.0.0.1'},
+}
+
+def print_message(message, color='green'):
+    """打印彩色信息"""
+    print(colored(message, color))
+
+def load_recording(path):
+    """读取 DEBIAN_SCRIPT_RECORD 录制的 JSON Lines 文件，返回 (脚本名, 参数, 事件列表)"""
+    with open(path, 'r') as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    if not events or events[0].get('type') != 'start':
+        raise ValueError(f"{path} 不是有效的录制文件")
+    starts = [i for i, event in enumerate(events) if event['type'] == 'start']
+    if len(starts) > 1:
+        print_message(f"{path} 包含 {len(starts)} 次运行，只回放第一次", 'yellow')
+        events = events[:starts[1]]
+    return events[0]['script'], events[0].get('argv', []), events[1:]
+
+class Replayer:
+    """按录制顺序回答输入、模拟命令结果与耗时，并统计子进程调用次数"""
+
+    def __init__(self, events, sandbox, speed=1.0, artifacts=None):
+        self.sandbox = sandbox
+        self.speed = speed
+        self.artifacts = artifacts
+        self.inputs = [event for event in events if event['type'] == 'input']
+        self.commands = [event for event in events if event['type'] == 'command']
+        self.downloads = [event for event in events if event['type'] == 'artifact']
+        self.recorded_seconds = sum(event['seconds'] for event in self.commands + self.downloads)
+        self.used = set()
+        self.slept = 0.0
+        self.subprocess_calls = 0
+        self.unexpected = []
+        self.prompt_mismatches = []
+
+    def sandboxed(self, path):
+        return os.path.join(self.sandbox, path.lstrip('/'))
+
+    def unsandboxed(self, value):
+        return str(value).replace(self.sandbox, '')
+
+    def wait(self, seconds):
+        if self.speed and seconds:
+            time.sleep(seconds / self.speed)
+            self.slept += seconds / self.speed
+
+    def input(self, prompt=''):
+        if not self.inputs:
+            raise EOFError(f"录制中没有更多输入: {prompt}")
+        event = self.inputs.pop(0)
+        if event['prompt'] not in prompt:
+            self.prompt_mismatches.append({'expected': event['prompt'], 'actual': prompt})
+        answer = event['answer']
+        return self.sandboxed(answer) if answer.startswith('/') else answer
+
+    def match(self, command):
+        """按顺序查找第一条尚未使用且参数一致的录制命令"""
+        command = [self.unsandboxed(part) for part in command]
+        for index, event in enumerate(self.commands):
+            if index not in self.used and event['command'] == command:
+                self.used.add(index)
+                return event
+        self.unexpected.append(' '.join(command))
+        return None
+
+    def run(self, command, *args, **kwargs):
+        self.subprocess_calls += 1
+        event = self.match(command)
+        if event is None:
+            # 按成功处理会让脚本走上与录制不同的分支 (如 which 探测)，测得的耗时失去意义
+            raise RuntimeError(f"录制中没有这条命令: {' '.join(self.unsandboxed(part) for part in command)}")
+        self.wait(event['seconds'])
+        if event['returncode'] is None:
+            raise FileNotFoundError(event.get('error', command[0]))
+        stdout = event.get('stdout') or ''
+        if kwargs.get('stdout') is not subprocess.PIPE:
+            stdout = None
+        elif not kwargs.get('text'):
+            stdout = stdout.encode()
+        return subprocess.CompletedProcess(command, event['returncode'], stdout)
+
+    def popen(self, command, *args, **kwargs):
+        # run_command 在开启运行报告时使用 Popen 边输出边统计，回放时统一按 run 处理
+        return ReplayedProcess(self.run(command, stdout=subprocess.PIPE))
+
+    def fetch_artifact(self, cache_dir):
+        def fetch(url, name=None, sha256=None):
+            event = self.downloads.pop(0) if self.downloads else {'name': name or url.rsplit('/', 1)[-1], 'seconds': 0}
+            self.wait(event['seconds'])
+            source = None
+            for directory in filter(None, (self.artifacts, '/var/cache/debian-script')):
+                if os.path.exists(os.path.join(directory, event['name'])):
+                    source = os.path.join(directory, event['name'])
+                    break
+            if source is None:
+                raise RuntimeError(f"回放缺少下载产物 {event['name']}，请用 --artifacts 指定所在目录")
+            os.makedirs(cache_dir, exist_ok=True)
+            target = os.path.join(cache_dir, event['name'])
+            shutil.copyfile(source, target)
+            return target
+        return fetch
+
+    def unused(self):
+        return [' '.join(event['command']) for index, event in enumerate(self.commands) if index not in self.used]
+
+class ReplayedProcess:
+    """按录制结果模拟 subprocess.Popen 的返回对象"""
+
+    def __init__(self, result):
+        self.args = result.args
+        self.returncode = result.returncode
+        self.output = result.stdout or b''
+        self.stdout = io.BytesIO(self.output)
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    poll = wait
+
+    def communicate(self, input=None, timeout=None):
+        return self.output, b''
+
+    def kill(self):
+        pass
+
+def load_script(script, sandbox):
+    """把脚本复制到沙箱中再导入，脚本结束时删除的是副本"""
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    copy = os.path.join(sandbox, script)
+    shutil.copyfile(source, copy)
+    spec = importlib.util.spec_from_file_location(f"replay_{os.path.splitext(script)[0]}", copy)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def replay(recording, speed=1.0, artifacts=None, verbose=False):
+    """在临时沙箱中回放一次录制，返回耗时与子进程调用统计"""
+    script, argv, events = load_recording(recording)
+    sandbox = tempfile.mkdtemp(prefix='replay-')
+    replayer = Replayer(events, sandbox, speed, artifacts)
+    cwd, environ = os.getcwd(), dict(os.environ)
+    result = {'recording': recording, 'script': script, 'argv': argv, 'exit_code': 0}
+    wall = 0.0
+    try:
+        module = load_script(script, sandbox)
+        module.REPORT_PATH = module.PROM_PATH = module.RECORD_PATH = None
+        for name in SANDBOX_GLOBALS.get(script, ()):
+            setattr(module, name, replayer.sandboxed(getattr(module, name)))
+            os.makedirs(os.path.dirname(getattr(module, name)), exist_ok=True)
+        for name, stub in NETWORK_STUBS.get(script, {}).items():
+            setattr(module, name, stub)
+        module.input = replayer.input
+        module.fetch_artifact = replayer.fetch_artifact(module.ARTIFACT_CACHE)
+        # 只替换该模块看到的 subprocess，不影响回放工具自身
+        module.subprocess = types.SimpleNamespace(**{k: getattr(subprocess, k) for k in dir(subprocess) if not k.startswith('__')})
+        module.subprocess.run = replayer.run
+        module.subprocess.Popen = replayer.popen
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        start = time.monotonic()
+        try:
+            with output:
+                module.cli(module.parse_args(argv))
+        except SystemExit as e:
+            result['exit_code'] = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            result['exit_code'] = 1
+            result['error'] = f"{type(e).__name__}: {e}"
+        wall = time.monotonic() - start
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(sandbox, ignore_errors=True)
+    result.update({
+        'wall_seconds': round(wall, 3),
+        'replayed_latency_seconds': round(replayer.slept, 3),
+        'script_seconds': round(wall - replayer.slept, 3),
+        'recorded_seconds': round(replayer.recorded_seconds, 3),
+        'subprocess_calls': replayer.subprocess_calls,
+        'recorded_commands': len(replayer.commands),
+        'unexpected_commands': replayer.unexpected,
+        'unused_commands': replayer.unused(),
+        'prompt_mismatches': replayer.prompt_mismatches,
+    })
+    return result
+
+def bench(recordings, repeat=3, speed=1.0, artifacts=None):
+    """多次回放每个录制，汇总端到端耗时的中位数与子进程调用次数"""
+    report = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'speed': speed, 'repeat': repeat, 'results': {}}
+    for recording in recordings:
+        runs = [replay(recording, speed, artifacts) for _ in range(repeat)]
+        last = runs[-1]
+        entry = {
+            'script': last['script'],
+            'wall_seconds': round(statistics.median(run['wall_seconds'] for run in runs), 3),
+            'script_seconds': round(statistics.median(run['script_seconds'] for run in runs), 3),
+            'subprocess_calls': last['subprocess_calls'],
+            'exit_code': last['exit_code'],
+            'unexpected_commands': len(last['unexpected_commands']),
+            'unused_commands': len(last['unused_commands']),
+        }
+        if last.get('error'):
+            entry['error'] = last['error']
+        report['results'][os.path.basename(recording)] = entry
+        print_message(f"{os.path.basename(recording)} ({entry['script']}): {entry['wall_seconds']}s, "
+                      f"脚本自身 {entry['script_seconds']}s, 子进程 {entry['subprocess_calls']} 次, "
+                      f"退出码 {entry['exit_code']}", 'green' if entry['exit_code'] == 0 else 'red')
+    return report
+
+def compare(baseline_path, report, threshold=10):
+    """与基线对比，耗时增加超过 threshold% 或子进程调用次数增加视为回归，返回是否回归"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['results']
+    regressed = False
+    for name, entry in report['results'].items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = (entry['wall_seconds'] - base['wall_seconds']) / base['wall_seconds'] * 100 if base['wall_seconds'] else 0
+        calls = entry['subprocess_calls'] - base['subprocess_calls']
+        bad = change > threshold or calls > 0
+        regressed |= bad
+        print_message(f"{name}: 耗时 {base['wall_seconds']}s -> {entry['wall_seconds']}s ({change:+.1f}%), "
+                      f"子进程 {base['subprocess_calls']} -> {entry['subprocess_calls']} ({calls:+d})",
+                      'red' if bad else 'green')
+    return regressed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="回放 acme.py / ossfs.py 的录制并测量端到端耗时")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help="回放一次录制并输出详细结果")
+    run.add_argument('recording', help="DEBIAN_SCRIPT_RECORD 录制的文件")
+    run.add_argument('--speed', type=float, default=1.0, help="命令耗时的回放倍速，0 表示不等待 (默认 1)")
+    run.add_argument('--artifacts', help="回放所需下载产物 (acme.sh 源码包、ossfs .deb) 所在目录")
+    run.add_argument('--verbose', action='store_true', help="显示脚本自身的输出")
+
+    bench_parser = subparsers.add_parser('bench', help="多次回放录制，输出端到端耗时与子进程调用次数")
+    bench_parser.add_argument('recordings', nargs='+', help="录制文件")
+    bench_parser.add_argument('--repeat', type=int, default=3, help="每个录制回放的次数 (默认 3)")
+    bench_parser.add_argument('--speed', type=float, default=1.0, help="命令耗时的回放倍速，0 表示不等待 (默认 1)")
+    bench_parser.add_argument('--artifacts', help="回放所需下载产物所在目录")
+    bench_parser.add_argument('--output', help="将 JSON 结果写入该文件")
+    bench_parser.add_argument('--compare', help="与该基线结果对比，出现回归时退出码为 1")
+    bench_parser.add_argument('--threshold', type=float, default=10, help="耗时回归阈值百分比 (默认 10)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'run':
+        result = replay(args.recording, args.speed, args.artifacts, args.verbose)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        sys.exit(result['exit_code'])
+    report = bench(args.recordings, args.repeat, args.speed, args.artifacts)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_message(f"结果已写入 {args.output}", 'green')
+    if args.compare and compare(args.compare, report, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,379 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import difflib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from termcolor import colored
+except ImportError:
+    # termcolor 为可选依赖，未安装时输出无颜色文本
+    def colored(text, color=None, *args, **kwargs):
+        return text
+
+SSHD_CONFIG = '/etc/ssh/sshd_config'
+# sshd 把 Include 中的相对路径解析到 /etc/ssh，与 -f 指定的配置文件所在目录无关
+SSHD_DIR = '/etc/ssh'
+SSHD_SERVICES = ('ssh.service', 'sshd.service')
+SSHD_PID_FILE = '/run/sshd.pid'
+# 备份不放在 sshd_config.d 中，避免被 Include 的通配符读入
+BACKUP_DIR = '/var/backups/sshd_tune'
+DIRECTIVE_RE = re.compile(r'^(\s*)(\S+?)(?:\s*=\s*|\s+)(.*?)\s*$')
+
+def print_message(message, color='green'):
+    """打印彩色信息"""
+    print(colored(message, color))
+
+def latency_profile(connections=None, max_sessions=32, alive_interval=30, password=False):
+    """降低登录延迟、提高并发登录容量的配置：
+    UseDNS/GSSAPIAuthentication 关闭登录时的反向 DNS 与 GSSAPI 协商；
+    MaxStartups 按预计同时登录的连接数放宽，避免突发连接被随机拒绝；
+    LoginGraceTime 与 ClientAlive* 让卡住的登录和断开的客户端尽快释放名额"""
+    connections = connections or max(32, 8 * (os.cpu_count() or 1))
+    profile = {
+        'UseDNS': 'no',
+        'GSSAPIAuthentication': 'no',
+        'MaxStartups': f'{connections}:30:{connections * 3}',
+        'MaxSessions': str(max_sessions),
+        'LoginGraceTime': '30',
+        'ClientAliveInterval': str(alive_interval),
+        'ClientAliveCountMax': '3',
+    }
+    if password:
+        # 原 update_sshd_config.sh 的作用：允许密码登录，解决轻量云服务器无法登录的问题；会放宽认证，需要 --password 显式开启
+        profile['PasswordAuthentication'] = 'yes'
+    return profile
+
+def parse_config(path, match=None, base=None, seen=None):
+    """按 sshd 的顺序展开 Include (相对路径相对于 base，默认 SSHD_DIR)，逐条返回指令
+    {'file', 'line', 'indent', 'keyword', 'value', 'match'}，match 为所在 Match 块条件 (全局为 None)"""
+    base = base or SSHD_DIR
+    seen = seen if seen is not None else set()
+    real = os.path.realpath(path)
+    if real in seen:
+        raise ValueError(f"Include 循环引用: {path}")
+    seen.add(real)
+    directives = []
+    with open(path, 'r') as f:
+        lines = f.read().splitlines()
+    for number, line in enumerate(lines):
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        found = DIRECTIVE_RE.match(line)
+        if not found:
+            continue
+        indent, keyword, value = found.groups()
+        if keyword.lower() == 'match':
+            match = None if value.lower() == 'all' else value
+            directives.append({'file': path, 'line': number, 'indent': indent, 'keyword': keyword, 'value': value,
+                               'match': match})
+            continue
+        if keyword.lower() == 'include':
+            for pattern in value.split():
+                pattern = os.path.expanduser(pattern)
+                if not os.path.isabs(pattern):
+                    pattern = os.path.join(base, pattern)
+                for included in sorted(glob.glob(pattern)):
+                    # 被包含文件中的 Match 块不会延续到包含它的文件
+                    directives.extend(parse_config(included, match, base, seen))
+            continue
+        directives.append({'file': path, 'line': number, 'indent': indent, 'keyword': keyword, 'value': value,
+                           'match': match})
+    seen.discard(real)
+    return directives
+
+def effective_values(directives):
+    """全局指令按 sshd 的规则取第一次出现的值，返回 {小写关键字: 指令}"""
+    values = {}
+    for directive in directives:
+        if directive['match'] is None and directive['keyword'].lower() != 'match':
+            values.setdefault(directive['keyword'].lower(), directive)
+    return values
+
+def match_overrides(directives, profile):
+    """Match 块中覆盖了配置项的指令，这些是有意的按用户/来源设置，不做修改"""
+    keys = {key.lower() for key in profile}
+    return [d for d in directives if d['match'] is not None and d['keyword'].lower() in keys]
+
+def plan_changes(path, directives, profile):
+    """计算需要改写的文件内容：已有的全局指令就地修改 (可能在 Include 的文件中)，
+    不存在的指令插入主配置文件第一个 Match 块之前，返回 ({文件: 新内容行}, [(关键字, 旧值, 新值)])"""
+    values = effective_values(directives)
+    contents, changes, missing = {}, [], []
+    for key, value in profile.items():
+        current = values.get(key.lower())
+        if current is None:
+            missing.append((key, value))
+            changes.append((key, None, value))
+            continue
+        if current['value'].lower() == value.lower():
+            continue
+        if current['file'] not in contents:
+            with open(current['file'], 'r') as f:
+                contents[current['file']] = f.read().splitlines()
+        contents[current['file']][current['line']] = f"{current['indent']}{current['keyword']} {value}"
+        changes.append((key, current['value'], value))
+    if missing:
+        if path not in contents:
+            with open(path, 'r') as f:
+                contents[path] = f.read().splitlines()
+        lines = contents[path]
+        position = next((d['line'] for d in directives if d['file'] == path and d['keyword'].lower() == 'match'),
+                        len(lines))
+        block = ['# sshd_tune.py: 登录延迟与并发连接配置'] + [f'{key} {value}' for key, value in missing]
+        if position and lines[position - 1].strip():
+            block.insert(0, '')
+        if position < len(lines):
+            block.append('')
+        lines[position:position] = block
+    return contents, changes
+
+def show_diff(contents):
+    """输出将要写入的改动"""
+    for path, lines in contents.items():
+        with open(path, 'r') as f:
+            old = f.read().splitlines()
+        for line in difflib.unified_diff(old, lines, path, path, lineterm=''):
+            print(colored(line, 'green' if line.startswith('+') else 'red' if line.startswith('-') else None))
+
+def write_changes(contents, backups):
+    """备份并写入改动，每个文件备份后立即记入 backups ({文件: 备份路径})，中途出错时已写入的文件也能恢复"""
+    stamp = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    for path, lines in contents.items():
+        backup = os.path.join(BACKUP_DIR, stamp, os.path.abspath(path).lstrip('/'))
+        os.makedirs(os.path.dirname(backup), exist_ok=True)
+        shutil.copy2(path, backup)
+        backups[path] = backup
+        with open(f'{path}.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        shutil.copymode(path, f'{path}.tmp')
+        os.replace(f'{path}.tmp', path)
+        print_message(f"已修改 {path}，备份为 {backup}", 'green')
+
+def restore_backups(backups):
+    for path, backup in backups.items():
+        shutil.copy2(backup, path)
+        print_message(f"已从 {backup} 恢复 {path}", 'yellow')
+
+def validate_config(sshd, path):
+    """使用 sshd -t 检查配置，返回 (是否通过, 错误信息)"""
+    result = subprocess.run([sshd, '-t', '-f', path], capture_output=True, text=True)
+    return result.returncode == 0, (result.stderr or result.stdout).strip()
+
+def verify_effective(sshd, path, profile):
+    """通过 sshd -T 确认配置项的最终生效值，返回不一致的项"""
+    result = subprocess.run([sshd, '-T', '-f', path], capture_output=True, text=True)
+    if result.returncode != 0:
+        return {}
+    actual = {}
+    for line in result.stdout.splitlines():
+        key, _, value = line.partition(' ')
+        actual[key.lower()] = value.strip()
+    return {key: actual.get(key.lower()) for key, value in profile.items()
+            if key.lower() in actual and actual[key.lower()].lower() != value.lower()}
+
+def reload_sshd():
+    """重新加载 sshd：主进程重新读取配置，已建立的会话不会断开"""
+    if shutil.which('systemctl'):
+        for service in SSHD_SERVICES:
+            active = subprocess.run(['systemctl', 'is-active', '--quiet', service], stderr=subprocess.DEVNULL)
+            if active.returncode == 0:
+                result = subprocess.run(['systemctl', 'reload', service], capture_output=True, text=True)
+                return result.returncode == 0, result.stderr.strip()
+    if os.path.exists(SSHD_PID_FILE):
+        with open(SSHD_PID_FILE, 'r') as f:
+            pid = int(f.read().strip())
+        try:
+            os.kill(pid, 1)
+            return True, ''
+        except OSError as e:
+            return False, str(e)
+    return False, "找不到运行中的 sshd 服务"
+
+def handshake(host, port, user=None, identity=None, timeout=10, ssh='ssh'):
+    """完成一次 SSH 登录握手并计时，返回 (是否成功, 耗时秒数, 错误信息)。
+    未提供密钥时只进行到认证阶段 (服务端返回 Permission denied 即视为握手完成)，不需要任何凭据"""
+    command = [ssh, '-p', str(port), '-o', 'BatchMode=yes', '-o', f'ConnectTimeout={timeout}',
+               '-o', 'StrictHostKeyChecking=no', '-o', 'UserKnownHostsFile=/dev/null', '-o', 'LogLevel=ERROR',
+               '-o', 'ControlMaster=no', '-o', 'ControlPath=none']
+    if identity:
+        command += ['-i', identity, '-o', 'IdentitiesOnly=yes']
+    else:
+        command += ['-o', 'PubkeyAuthentication=no', '-o', 'PasswordAuthentication=no',
+                    '-o', 'KbdInteractiveAuthentication=no', '-o', 'HostbasedAuthentication=no',
+                    '-o', 'GSSAPIAuthentication=no']
+    command += [f'{user}@{host}' if user else host, 'true']
+    start = time.monotonic()
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=timeout * 3, stdin=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        return False, time.monotonic() - start, '超时'
+    seconds = time.monotonic() - start
+    error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f'退出码 {result.returncode}'
+    if identity:
+        return result.returncode == 0, seconds, '' if result.returncode == 0 else error
+    return 'Permission denied' in result.stderr, seconds, '' if 'Permission denied' in result.stderr else error
+
+def measure(host, port, samples=20, parallel=4, user=None, identity=None, timeout=10, ssh='ssh'):
+    """并发执行多次握手，统计耗时分布与失败 (连接被拒绝、被 MaxStartups 丢弃等) 次数"""
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        results = list(pool.map(lambda _: handshake(host, port, user, identity, timeout, ssh), range(samples)))
+    durations = sorted(seconds for ok, seconds, _ in results if ok)
+    errors = {}
+    for ok, _, error in results:
+        if not ok:
+            errors[error] = errors.get(error, 0) + 1
+    report = {'samples': samples, 'parallel': parallel, 'ok': len(durations), 'failed': samples - len(durations),
+              'errors': errors}
+    if durations:
+        report.update({
+            'p50_ms': round(durations[len(durations) // 2] * 1000, 1),
+            'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 1),
+            'max_ms': round(durations[-1] * 1000, 1),
+        })
+    return report
+
+def print_measure(label, report):
+    color = 'green' if not report['failed'] else 'yellow'
+    if report['ok']:
+        print_message(f"{label}: {report['ok']}/{report['samples']} 次成功 (并发 {report['parallel']})，"
+                      f"p50 {report['p50_ms']}ms，p95 {report['p95_ms']}ms，最长 {report['max_ms']}ms", color)
+    else:
+        print_message(f"{label}: {report['samples']} 次全部失败", 'red')
+    for error, count in report['errors'].items():
+        print_message(f"  {count} 次: {error}", 'yellow')
+
+def show(args):
+    """show 子命令：显示配置项的当前生效值、所在文件与 Match 块中的覆盖"""
+    directives = parse_config(args.config)
+    values = effective_values(directives)
+    profile = latency_profile(args.connections, args.max_sessions, args.alive_interval, args.password)
+    for key, value in profile.items():
+        current = values.get(key.lower())
+        where = f"{current['file']}:{current['line'] + 1}" if current else '(默认值)'
+        same = current and current['value'].lower() == value.lower()
+        print(colored(f"{key:<24}{current['value'] if current else '-':<16}-> {value:<16}{where}",
+                      'green' if same else 'yellow'))
+    for directive in match_overrides(directives, profile):
+        print_message(f"Match {directive['match']}: {directive['keyword']} {directive['value']} "
+                      f"({directive['file']}:{directive['line'] + 1})", 'cyan')
+
+def apply(args):
+    """apply 子命令：改写配置，sshd -t 校验通过后 reload，前后各测一次握手耗时"""
+    if os.geteuid() != 0 and args.config == SSHD_CONFIG and not args.dry_run:
+        print_message("请以root用户或使用sudo权限运行此脚本。", 'red')
+        sys.exit(1)
+    directives = parse_config(args.config)
+    profile = latency_profile(args.connections, args.max_sessions, args.alive_interval, args.password)
+    for directive in match_overrides(directives, profile):
+        print_message(f"注意: Match {directive['match']} 中设置了 {directive['keyword']} {directive['value']} "
+                      f"({directive['file']}:{directive['line'] + 1})，对匹配的连接仍然生效，未修改", 'yellow')
+    contents, changes = plan_changes(args.config, directives, profile)
+    if not changes:
+        print_message("sshd 配置已符合要求，无需修改。", 'green')
+        return
+    for key, old, new in changes:
+        print_message(f"{key}: {old if old is not None else '(默认值)'} -> {new}", 'cyan')
+    show_diff(contents)
+    if args.dry_run:
+        return
+    if not shutil.which(args.sshd):
+        print_message(f"找不到 {args.sshd}，无法校验配置，未做修改。", 'red')
+        sys.exit(1)
+    report = {'changes': [{'keyword': k, 'old': o, 'new': n} for k, o, n in changes]}
+    port = args.port or int(effective_values(directives).get('port', {}).get('value', 22))
+    if not args.no_measure:
+        report['before'] = measure(args.host, port, args.samples, args.parallel, args.user, args.identity)
+        print_measure("修改前", report['before'])
+    backups, ok, error = {}, False, '写入或校验时出错'
+    try:
+        write_changes(contents, backups)
+        ok, error = validate_config(args.sshd, args.config)
+    finally:
+        # 校验未通过或写入、校验过程中抛出异常时都恢复已备份的文件
+        if not ok:
+            print_message(f"sshd -t 校验失败，正在恢复备份: {error}", 'red')
+            restore_backups(backups)
+    if not ok:
+        sys.exit(1)
+    mismatched = verify_effective(args.sshd, args.config, profile)
+    for key, value in mismatched.items():
+        print_message(f"注意: {key} 的最终生效值为 {value}，可能被其它配置覆盖", 'yellow')
+    ok, error = reload_sshd()
+    if not ok:
+        print_message(f"重新加载 sshd 失败，正在恢复备份: {error}", 'red')
+        restore_backups(backups)
+        reload_sshd()
+        sys.exit(1)
+    print_message("sshd 已重新加载，现有会话不受影响。", 'green')
+    if not args.no_measure:
+        time.sleep(1)
+        report['after'] = measure(args.host, port, args.samples, args.parallel, args.user, args.identity)
+        print_measure("修改后", report['after'])
+        if report['before']['ok'] and not report['after']['ok']:
+            # 修改前可以登录而修改后完全无法握手，回滚以免把服务器锁在外面
+            print_message("修改后无法完成握手，正在恢复备份并重新加载。", 'red')
+            restore_backups(backups)
+            reload_sshd()
+            sys.exit(1)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print_message(f"结果已写入 {args.report}", 'green')
+
+def measure_main(args):
+    """measure 子命令：只测量握手耗时"""
+    report = measure(args.host, args.port or 22, args.samples, args.parallel, args.user, args.identity)
+    print_measure(f"{args.host}:{args.port or 22}", report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+def parse_args(argv=None):
+    """解析命令行参数，不带子命令时执行 apply"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or argv[0] not in ('apply', 'show', 'measure', '-h', '--help'):
+        argv.insert(0, 'apply')
+    parser = argparse.ArgumentParser(description="sshd 登录延迟与并发连接调优 (替代 update_sshd_config.sh)")
+    subparsers = parser.add_subparsers(dest='command')
+    apply_parser = subparsers.add_parser('apply', help="应用配置，校验后 reload sshd (默认)")
+    show_parser = subparsers.add_parser('show', help="显示配置项的当前值与将要设置的值")
+    measure_parser = subparsers.add_parser('measure', help="测量本机 sshd 的登录握手耗时")
+    for sub in (apply_parser, show_parser):
+        sub.add_argument('--config', default=SSHD_CONFIG, help=f"sshd 主配置文件 (默认 {SSHD_CONFIG})")
+        sub.add_argument('--connections', type=int, help="预计同时进行登录的连接数，用于计算 MaxStartups (默认 8 × CPU 核数，至少 32)")
+        sub.add_argument('--max-sessions', type=int, default=32, help="每个连接允许复用的会话数 MaxSessions (默认 32)")
+        sub.add_argument('--alive-interval', type=int, default=30, help="ClientAliveInterval 秒数 (默认 30)")
+        sub.add_argument('--password', action='store_true', help="同时把 PasswordAuthentication 设置为 yes，允许密码登录 (默认不修改)")
+    apply_parser.add_argument('--dry-run', action='store_true', help="只显示改动，不写入文件")
+    apply_parser.add_argument('--sshd', default='/usr/sbin/sshd', help="sshd 可执行文件 (默认 /usr/sbin/sshd)")
+    apply_parser.add_argument('--no-measure', action='store_true', help="不测量修改前后的握手耗时")
+    for sub in (apply_parser, measure_parser):
+        sub.add_argument('--host', default='127.0.0.1', help="测量的 sshd 地址 (默认 127.0.0.1)")
+        sub.add_argument('--port', type=int, help="测量的 sshd 端口 (默认取配置中的 Port 或 22)")
+        sub.add_argument('--samples', type=int, default=20, help="握手次数 (默认 20)")
+        sub.add_argument('--parallel', type=int, default=4, help="同时进行的握手数 (默认 4)")
+        sub.add_argument('--user', help="登录用户，配合 --identity 测量完整登录")
+        sub.add_argument('--identity', help="私钥文件，提供时测量完整登录并执行 true")
+        sub.add_argument('--report', help="将测量结果写入该 JSON 文件")
+    return parser.parse_args(argv)
+
+def main(args):
+    try:
+        if args.command == 'show':
+            show(args)
+        elif args.command == 'measure':
+            measure_main(args)
+        else:
+            apply(args)
+    except (OSError, ValueError) as e:
+        print_message(f"执行失败: {e}", 'red')
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(parse_args())
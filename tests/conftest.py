@@ -0,0 +1,232 @@
+import base64
+import hashlib
+import hmac
+import importlib.util
+import os
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+PY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'py')
+if PY_DIR not in sys.path:
+    sys.path.insert(0, PY_DIR)
+
+
+def load_script(name):
+    """按文件加载 py/ 下的单文件脚本，每次返回新的模块对象"""
+    spec = importlib.util.spec_from_file_location(f'_script_{name}', os.path.join(PY_DIR, f'{name}.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def acme():
+    return load_script('acme')
+
+
+@pytest.fixture
+def ossfs():
+    return load_script('ossfs')
+
+
+@pytest.fixture
+def sshd_tune():
+    return load_script('sshd_tune')
+
+
+@pytest.fixture
+def fleet():
+    return load_script('fleet')
+
+
+class FakeDNS:
+    """本地 UDP DNS 替身：records 为 {(域名, 类型): [值]}，对所有查询按表应答"""
+
+    TYPES = {1: 'A', 2: 'NS', 5: 'CNAME', 16: 'TXT'}
+
+    def __init__(self):
+        self.records = {}
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                packet, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            qid, = struct.unpack('>H', packet[:2])
+            labels, offset = [], 12
+            while packet[offset]:
+                labels.append(packet[offset + 1:offset + 1 + packet[offset]].decode())
+                offset += 1 + packet[offset]
+            qtype, = struct.unpack('>H', packet[offset + 1:offset + 3])
+            question = packet[12:offset + 5]
+            name = '.'.join(labels).lower()
+            answers = [(rtype, value) for rtype, value in self._answers(name, qtype)]
+            body = b''
+            for rtype, value in answers:
+                if rtype == 1:
+                    rdata = socket.inet_aton(value)
+                elif rtype in (2, 5):
+                    rdata = b''.join(bytes([len(p)]) + p.encode() for p in value.split('.')) + b'\0'
+                else:
+                    rdata = bytes([len(value)]) + value.encode()
+                body += struct.pack('>HHHIH', 0xC00C, rtype, 1, 60, len(rdata)) + rdata
+            header = struct.pack('>HHHHHH', qid, 0x8400, 1, len(answers), 0, 0)
+            self.sock.sendto(header + question + body, addr)
+
+    def _answers(self, name, qtype):
+        # 与权威 DNS 相同：存在 CNAME 时只返回 CNAME
+        for cname in self.records.get((name, 'CNAME'), []):
+            return [(5, cname)]
+        return [(qtype, value) for value in self.records.get((name, self.TYPES.get(qtype)), [])]
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def fake_dns():
+    server = FakeDNS()
+    yield server
+    server.close()
+
+
+class FakeOSS:
+    """本地 OSS 替身：校验 V1 签名，支持 PUT/GET/HEAD、分片上传和 ListObjects (path-style)"""
+
+    def __init__(self, access_key_id='ak', access_key_secret='sk', page_size=1000):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qsl, unquote, urlparse
+        self.objects, self.uploads, self.requests = {}, {}, []
+        self.fail_parts = set()  # 第一次上传时返回 500 的分片号
+        self.fail_lists = set()  # 列举时返回 400 的前缀
+        self.truncate_empty = False  # 列举时返回截断但没有内容和 NextMarker 的页
+        self.page_size = page_size
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body=b'', headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def handle_any(self):
+                url = urlparse(self.path)
+                _, bucket, key = (url.path.split('/', 2) + [''])[:3]
+                key = unquote(key)
+                params = dict(parse_qsl(url.query, keep_blank_values=True))
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                sub = sorted((k, v) for k, v in params.items() if k in ('uploads', 'uploadId', 'partNumber'))
+                resource = f'/{bucket}/{key}' + ('?' + '&'.join(k if v == '' else f'{k}={v}' for k, v in sub) if sub else '')
+                string_to_sign = (f"{self.command}\n{self.headers.get('Content-MD5', '')}\n"
+                                  f"{self.headers.get('Content-Type', '')}\n{self.headers['Date']}\n{resource}")
+                digest = hmac.new(access_key_secret.encode(), string_to_sign.encode(), 'sha1').digest()
+                if self.headers.get('Authorization') != f'OSS {access_key_id}:{base64.b64encode(digest).decode()}':
+                    return self.reply(403, b'<Error><Code>SignatureDoesNotMatch</Code></Error>')
+                fake.requests.append((self.command, key, params))
+                if 'uploadId' in params and params['uploadId'] not in fake.uploads:
+                    return self.reply(404, b'<Error><Code>NoSuchUpload</Code></Error>')
+                if self.command == 'PUT' and 'partNumber' in params:
+                    number = int(params['partNumber'])
+                    if number in fake.fail_parts:
+                        fake.fail_parts.discard(number)
+                        return self.reply(400, b'<Error><Code>InjectedError</Code></Error>')
+                    fake.uploads[params['uploadId']][number] = body
+                    return self.reply(200, headers={'ETag': f'"{hashlib.md5(body).hexdigest().upper()}"'})
+                if self.command == 'PUT':
+                    fake.objects[key] = body
+                    return self.reply(200)
+                if self.command == 'POST' and 'uploads' in params:
+                    upload_id = f'upload-{len(fake.uploads)}'
+                    fake.uploads[upload_id] = {}
+                    return self.reply(200, f'<InitiateMultipartUploadResult><UploadId>{upload_id}'
+                                           f'</UploadId></InitiateMultipartUploadResult>'.encode())
+                if self.command == 'POST' and 'uploadId' in params:
+                    parts = fake.uploads.pop(params['uploadId'])
+                    fake.objects[key] = b''.join(parts[n] for n in sorted(parts))
+                    return self.reply(200, b'<CompleteMultipartUploadResult/>')
+                if self.command == 'GET' and not key:
+                    if params.get('prefix', '') in fake.fail_lists:
+                        return self.reply(400, b'<Error><Code>InjectedError</Code></Error>')
+                    return self.reply(200, fake.list_xml(params))
+                if key not in fake.objects:
+                    return self.reply(404, b'<Error><Code>NoSuchKey</Code></Error>')
+                data = fake.objects[key]
+                etag = f'"{hashlib.md5(data).hexdigest()}"'
+                if self.command == 'HEAD':
+                    self.send_response(200)
+                    self.send_header('Content-Length', str(len(data)))
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                if 'Range' in self.headers:
+                    start, end = self.headers['Range'].split('=')[1].split('-')
+                    return self.reply(206, data[int(start):int(end) + 1])
+                return self.reply(200, data, {'ETag': etag})
+
+            do_GET = do_PUT = do_POST = do_HEAD = handle_any
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def list_xml(self, params):
+        prefix, marker = params.get('prefix', ''), params.get('marker', '')
+        if self.truncate_empty:
+            return (f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/"><Prefix>{prefix}</Prefix>'
+                    f'<IsTruncated>true</IsTruncated></ListBucketResult>').encode()
+        delimiter = params.get('delimiter', '')
+        entries = set()
+        for key in self.objects:
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                entries.add(('prefix', prefix + rest.split(delimiter)[0] + delimiter))
+            else:
+                entries.add(('key', key))
+        entries = sorted((e for e in entries if e[1] > marker), key=lambda e: e[1])
+        page = entries[:min(self.page_size, int(params.get('max-keys', 1000)))]
+        truncated = len(entries) > len(page)
+        items = ''.join(
+            f'<Contents><Key>{name}</Key><LastModified>2024-05-01T10:00:00.000Z</LastModified>'
+            f'<Size>{len(self.objects[name])}</Size><ETag>"{hashlib.md5(self.objects[name]).hexdigest()}"</ETag></Contents>'
+            if kind == 'key' else f'<CommonPrefixes><Prefix>{name}</Prefix></CommonPrefixes>' for kind, name in page)
+        next_marker = f'<NextMarker>{page[-1][1]}</NextMarker>' if truncated else ''
+        return (f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/"><Prefix>{prefix}</Prefix>'
+                f'<IsTruncated>{str(truncated).lower()}</IsTruncated>{next_marker}{items}</ListBucketResult>').encode()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_oss(ossfs, tmp_path, monkeypatch):
+    """启动 FakeOSS，并把 ossfs 的工作目录、缓存目录指向临时目录，passwd-ossfs 中写入 bucket 的密钥"""
+    server = FakeOSS()
+    monkeypatch.setattr(ossfs, 'file_path', str(tmp_path / 'ossfs'))
+    monkeypatch.setattr(ossfs, 'ARTIFACT_CACHE', str(tmp_path / 'cache'))
+    passwd = tmp_path / 'ossfs' / 'passwd' / 'passwd-ossfs'
+    passwd.parent.mkdir(parents=True)
+    passwd.write_text('bucket:ak:sk\n')
+    yield server
+    server.close()
@@ -0,0 +1,44 @@
+import hashlib
+
+import pytest
+
+
+def _setup(module, tmp_path, monkeypatch):
+    monkeypatch.setattr(module, 'ARTIFACT_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(module, 'ARTIFACT_MIRROR', None)
+    source = tmp_path / 'tool.tar.gz'
+    source.write_bytes(b'artifact')
+    return source, hashlib.sha256(b'artifact').hexdigest()
+
+
+def test_pinned_digest_accepted(ossfs, tmp_path, monkeypatch):
+    source, digest = _setup(ossfs, tmp_path, monkeypatch)
+    monkeypatch.setattr(ossfs, 'ARTIFACT_SHA256', {'tool.tar.gz': digest})
+    path = ossfs.fetch_artifact(str(source))
+    assert open(path, 'rb').read() == b'artifact'
+
+
+def test_pin_mismatch_rejected(ossfs, tmp_path, monkeypatch):
+    source, _ = _setup(ossfs, tmp_path, monkeypatch)
+    monkeypatch.setattr(ossfs, 'ARTIFACT_SHA256', {'tool.tar.gz': '0' * 64})
+    with pytest.raises(RuntimeError):
+        ossfs.fetch_artifact(str(source))
+
+
+def test_pins_file_overrides_table(acme, tmp_path, monkeypatch):
+    source, digest = _setup(acme, tmp_path, monkeypatch)
+    pins = tmp_path / 'pins'
+    pins.write_text(f'{digest}  dist/tool.tar.gz\n')
+    monkeypatch.setattr(acme, 'ARTIFACT_SHA256', {'tool.tar.gz': '0' * 64})
+    monkeypatch.setattr(acme, 'ARTIFACT_PINS', str(pins))
+    assert acme.pinned_sha256('tool.tar.gz') == digest
+    acme.fetch_artifact(str(source))
+
+
+def test_require_pin(acme, tmp_path, monkeypatch):
+    source, _ = _setup(acme, tmp_path, monkeypatch)
+    # 默认拒绝没有固定校验值的产物
+    with pytest.raises(RuntimeError):
+        acme.fetch_artifact(str(source))
+    monkeypatch.setattr(acme, 'ARTIFACT_REQUIRE_PIN', False)
+    assert open(acme.fetch_artifact(str(source)), 'rb').read() == b'artifact'
@@ -0,0 +1,33 @@
+import os
+import stat
+
+
+def _issued(home, domain='example.com'):
+    cert_dir = home / 'data' / domain
+    cert_dir.mkdir(parents=True)
+    (cert_dir / f'{domain}.cer').write_text('cert')
+    (cert_dir / f'{domain}.key').write_text('key')
+    (cert_dir / 'fullchain.cer').write_text('fullchain')
+
+
+def test_failed_reload_is_retried(acme, tmp_path):
+    home = tmp_path / 'home'
+    _issued(home)
+    flag = tmp_path / 'reload-ok'
+    reloads = tmp_path / 'reloads'
+    target = {'type': 'dir', 'name': 'nginx', 'path': str(tmp_path / 'nginx'),
+              'reload': f'echo >> {reloads}; test -e {flag}'}
+
+    result, = acme.deploy_certificates(['example.com'], str(home), [target])
+    assert result['changed'] and result['reloaded'] is False
+    key = tmp_path / 'nginx' / 'example.com.key'
+    assert stat.S_IMODE(os.stat(key).st_mode) == 0o600
+
+    # 文件已是最新，但上次重载失败，仍需重载
+    flag.touch()
+    result, = acme.deploy_certificates(['example.com'], str(home), [target])
+    assert result['changed'] == [] and result['reloaded'] is True
+
+    result, = acme.deploy_certificates(['example.com'], str(home), [target])
+    assert result['reloaded'] is None
+    assert len(reloads.read_text().splitlines()) == 2
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+
+def _use_fake_dns(acme, fake_dns, monkeypatch):
+    monkeypatch.setattr(acme, 'DNS_PORT', fake_dns.port)
+    monkeypatch.setattr(acme, 'system_resolvers', lambda: ['127.0.0.1'])
+    fake_dns.records[('example.com', 'NS')] = ['ns1.example.com']
+    fake_dns.records[('ns1.example.com', 'A')] = ['127.0.0.1']
+
+
+def test_wait_for_txt_visible(acme, fake_dns, monkeypatch):
+    _use_fake_dns(acme, fake_dns, monkeypatch)
+    fake_dns.records[('_acme-challenge.example.com', 'TXT')] = ['token-1', 'token-2']
+    records = [('_acme-challenge.example.com', 'token-1'), ('_acme-challenge.example.com', 'token-2')]
+    assert acme.wait_for_txt(records, timeout=5, interval=0.1)
+
+
+def test_wait_for_txt_timeout(acme, fake_dns, monkeypatch):
+    _use_fake_dns(acme, fake_dns, monkeypatch)
+    fake_dns.records[('_acme-challenge.example.com', 'TXT')] = ['token-1']
+    assert not acme.wait_for_txt([('_acme-challenge.example.com', 'other')], timeout=0.3, interval=0.1)
+
+
+def test_wait_for_txt_follows_cname(acme, fake_dns, monkeypatch):
+    _use_fake_dns(acme, fake_dns, monkeypatch)
+    fake_dns.records[('_acme-challenge.example.com', 'CNAME')] = ['_acme-challenge.validation.net']
+    fake_dns.records[('validation.net', 'NS')] = ['ns.validation.net']
+    fake_dns.records[('ns.validation.net', 'A')] = ['127.0.0.1']
+    fake_dns.records[('_acme-challenge.validation.net', 'TXT')] = ['token-1']
+    assert acme.wait_for_txt([('_acme-challenge.example.com', 'token-1')], timeout=5, interval=0.1)
+
+
+# 模拟 acme.sh：在子 shell 中加载插件，_readdomainconf/_savedomainconf 读写域名配置
+ACME_SH = textwrap.dedent('''\
+    DOMAIN_CONF="$WORK/example.com.conf"
+    touch "$DOMAIN_CONF"
+    _readdomainconf() { sed -n "s/^$1='\\(.*\\)'$/\\1/p" "$DOMAIN_CONF"; }
+    _savedomainconf() { sed -i "/^$1=/d" "$DOMAIN_CONF"; echo "$1='$2'" >> "$DOMAIN_CONF"; }
+    LE_WORKING_DIR="$WORK/home"
+    for txt in $TXT_VALUES; do
+      (. "$LE_WORKING_DIR/dnsapi/dns_acmepy.sh"; dns_acmepy_add _acme-challenge.example.com "$txt") || exit 1
+    done
+    for txt in $TXT_VALUES; do
+      (. "$LE_WORKING_DIR/dnsapi/dns_acmepy.sh"; dns_acmepy_rm _acme-challenge.example.com "$txt") || exit 1
+    done
+''')
+
+
+def _run_acme_sh(tmp_path, env, txt_values, vlist):
+    env = dict(env, WORK=str(tmp_path), TXT_VALUES=' '.join(txt_values), vlist=vlist,
+               LOG=str(tmp_path / 'log'), TMPDIR=str(tmp_path))
+    script = tmp_path / 'acme_sh'
+    script.write_text(ACME_SH)
+    subprocess.run(['sh', str(script)], env=env, check=True)
+    log = (tmp_path / 'log').read_text().splitlines()
+    os.remove(tmp_path / 'log')
+    return log
+
+
+def _vlist(*entries):
+    return ','.join(f'example.com#{ka}#https://ca/authz#dns-01#dns_acmepy' for ka in entries)
+
+
+def test_hook_issue_then_renew(acme, tmp_path):
+    home = tmp_path / 'home'
+    acme.install_dns_hook(str(home))
+    (home / 'dnsapi' / 'dns_fake.sh').write_text(
+        'dns_fake_add() { echo "add $1 $2" >> "$LOG"; }\n'
+        'dns_fake_rm() { echo "rm $1 $2" >> "$LOG"; }\n')
+    wait_dns = tmp_path / 'wait_dns.py'
+    wait_dns.write_text('import os, sys\nfile = sys.argv[sys.argv.index("--file") + 1]\n'
+                        'with open(os.environ["LOG"], "a") as f:\n'
+                        '    f.write("wait " + " ".join(open(file).read().split()) + "\\n")\n')
+    pending = tmp_path / 'pending'
+    env = {k: v for k, v in os.environ.items() if not k.startswith('ACMEPY_')}
+    issue_env = acme.dns_poll_env(str(home), 'dns_fake', str(pending), 42, ['1.1.1.1'])
+    issue_env['ACMEPY_SCRIPT'] = str(wait_dns)
+
+    # 首次签发：由 acme.py 传入环境变量
+    log = _run_acme_sh(tmp_path, issue_env, ['t1', 't2'], _vlist('ka1', 'ka2'))
+    assert log == ['add _acme-challenge.example.com t1', 'add _acme-challenge.example.com t2',
+                   'wait _acme-challenge.example.com=t1 _acme-challenge.example.com=t2',
+                   'rm _acme-challenge.example.com t1', 'rm _acme-challenge.example.com t2']
+    conf = (tmp_path / 'example.com.conf').read_text()
+    assert "ACMEPY_DNS_BACKEND='dns_fake'" in conf and "ACMEPY_DNS_TIMEOUT='42'" in conf
+
+    # 续期 (acme.sh cron 或 renew)：没有 ACMEPY_* 环境变量，一条授权已复用
+    log = _run_acme_sh(tmp_path, env, ['t3'], _vlist('verified_ok', 'ka3'))
+    assert log == ['add _acme-challenge.example.com t3', 'wait _acme-challenge.example.com=t3',
+                   'rm _acme-challenge.example.com t3']
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.pending')]
+
+
+def test_hook_uses_installed_copy_and_falls_back_without_it(acme, tmp_path):
+    home = tmp_path / 'home'
+    acme.install_dns_hook(str(home))
+    issue_env = acme.dns_poll_env(str(home), 'dns_fake', str(tmp_path / 'pending'), 42)
+    # 交互签发结束后会删除原脚本，插件保存的是安装目录中的副本
+    assert issue_env['ACMEPY_SCRIPT'] == str(home / 'acme.py')
+    assert (home / 'acme.py').read_bytes() == open(acme.__file__, 'rb').read()
+    (home / 'dnsapi' / 'dns_fake.sh').write_text(
+        'dns_fake_add() { echo "add $1 $2" >> "$LOG"; }\n'
+        'dns_fake_rm() { echo "rm $1 $2" >> "$LOG"; }\n'
+        'sleep() { echo "sleep $1" >> "$LOG"; }\n')
+    os.remove(home / 'acme.py')
+    log = _run_acme_sh(tmp_path, issue_env, ['t1'], _vlist('ka1'))
+    assert log == ['add _acme-challenge.example.com t1', 'sleep 120', 'rm _acme-challenge.example.com t1']
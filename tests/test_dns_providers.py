@@ -0,0 +1,129 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, urlparse
+
+import pytest
+
+
+class MockAPI:
+    """本地模拟 DNS API：handler(method, path, query, body, headers) -> (状态码, JSON)"""
+
+    def __init__(self, handler):
+        requests = self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                requests.append((self.command, url.path, self.client_address, body))
+                status, data = handler(self.command, url.path, dict(parse_qsl(url.query)), body, self.headers)
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def mock_api():
+    servers = []
+
+    def start(handler):
+        servers.append(MockAPI(handler))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_registry_merged(acme):
+    assert acme.DNS_PROVIDERS['ali'].dns_api == 'dns_ali'
+    assert acme.DNS_PROVIDERS['cf'].dns_api == 'dns_cf'
+    with pytest.raises(TypeError):
+        acme.DNSProvider()
+
+
+def test_aliyun_signature(acme, mock_api, monkeypatch):
+    monkeypatch.setenv('Ali_Key', 'test-key')
+    monkeypatch.setenv('Ali_Secret', 'test-secret')
+    records = []
+
+    def handler(method, path, query, body, headers):
+        signature = query.pop('Signature')
+        canonical = '&'.join(f"{quote(k, safe='~')}={quote(v, safe='~')}" for k, v in sorted(query.items()))
+        string_to_sign = f"GET&%2F&{quote(canonical, safe='~')}"
+        expected = base64.b64encode(hmac.new(b'test-secret&', string_to_sign.encode(), hashlib.sha1).digest()).decode()
+        if signature != expected or query['AccessKeyId'] != 'test-key':
+            return 400, {'Code': 'SignatureDoesNotMatch'}
+        if query['Action'] == 'GetMainDomainName':
+            return 200, {'DomainName': 'example.com', 'RR': query['InputString'][:-len('.example.com')]}
+        if query['Action'] == 'AddDomainRecord':
+            records.append((query['Action'], query['RR'], query['Value']))
+            return 200, {'RecordId': f"id-{query['Value']}"}
+        records.append((query['Action'], query.get('RecordId'), None))
+        return 200, {'RecordId': query.get('RecordId')}
+
+    api = mock_api(handler)
+    provider = acme.DNS_PROVIDERS['ali'](endpoint=api.endpoint, workers=2)
+    txt = [('_acme-challenge.example.com', 'v 1'), ('_acme-challenge.example.com', 'v+2')]
+    provider.add_records(txt)
+    provider.remove_records(txt)
+    provider.pool.close()
+    assert sorted(records) == [('AddDomainRecord', '_acme-challenge', 'v 1'),
+                               ('AddDomainRecord', '_acme-challenge', 'v+2'),
+                               ('DeleteDomainRecord', 'id-v 1', None), ('DeleteDomainRecord', 'id-v+2', None)]
+
+
+def test_cloudflare_batch(acme, mock_api, monkeypatch):
+    monkeypatch.setenv('CF_Token', 'token')
+    zone_records = []
+
+    def handler(method, path, query, body, headers):
+        if headers['Authorization'] != 'Bearer token':
+            return 403, {'success': False, 'errors': ['auth']}
+        if path == '/client/v4/zones':
+            return 200, {'success': True, 'result': [{'id': 'z1'}] if query['name'] == 'example.com' else []}
+        if path == '/client/v4/zones/z1/dns_records/batch':
+            for post in body.get('posts', []):
+                zone_records.append({'id': f'r{len(zone_records)}', 'name': post['name'], 'content': post['content']})
+            deleted = {item['id'] for item in body.get('deletes', [])}
+            zone_records[:] = [r for r in zone_records if r['id'] not in deleted]
+            return 200, {'success': True, 'result': {}}
+        if path == '/client/v4/zones/z1/dns_records':
+            return 200, {'success': True, 'result': [r for r in zone_records if r['name'] == query['name']]}
+        return 404, {'success': False, 'errors': [path]}
+
+    api = mock_api(handler)
+    monkeypatch.setenv('ACMEPY_CF_ENDPOINT', api.endpoint)
+    provider = acme.DNS_PROVIDERS['cf']()
+    txt = [('_acme-challenge.example.com', 'a'), ('_acme-challenge.www.example.com', 'b')]
+    provider.add_records(txt)
+    assert [r['content'] for r in zone_records] == ['a', 'b']
+    provider.remove_records(txt)
+    provider.pool.close()
+    assert zone_records == []
+    batches = [r for r in api.requests if r[1].endswith('/batch')]
+    assert len(batches) == 2
+    # 所有请求复用同一个长连接
+    assert len({r[2] for r in api.requests}) == 1
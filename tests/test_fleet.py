@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import shlex
+import sys
+import textwrap
+
+# ssh/scp 替身：把 user@host:path 当作本机路径，在本机执行远端命令
+SSH_STUB = textwrap.dedent('''\
+    import os, subprocess, sys
+    args = sys.argv[1:]
+    while args[0].startswith('-'):
+        args = args[2:]
+    remote = args[1]
+    marker = os.environ['FLEET_FAIL_ONCE']
+    if 'mv -f' in remote and os.path.exists(marker):
+        os.remove(marker)
+        sys.exit(255)
+    sys.exit(subprocess.call(['sh', '-c', remote]))
+''')
+SCP_STUB = textwrap.dedent('''\
+    import shutil, sys
+    args = [arg for arg in sys.argv[1:] if arg != '-q']
+    while args[0].startswith('-'):
+        args = args[2:]
+    *sources, target = [arg.split(':', 1)[1] if ':' in arg else arg for arg in args]
+    for source in sources:
+        shutil.copy(source, target)
+''')
+# 模拟 acme.py：检查环境变量已加载，写入运行报告
+SCRIPT = textwrap.dedent('''\
+    import json, os, sys
+    assert os.environ['SECRET'] == 'value'
+    assert not os.path.exists('fleet.env')
+    with open(sys.argv[sys.argv.index('--run-report') + 1], 'w') as f:
+        json.dump({'phases': [{'name': 'issue_certificate', 'seconds': 1.5}]}, f)
+''')
+
+
+def test_run_fleet_retries_and_cleans_env(fleet, tmp_path, monkeypatch):
+    for name, content in (('ssh.py', SSH_STUB), ('scp.py', SCP_STUB), ('acme.py', SCRIPT)):
+        (tmp_path / name).write_text(content)
+    marker = tmp_path / 'fail-once'
+    marker.write_text('')
+    monkeypatch.setenv('FLEET_FAIL_ONCE', str(marker))
+    task_file = tmp_path / 'task.json'
+    task_file.write_text(json.dumps({'script': 'acme.py', 'env': {'SECRET': 'value'}, 'sudo': False}))
+    task = fleet.load_task(str(task_file))
+    workdir = tmp_path / 'remote'
+    hosts = [fleet.parse_host({'host': 'root@web1', 'workdir': str(workdir)}, {})]
+    ssh = f"{shlex.quote(sys.executable)} {shlex.quote(str(tmp_path / 'ssh.py'))}"
+    scp = f"{shlex.quote(sys.executable)} {shlex.quote(str(tmp_path / 'scp.py'))}"
+    logs = str(tmp_path / 'logs')
+
+    # prepare 失败且不重试：上传的环境变量文件 (含密钥) 不能留在远端
+    [result] = asyncio.run(fleet.run_fleet(hosts, task, logs, retries=0, ssh=ssh, scp=scp))
+    assert (result['status'], result['error']) == ('failed', 'prepare 退出码 255')
+    assert not [name for name in os.listdir(workdir) if 'fleet.env' in name]
+
+    marker.write_text('')
+    [result] = asyncio.run(fleet.run_fleet(hosts, task, logs, retries=1, retry_delay=0, ssh=ssh, scp=scp))
+    assert (result['status'], result['attempts']) == ('ok', 2)
+    assert [step['step'] for step in result['steps']] == ['connect', 'upload', 'upload_env', 'prepare', 'run']
+    assert result['phases'] == {'issue_certificate': 1.5}
+    assert not [name for name in os.listdir(workdir) if 'fleet.env' in name]
+    assert not [name for name in os.listdir(logs) if 'fleet.env' in name]
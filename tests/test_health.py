@@ -0,0 +1,19 @@
+import threading
+
+
+class FakeProc:
+    def __init__(self, done):
+        self.done = done
+
+    def poll(self):
+        return 0 if self.done else None
+
+
+def test_reap_stuck_probes_from_threads(ossfs, monkeypatch):
+    monkeypatch.setattr(ossfs, '_stuck_probes', [FakeProc(i % 2 == 0) for i in range(100)])
+    threads = [threading.Thread(target=ossfs.reap_stuck_probes) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ossfs.reap_stuck_probes() == 50
@@ -0,0 +1,80 @@
+import argparse
+import sqlite3
+
+import pytest
+
+
+def refreshed(ossfs, bucket='bucket'):
+    db = sqlite3.connect(ossfs.index_path(bucket))
+    rows = dict(db.execute('SELECT prefix, refreshed FROM prefixes'))
+    db.close()
+    return rows
+
+
+def keys(ossfs, bucket='bucket'):
+    db = sqlite3.connect(ossfs.index_path(bucket))
+    rows = [row[0] for row in db.execute('SELECT key FROM objects ORDER BY key')]
+    db.close()
+    return rows
+
+
+def test_refresh_skips_fresh_shards_and_relists_invalidated(ossfs, fake_oss):
+    fake_oss.page_size = 2
+    fake_oss.objects.update({'top.txt': b't', 'a/1': b'1', 'a/2': b'22', 'a/3': b'333', 'b/x/1': b'x'})
+    client = ossfs.oss_client('bucket', fake_oss.endpoint, None, True)
+    stats = ossfs.refresh_index(client)
+    assert (stats['listed'], stats['skipped'], stats['failed']) == (2, 0, [])
+    assert keys(ossfs) == ['a/1', 'a/2', 'a/3', 'b/x/1', 'top.txt']
+    assert ossfs.refresh_index(client)['skipped'] == 2
+    fake_oss.objects['a/4'] = b'4'
+    ossfs.invalidate_index('bucket', ['a/4'])
+    stats = ossfs.refresh_index(client)
+    assert (stats['listed'], stats['skipped']) == (1, 1)
+    assert 'a/4' in keys(ossfs)
+
+
+def test_invalidation_during_listing_keeps_shard_stale(ossfs, fake_oss, monkeypatch):
+    fake_oss.objects.update({'a/1': b'1'})
+    client = ossfs.oss_client('bucket', fake_oss.endpoint, None, True)
+    list_objects, listed = client.list_objects, []
+
+    def racing(prefix=''):
+        objects = list(list_objects(prefix))
+        listed.append(ossfs.time.time())
+        if len(listed) == 2:
+            # 列举返回之后、写入索引之前有上传完成
+            ossfs.invalidate_index('bucket', [prefix + '2'])
+        return iter(objects)
+
+    monkeypatch.setattr(client, 'list_objects', racing)
+    ossfs.refresh_index(client)
+    ossfs.invalidate_index('bucket', ['a/1'])
+    ossfs.refresh_index(client)
+    assert refreshed(ossfs)['a/'] == 0
+    assert ossfs.refresh_index(client)['listed'] == 1
+    # 刷新时间记为开始列举的时间，而不是写入索引的时间
+    assert 0 < refreshed(ossfs)['a/'] < listed[-1]
+
+
+def test_listing_failure_keeps_index_and_other_buckets(ossfs, fake_oss, tmp_path):
+    fake_oss.objects.update({'a/x/1': b'1', 'b/x/1': b'2'})
+    client = ossfs.oss_client('bucket', fake_oss.endpoint, None, True)
+    ossfs.refresh_index(client, depth=2, max_age=0)
+    fake_oss.fail_lists.add('a/')
+    stats = ossfs.refresh_index(client, depth=2, max_age=0)
+    assert stats['failed'] == ['a/']
+    assert keys(ossfs) == ['a/x/1', 'b/x/1']
+    args = argparse.Namespace(index_command='refresh', buckets=['missing', 'bucket'], passwd_file=None,
+                              endpoint=fake_oss.endpoint, path_style=True, prefix='', depth=1, max_age=0, workers=2)
+    fake_oss.fail_lists.clear()
+    fake_oss.objects['c/1'] = b'3'
+    with pytest.raises(SystemExit):
+        ossfs.index_main(args)
+    assert 'c/1' in keys(ossfs)
+
+
+def test_truncated_empty_page_raises(ossfs, fake_oss):
+    fake_oss.truncate_empty = True
+    client = ossfs.oss_client('bucket', fake_oss.endpoint, None, True)
+    with pytest.raises(ossfs.OSSError):
+        client.list_directory('')
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+
+
+def _apply(ossfs, tmp_path, monkeypatch, limits):
+    manifest = tmp_path / 'mounts.json'
+    manifest.write_text(json.dumps({
+        'file_path': str(tmp_path / 'ossfs'),
+        'mounts': [{'bucket': 'bucket', 'path': str(tmp_path / 'mnt' / 'data'),
+                    'region': 'oss-cn-hangzhou.aliyuncs.com', 'limits': limits}]}))
+    calls = []
+    monkeypatch.setattr(ossfs, 'supervisor_path', str(tmp_path / 'supervisord'))
+    monkeypatch.setattr(ossfs, 'link_supervisor_conf', lambda path: False)
+    monkeypatch.setattr(ossfs, 'check_command', lambda cmd: True)
+    monkeypatch.setattr(ossfs, 'supervisor_running', lambda: True)
+    monkeypatch.setattr(ossfs, 'reload_or_restart', lambda path, programs: calls.append(list(programs)))
+    # 首次应用时 supervisord.conf 是新写入的，会重启 supervisor
+    monkeypatch.setattr(ossfs, 'run_command', lambda command, **kwargs: calls.append(command))
+    ossfs.apply_manifest(str(manifest))
+    return calls
+
+
+def test_cache_quota_change_does_not_restart(ossfs, tmp_path, monkeypatch):
+    (tmp_path / 'ossfs' / 'passwd').mkdir(parents=True)
+    (tmp_path / 'supervisord').mkdir()
+    (tmp_path / 'ossfs' / 'passwd' / 'passwd-ossfs').write_text('bucket:ak:sk\n')
+    assert _apply(ossfs, tmp_path, monkeypatch, {'memory_max': '1G', 'cache_quota': '10G'}) == [
+        ['sudo', 'systemctl', 'restart', 'supervisor']]
+    assert _apply(ossfs, tmp_path, monkeypatch, {'memory_max': '1G', 'cache_quota': '20G'}) == []
+    limits_file = tmp_path / 'ossfs' / 'data' / 'limits_ossfs_data.json'
+    assert json.loads(limits_file.read_text())['cache_quota'] == 20 * 1024 ** 3
+    assert _apply(ossfs, tmp_path, monkeypatch, {'memory_max': '2G', 'cache_quota': '20G'}) == [['data']]
+
+
+def test_enforce_skips_running_mount(ossfs, tmp_path, monkeypatch):
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    for i in range(4):
+        (cache / f'f{i}').write_bytes(b'x' * 8192)
+        os.utime(cache / f'f{i}', (time.time() - 100 + i, time.time()))
+    monkeypatch.setattr(ossfs, 'discover_mounts', lambda: ['data'])
+    monkeypatch.setattr(ossfs, 'read_start_script',
+                        lambda name: {'path': str(tmp_path / 'mnt'), 'options': {'use_cache': str(cache)}})
+    monkeypatch.setattr(ossfs, 'read_limits', lambda name: {'cache_quota': 16384})
+    monkeypatch.setattr(ossfs, 'is_mounted', lambda path: False)
+    monkeypatch.setattr(ossfs, 'find_ossfs_pid', lambda pid: None)
+
+    class RPC:
+        running = True
+
+        class supervisor:
+            @staticmethod
+            def getAllProcessInfo():
+                state = 'RUNNING' if RPC.running else 'STOPPED'
+                return [{'group': 'ossfs_data', 'statename': state, 'pid': 1}]
+
+    monkeypatch.setattr(ossfs, 'supervisor_rpc', lambda path: RPC)
+    ossfs.limits_report(enforce=True)
+    assert len(os.listdir(cache)) == 4
+    RPC.running = False
+    ossfs.limits_report(enforce=True)
+    # 按访问时间从旧到新删除，降到配额的 90% 以下
+    assert sorted(os.listdir(cache)) == ['f3']
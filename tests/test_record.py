@@ -0,0 +1,30 @@
+import json
+
+
+def test_only_secret_inputs_are_redacted(ossfs, tmp_path, monkeypatch):
+    record = tmp_path / 'run.jsonl'
+    monkeypatch.setattr(ossfs, 'RECORD_PATH', str(record))
+    answers = iter(['y', 'LTAI-id', 'secret-value'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    ossfs.get_user_input("检测到已存在的密钥文件，是否需要添加新密钥？(y/n): ", default="n")
+    ossfs.get_user_input("请输入 AccessKey ID: ", required=True, secret=True)
+    ossfs.get_user_input("请输入 AccessKey Secret: ", required=True, secret=True)
+    events = [json.loads(line) for line in record.read_text().splitlines()][1:]
+    assert [event['answer'] for event in events] == ['y', '<redacted>', '<redacted>']
+
+
+def test_command_probes_are_recorded_and_replay_rejects_unknown(acme, tmp_path, monkeypatch):
+    import pytest
+    from conftest import load_script
+    record = tmp_path / 'run.jsonl'
+    monkeypatch.setattr(acme, 'RECORD_PATH', str(record))
+    acme.check_command('sh')
+    events = [json.loads(line) for line in record.read_text().splitlines()]
+    commands = [event for event in events if event['type'] == 'command']
+    assert [(event['command'], event['returncode']) for event in commands] == [(['which', 'sh'], 0)]
+    replay = load_script('replay')
+    replayer = replay.Replayer(commands, str(tmp_path), speed=0)
+    assert replayer.run(['which', 'sh']).returncode == 0
+    with pytest.raises(RuntimeError):
+        replayer.run(['which', 'acme.sh'])
+    assert replayer.unexpected == ['which acme.sh']
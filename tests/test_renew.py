@@ -0,0 +1,42 @@
+import shlex
+
+
+def test_cron_sets_path_and_passes_options(acme, tmp_path, monkeypatch):
+    cron_file = tmp_path / 'acme-py-renew'
+    monkeypatch.setattr(acme, 'RENEW_CRON_FILE', str(cron_file))
+    home = tmp_path / 'acme home'
+    home.mkdir()
+    args = acme.parse_args(['--prom-file', str(tmp_path / 'acme.prom'), 'renew', '--home', str(home),
+                            '--state', str(tmp_path / 'state.json'), '--install-cron', '--provider', 'ali'])
+    acme.renew_main(args)
+    path_line, job = cron_file.read_text().splitlines()
+    assert path_line.startswith('PATH=') and '/usr/local/bin' in path_line.split('=', 1)[1].split(':')
+    argv = shlex.split(job.split(' root ', 1)[1].split(' >> ')[0])
+    assert argv[1] == str(home / 'acme.py')
+    assert argv[2:4] == ['--prom-file', str(tmp_path / 'acme.prom')]
+    assert argv[argv.index('--state') + 1] == str(tmp_path / 'state.json')
+    assert argv[argv.index('--provider') + 1] == 'ali'
+    assert acme.parse_args(argv[2:]).home == str(home)
+
+
+def test_renew_one_missing_acme(acme, tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    ok, message = acme._renew_one('example.com', False, str(tmp_path))
+    assert not ok and message
+
+
+def test_plan_renewals_isolates_unreadable_certs(acme, tmp_path, monkeypatch):
+    import subprocess
+    for domain in ('good.com', 'bad.com'):
+        (tmp_path / domain).mkdir()
+        (tmp_path / domain / f'{domain}.cer').write_text('cert')
+
+    def not_after(cert_file):
+        if 'bad.com' in cert_file:
+            raise subprocess.CalledProcessError(1, ['openssl'])
+        return 2000000000
+
+    monkeypatch.setattr(acme, 'cert_not_after', not_after)
+    schedule = acme.plan_renewals(str(tmp_path), {}, renew_days=30, window_hours=0)
+    assert schedule['good.com']['renew_at'] == 2000000000 - 30 * 86400
+    assert schedule['bad.com']['renew_at'] <= acme.time.time() and schedule['bad.com']['not_after'] == 0
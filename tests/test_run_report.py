@@ -0,0 +1,36 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_phase_stack_per_thread(ossfs):
+    barrier = threading.Barrier(2)
+
+    def worker(name):
+        with ossfs.phase(name):
+            barrier.wait(timeout=5)
+            ossfs.record_command(['true', name], 0.01, 0, 0)
+            barrier.wait(timeout=5)
+
+    with ossfs.phase('mount_all'):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(worker, ['mount_a', 'mount_b']))
+        # 工作线程中没有阶段的命令归入主线程当前的阶段
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(ossfs.record_command, ['ls'], 0.01, 0, 0).result()
+    phases = {item['command']: item['phase'] for item in ossfs.RUN_REPORT['commands']}
+    assert phases == {'true mount_a': 'mount_a', 'true mount_b': 'mount_b', 'ls': 'mount_all'}
+    parents = {item['name']: item['parent'] for item in ossfs.RUN_REPORT['phases']}
+    assert parents == {'mount_a': 'mount_all', 'mount_b': 'mount_all', 'mount_all': None}
+
+
+def test_prom_aggregates_repeated_phases(acme, tmp_path, monkeypatch):
+    prom = tmp_path / 'acme.prom'
+    monkeypatch.setattr(acme, 'PROM_PATH', str(prom))
+    for _ in range(3):
+        with acme.phase('deploy'):
+            pass
+    acme.write_run_report(True)
+    lines = [line for line in prom.read_text().splitlines() if not line.startswith('#')]
+    series = [line.rsplit(' ', 1)[0] for line in lines]
+    assert len(series) == len(set(series))
+    assert 'debian_script_phase_runs{script="acme.py",phase="deploy",status="ok"} 3' in lines
@@ -0,0 +1,47 @@
+"""acme.py 与 ossfs.py 各自内置的产物缓存、运行报告和依赖安装代码必须保持一致"""
+import ast
+import os
+
+from conftest import PY_DIR
+
+SHARED = [
+    'print_message', 'get_user_input',
+    # 运行报告与录制 (user-012)
+    'RUN_REPORT', 'REPORT_PATH', 'PROM_PATH', 'RECORD_PATH', '_report_lock', '_run_started',
+    '_record_started', '_record_state', '_phase_state', '_main_phase_stack',
+    '_phase_stack', 'current_phase',
+    'record_event', 'phase', 'record_command', '_prom_label', 'write_run_report', 'run_with_report',
+    'run_command',
+    # 产物缓存 (user-007)
+    'ARTIFACT_CACHE', 'ARTIFACT_MIRROR', 'ARTIFACT_CACHE_MAX_MB', 'ARTIFACT_SHA256', 'ARTIFACT_PINS',
+    'ARTIFACT_REQUIRE_PIN', 'sha256_file', '_cached_artifact_valid', 'pinned_sha256', 'evict_artifacts',
+    'fetch_artifact', '_fetch_artifact',
+    # 依赖安装 (user-013)
+    'APT_LISTS', 'APT_LISTS_MAX_AGE', 'missing_packages', 'ensure_packages',
+]
+
+
+def top_level(name):
+    path = os.path.join(PY_DIR, name)
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    lines = source.splitlines()
+    blocks = {}
+    for node in ast.parse(source).body:
+        # 按行切片，ast.get_source_segment 在大文件上每次都要重新切分全文
+        segment = '\n'.join(lines[node.lineno - 1:node.end_lineno])
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            blocks[node.name] = segment
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    blocks[target.id] = segment
+    return blocks
+
+
+def test_shared_blocks_identical():
+    acme, ossfs = top_level('acme.py'), top_level('ossfs.py')
+    for name in SHARED:
+        assert name in acme, f'acme.py 缺少 {name}'
+        assert name in ossfs, f'ossfs.py 缺少 {name}'
+        assert acme[name] == ossfs[name], f'{name} 在两个脚本中不一致'
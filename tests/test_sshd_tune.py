@@ -0,0 +1,63 @@
+import argparse
+
+import pytest
+
+
+def write_config(tmp_path):
+    (tmp_path / 'sshd_config.d').mkdir()
+    (tmp_path / 'sshd_config.d' / '50-cloud-init.conf').write_text('PasswordAuthentication no\nUseDNS yes\n')
+    config = tmp_path / 'sshd_config'
+    config.write_text('Include sshd_config.d/*.conf\nPort 2222\nUseDNS no\n\n'
+                      'Match User backup\n    MaxSessions 4\n')
+    return config
+
+
+def test_parse_config_resolves_include_against_base(sshd_tune, tmp_path):
+    config = write_config(tmp_path)
+    directives = sshd_tune.parse_config(str(config), base=str(tmp_path))
+    values = sshd_tune.effective_values(directives)
+    # 第一次出现的值生效，Include 的文件先于主配置文件中后面的指令
+    assert values['usedns']['value'] == 'yes'
+    assert values['usedns']['file'].endswith('50-cloud-init.conf')
+    assert values['port']['value'] == '2222'
+    assert [d['match'] for d in directives if d['keyword'] == 'MaxSessions'] == ['User backup']
+    # 默认按 sshd 的规则相对于 /etc/ssh 解析，而不是配置文件所在目录
+    assert not any(d['file'].startswith(str(tmp_path / 'sshd_config.d'))
+                   for d in sshd_tune.parse_config(str(config), base=str(tmp_path / 'missing')))
+
+
+def test_plan_changes_edits_in_place_and_inserts_before_match(sshd_tune, tmp_path):
+    config = write_config(tmp_path)
+    directives = sshd_tune.parse_config(str(config), base=str(tmp_path))
+    profile = {'UseDNS': 'no', 'PasswordAuthentication': 'yes', 'MaxSessions': '32'}
+    contents, changes = sshd_tune.plan_changes(str(config), directives, profile)
+    assert changes == [('UseDNS', 'yes', 'no'), ('PasswordAuthentication', 'no', 'yes'), ('MaxSessions', None, '32')]
+    assert contents[str(tmp_path / 'sshd_config.d' / '50-cloud-init.conf')] == ['PasswordAuthentication yes', 'UseDNS no']
+    lines = contents[str(config)]
+    assert lines.index('MaxSessions 32') < lines.index('Match User backup')
+    assert '    MaxSessions 4' in lines
+
+
+def test_password_authentication_is_opt_in(sshd_tune):
+    assert 'PasswordAuthentication' not in sshd_tune.latency_profile()
+    assert sshd_tune.latency_profile(password=True)['PasswordAuthentication'] == 'yes'
+    assert sshd_tune.parse_args(['apply', '--password']).password
+    assert not sshd_tune.parse_args([]).password
+
+
+def test_apply_restores_backups_when_validation_raises(sshd_tune, tmp_path, monkeypatch):
+    config = write_config(tmp_path)
+    included = tmp_path / 'sshd_config.d' / '50-cloud-init.conf'
+    original = config.read_text(), included.read_text()
+    monkeypatch.setattr(sshd_tune, 'SSHD_DIR', str(tmp_path))
+    monkeypatch.setattr(sshd_tune, 'BACKUP_DIR', str(tmp_path / 'backups'))
+
+    def broken(sshd, path):
+        raise OSError('sshd -t 被中断')
+
+    monkeypatch.setattr(sshd_tune, 'validate_config', broken)
+    args = sshd_tune.parse_args(['apply', '--config', str(config), '--sshd', 'python3', '--no-measure'])
+    with pytest.raises(OSError):
+        sshd_tune.apply(args)
+    assert (tmp_path / 'backups').is_dir()
+    assert (config.read_text(), included.read_text()) == original
@@ -0,0 +1,65 @@
+import os
+
+
+def _transfer(ossfs, fake_oss, src, dst, **kwargs):
+    return ossfs.transfer(src, dst, endpoint=fake_oss.endpoint, path_style=True, **kwargs)
+
+
+def test_multipart_upload_resumes(ossfs, fake_oss, tmp_path):
+    data = os.urandom(5 * 1024 * 1024 + 123)
+    local = tmp_path / 'big.bin'
+    local.write_bytes(data)
+    fake_oss.fail_parts = {2, 4}
+    stats = _transfer(ossfs, fake_oss, str(local), 'oss://bucket/dir/big.bin', part_size_mb=1, concurrency=4)
+    assert stats['failed'] == [str(local)] and 'dir/big.bin' not in fake_oss.objects
+
+    # 续传时只上传失败的分片，沿用同一个分片任务
+    before = len(fake_oss.requests)
+    stats = _transfer(ossfs, fake_oss, str(local), 'oss://bucket/dir/big.bin', part_size_mb=1, concurrency=4)
+    assert stats['failed'] == [] and fake_oss.objects['dir/big.bin'] == data
+    retried = sorted(int(params['partNumber']) for _, _, params in fake_oss.requests[before:] if 'partNumber' in params)
+    assert retried == [2, 4]
+    assert len([r for r in fake_oss.requests if 'uploads' in r[2]]) == 1
+
+
+def test_download_tree(ossfs, fake_oss, tmp_path):
+    fake_oss.objects.update({'data/a.txt': b'a', 'data/sub/b.txt': b'b' * 3000000, 'other/c.txt': b'c'})
+    stats = _transfer(ossfs, fake_oss, 'oss://bucket/data/', str(tmp_path / 'out'), part_size_mb=1)
+    assert stats['failed'] == [] and stats['files'] == 2
+    assert (tmp_path / 'out' / 'sub' / 'b.txt').read_bytes() == b'b' * 3000000
+
+
+def test_download_rejects_traversal(ossfs, fake_oss, tmp_path):
+    fake_oss.objects.update({'data/ok.txt': b'ok', 'data/../../escape.txt': b'x', 'data//abs.txt': b'y'})
+    out = tmp_path / 'deep' / 'out'
+    stats = _transfer(ossfs, fake_oss, 'oss://bucket/data/', str(out))
+    assert sorted(stats['failed']) == ['data/../../escape.txt', 'data//abs.txt']
+    assert (out / 'ok.txt').read_bytes() == b'ok'
+    assert not (tmp_path / 'escape.txt').exists() and not os.path.exists('/abs.txt')
+
+
+def test_parse_error_recorded_per_file(ossfs, fake_oss, tmp_path, monkeypatch):
+    import xml.etree.ElementTree as ElementTree
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'a.bin').write_bytes(b'a' * 2000000)
+    (tmp_path / 'src' / 'b.bin').write_bytes(b'b')
+    monkeypatch.setattr(ossfs.OSSClient, 'initiate_multipart',
+                        lambda self, key: ElementTree.fromstring(b'<broken'))
+    stats = _transfer(ossfs, fake_oss, str(tmp_path / 'src'), 'oss://bucket/up/', part_size_mb=1)
+    assert stats['failed'] == [str(tmp_path / 'src' / 'a.bin')] and fake_oss.objects['up/b.bin'] == b'b'
+
+
+def test_expired_multipart_upload_restarts(ossfs, fake_oss, tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 7)
+    local = tmp_path / 'big.bin'
+    local.write_bytes(data)
+    fake_oss.fail_parts = {2}
+    stats = _transfer(ossfs, fake_oss, str(local), 'oss://bucket/big.bin', part_size_mb=1, concurrency=2)
+    assert stats['failed'] == [str(local)]
+
+    # 服务端清理了未完成的分片任务，续传时重新发起而不是一直失败
+    fake_oss.uploads.clear()
+    stats = _transfer(ossfs, fake_oss, str(local), 'oss://bucket/big.bin', part_size_mb=1, concurrency=2)
+    assert stats['failed'] == [] and fake_oss.objects['big.bin'] == data
+    assert len([r for r in fake_oss.requests if 'uploads' in r[2]]) == 2
+    assert not os.listdir(tmp_path / 'cache' / 'transfer')
@@ -0,0 +1,14 @@
+import os
+
+
+def test_warm_targets_stay_inside_mount(ossfs, tmp_path):
+    mount = tmp_path / 'oss'
+    (mount / 'data').mkdir(parents=True)
+    (mount / 'data' / 'a.bin').write_bytes(b'a')
+    (tmp_path / 'oss-other').mkdir()
+    (tmp_path / 'oss-other' / 'secret').write_bytes(b'secret')
+    os.symlink(tmp_path / 'oss-other', mount / 'link')
+    manifest = tmp_path / 'manifest'
+    manifest.write_text(f'{mount}/data\n/data/a.bin\n../oss-other/secret\n{tmp_path}/oss-other/secret\nlink/secret\n')
+    found = sorted(path for path, _ in ossfs.warm_targets(str(mount), manifest=str(manifest)))
+    assert found == [str(mount / 'data' / 'a.bin')]